@@ -0,0 +1,30 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file writes cache files so that a crash, or another process reading
+at the same time, never sees half a file. Everything is written to a
+temporary file next to the real one, which then replaces it in one step.
+"""
+
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_file(path):
+    """
+    Opens a temporary file for writing bytes in the body of a with statement, and moves it
+    to path at the end, or deletes it if the body raised.
+    Args:
+        path (str): the file to write
+    """
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            yield file
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,483 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file times the hot paths of the cookie generator. It compares scoring
+recipes one at a time with Population.fitness against scoring a whole
+RecipeBatch with Population.fitness_batch, and checks that both give the
+same scores. It also measures how much memory a million GeneratedRecipe
+objects take, compared with the plain __dict__ objects recipes used to be.
+Run it with: python benchmark.py [number of recipes] [--memory number of recipes]
+
+python benchmark.py --suite times every stage of the pipeline separately, from
+parsing the recipe files to the generate-and-score loop of cookie_gen.main(),
+and records the peak memory each one allocates. It runs on the real corpus and
+on synthetic corpora of more recipes (and, optionally, more ingredients and a
+larger embedding vocabulary), and writes the results to a JSON file. Two such
+files can be compared with python benchmark.py --compare OLD.json NEW.json.
+
+python benchmark.py --samplers compares how fit the recipes generate_batch
+picks are, per recipe scored, when extras are picked uniformly and when they
+are guided by embedding neighbors at a few temperatures.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+import embeddings
+from embeddings import SimilarityMatrix
+from clean_text import get_recipe_dict, parse_recipe_files
+from cookie_gen import Population, Recipe, RecipeBatch, translate
+
+
+def fitness_benchmark(population, n=10000, seed=0):
+    """
+    Scores the same n generated recipes with fitness() and fitness_batch(), and returns a
+    dictionary with the time each took and the largest difference between their scores.
+    Args:
+        population (Population): the population to generate and score recipes with
+        n (int): the number of recipes to score
+        seed (int): seeds the generated batch
+    """
+    batch = population.generate_batch(n, Recipe.NUM_CORE, seed=seed)
+    recipes = [batch.recipe(row) for row in range(len(batch))]
+    # building the recipes re-normalizes them, so score the batch they pack back into
+    packed = RecipeBatch.from_recipes(recipes, population)
+
+    start = perf_counter()
+    scalar = np.array([population.fitness(recipe) for recipe in recipes])
+    scalar_seconds = perf_counter() - start
+
+    start = perf_counter()
+    batch_scores = population.fitness_batch(packed)
+    batch_seconds = perf_counter() - start
+
+    return {
+        "recipes": n,
+        "scalar_seconds": scalar_seconds,
+        "batch_seconds": batch_seconds,
+        "speedup": scalar_seconds / batch_seconds,
+        "max_difference": float(np.max(np.abs(scalar - batch_scores.fitness))),
+    }
+
+
+def sampler_benchmark(population, n=100000, temperatures=(0.05, 0.2, 1.0), seed=0):
+    """
+    Generates and scores n recipes with uniform extras and n with guided extras at each
+    temperature, and returns a dictionary for each sampler with the time it took, the mean
+    fitness per evaluation, the best fitness, the mean of the top 1%, and the share of its
+    recipes fitter than the best 1% of the uniform sampler's.
+    Args:
+        population (Population): the population to generate and score recipes with
+        n (int): the number of recipes each sampler generates
+        temperatures (list[float]): the temperatures of the guided samplers
+        seed (int): seeds every sampler alike
+    """
+    results = []
+    threshold = None
+    for temperature in (None,) + tuple(temperatures):
+        start = perf_counter()
+        batch = population.generate_batch(n, Recipe.NUM_CORE, seed=seed,
+                                          temperature=temperature)
+        fitness = population.fitness_batch(batch).fitness
+        seconds = perf_counter() - start
+        fitness = fitness[~np.isnan(fitness)]
+        top = np.sort(fitness)[-max(1, len(fitness) // 100):]
+        if threshold is None:
+            threshold = top[0]
+        results.append({
+            "sampler": "uniform" if temperature is None else "guided",
+            "temperature": temperature,
+            "evaluations": n,
+            "seconds": seconds,
+            "mean_fitness": float(fitness.mean()),
+            "best_fitness": float(fitness.max()),
+            "top_percent_fitness": float(top.mean()),
+            "share_above_uniform_top_percent": float((fitness > threshold).mean()),
+        })
+    return results
+
+
+class _DictIngredient:
+    def __init__(self, name, amount):
+        # an Ingredient before it had __slots__
+        self.name = name
+        self.amount = amount
+
+
+class _DictRecipe:
+    def __init__(self, name, ingredients_list):
+        # a Recipe before it stored arrays: a __dict__ and one Ingredient per ingredient
+        self.name = name
+        self.rating = None
+        self.num_of_ingredients = len(ingredients_list)
+        self.ingredients_list = [_DictIngredient(ingredient.name, ingredient.amount)
+                                 for ingredient in ingredients_list]
+
+
+def _dict_recipe_bytes(recipe):
+    """
+    Returns the bytes of every object a _DictRecipe holds on its own, leaving out the
+    ingredient names it shares with the population.
+    """
+    size = sys.getsizeof(recipe) + sys.getsizeof(recipe.__dict__) + \
+        sys.getsizeof(recipe.name) + sys.getsizeof(recipe.ingredients_list)
+    for ingredient in recipe.ingredients_list:
+        size += sys.getsizeof(ingredient) + sys.getsizeof(ingredient.__dict__) + \
+            sys.getsizeof(ingredient.amount)
+    return size
+
+
+def _recipe_bytes(recipe):
+    """
+    Returns the bytes of every object a Recipe holds on its own.
+    """
+    return sys.getsizeof(recipe) + sys.getsizeof(recipe.name) + \
+        sys.getsizeof(recipe.ingredient_ids) + sys.getsizeof(recipe.amounts)
+
+
+def memory_benchmark(population, n=1000000, seed=0, chunk_size=100000):
+    """
+    Generates n recipes and keeps them all as GeneratedRecipe objects, and returns a
+    dictionary with how many bytes they hold, how many the same recipes would hold as
+    __dict__ objects with one Ingredient object per ingredient, and how long building
+    them took. Sizes are added up with sys.getsizeof; the __dict__ versions are only built
+    one at a time to be measured, so they never all have to fit in memory.
+    Args:
+        population (Population): the population to generate recipes with
+        n (int): the number of recipes to keep
+        seed (int): seeds the generated batches
+        chunk_size (int): how many recipes to generate at once
+    """
+    rng = np.random.default_rng(seed)
+    recipes = []
+    compact_bytes = 0
+    dict_bytes = 0
+    seconds = 0
+    while len(recipes) < n:
+        batch = population.generate_batch(min(chunk_size, n - len(recipes)), Recipe.NUM_CORE,
+                                          seed=rng)
+        start = perf_counter()
+        chunk = [batch.recipe(row) for row in range(len(batch))]
+        seconds += perf_counter() - start
+        for recipe in chunk:
+            compact_bytes += _recipe_bytes(recipe)
+            dict_bytes += _dict_recipe_bytes(_DictRecipe(recipe.name, recipe.ingredients_list))
+        recipes.extend(chunk)
+
+    return {
+        "recipes": len(recipes),
+        "build_seconds": seconds,
+        "compact_bytes": compact_bytes,
+        "dict_bytes": dict_bytes,
+        "ratio": dict_bytes / compact_bytes,
+    }
+
+
+def make_corpus(dirname, num_recipes, source='recipes', new_ingredients=(), seed=0):
+    """
+    Writes num_recipes synthetic recipe files to dirname, each a copy of a random real
+    recipe with every amount scaled by a random factor. Optionally, each extra line
+    renames one ingredient to a random name from new_ingredients, so the corpus
+    vocabulary grows with it.
+    Args:
+        dirname (str): the directory to write recipe text files to
+        num_recipes (int): how many recipes to write
+        source (str): the directory of real recipe text files to copy
+        new_ingredients (list[str]): names to give some ingredients, if any
+        seed (int): seeds the copies and changes
+    """
+    rng = random.Random(seed)
+    originals = []
+    for filename in sorted(os.listdir(source)):
+        file_path = os.path.join(source, filename)
+        if os.path.isfile(file_path) and filename != ".DS_Store":
+            with open(file_path, 'r') as file:
+                originals.append(file.read().split('\n'))
+
+    os.makedirs(dirname, exist_ok=True)
+    for number in range(num_recipes):
+        lines = rng.choice(originals)
+        ingredients = []
+        for line in lines[2:]:
+            parts = line.split(' ')
+            try:
+                parts[0] = str(round(float(parts[0]) * rng.lognormvariate(0, 0.2), 3))
+            except ValueError:
+                pass
+            ingredients.append(' '.join(parts))
+        if new_ingredients:
+            ingredients.append(f'{rng.randint(1, 8)} tablespoons '
+                               f'{rng.choice(new_ingredients)}')
+        with open(os.path.join(dirname, f'synthetic {number}.txt'), 'w') as file:
+            file.write('\n'.join([f'{lines[0]} {number}', lines[1]] +
+                                  [line for line in ingredients if line]) + '\n')
+
+
+def make_embeddings(directory, num_words, seed=0):
+    """
+    Writes an embedding table of num_words words, the real ones followed by made-up
+    words with random vectors, and returns (matrix path, vocab path, the made-up words).
+    Args:
+        directory (str): where to write the matrix and vocabulary files
+        num_words (int): the number of words in the table
+        seed (int): seeds the random vectors
+    """
+    table = embeddings.EmbeddingTable.load(embeddings.MATRIX_PATH, embeddings.VOCAB_PATH)
+    new_words = [f'ingredient{number}' for number in range(max(num_words - len(table.words), 0))]
+    vectors = np.random.default_rng(seed).normal(
+        0, 0.3, (len(new_words), table.matrix.shape[1])).astype(np.float32)
+    paths = (os.path.join(directory, f'emb{num_words}.npy'),
+             os.path.join(directory, f'emb{num_words}.vocab.txt'))
+    embeddings.EmbeddingTable(table.words + new_words,
+                              np.concatenate((table.matrix, vectors))).save(*paths)
+    return paths + (new_words,)
+
+
+def measure(function, *args, memory=True):
+    """
+    Calls function(*args) and returns (its result, seconds it took, peak bytes it
+    allocated). Tracing allocations slows Python down, so the memory is measured by
+    calling the function a second time, and is None without memory.
+    """
+    start = perf_counter()
+    result = function(*args)
+    seconds = perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main_loop(population, n=100):
+    """
+    The generate-and-score loop of cookie_gen.main(): generates n recipes and returns the
+    five most fit.
+    """
+    generated = []
+    for _ in range(n):
+        new = population.generate(Recipe.NUM_CORE, int(population.rng.integers(4, 7)))
+        generated.append((new, population.fitness(new)))
+    generated.sort(key=lambda x: x[1], reverse=True)
+    return generated[:5]
+
+
+def end_to_end(dirname, n=100):
+    """
+    Everything cookie_gen.main() does, for the recipes in dirname.
+    """
+    return main_loop(Population(translate(parse_recipe_files(dirname))), n)
+
+
+def stage_benchmark(dirname, calls=1000, memory=True, seed=0):
+    """
+    Times (and measures the memory of) each stage of the pipeline on the recipes in
+    dirname, and returns a list of dictionaries, one per stage. Per-recipe stages run
+    calls times, over the same generated recipes.
+    Args:
+        dirname (str): the directory of recipe text files
+        calls (int): how many recipes to generate and score
+        memory (bool): also measure the peak memory of each stage
+        seed (int): seeds the generated recipes
+    """
+    results = []
+
+    def record(stage, function, *args, num_calls=1):
+        result, seconds, peak = measure(function, *args, memory=memory)
+        results.append({"stage": stage, "calls": num_calls, "seconds": seconds,
+                        "seconds_per_call": seconds / num_calls, "peak_bytes": peak})
+        return result
+
+    recipe_dict = record("get_recipe_dict", parse_recipe_files, dirname)
+    recipes = record("translate", translate, recipe_dict)
+    population = record("Population.__init__", Population, recipes)
+    # the lazy indexes are stages of their own, so generate() doesn't pay for them. They
+    # are dropped before each build so the memory run builds them again
+    record("ranking_and_amounts", lambda: (population.index_recipes(), population.ranking,
+                                           population.amounts, population.amount_samples))
+    population.rng = np.random.default_rng(seed)
+    generated = record("generate", lambda: [
+        population.generate(Recipe.NUM_CORE, int(population.rng.integers(4, 7)))
+        for _ in range(calls)], num_calls=calls)
+    record("recipe_tf_idf", lambda: [population.recipe_tf_idf(recipe)
+                                     for recipe in generated], num_calls=calls)
+    record("core_fitness", lambda: [population.core_fitness(recipe)
+                                    for recipe in generated], num_calls=calls)
+    record("similarities", lambda: SimilarityMatrix.build(population.all_ingredients))
+    population.similarities
+    record("extras_similarity", lambda: [recipe.extras_similarity(population.similarities)
+                                         for recipe in generated], num_calls=calls)
+    record("main_loop", main_loop, population)
+    record("end_to_end", end_to_end, dirname)
+    return results
+
+
+def run_suite(sizes=(189, 1000, 10000), new_ingredients=0, embedding_words=0, calls=1000,
+              memory=True, seed=0, corpus_dir=None):
+    """
+    Runs stage_benchmark on the real corpus (for a size of 189) and on synthetic corpora
+    of every other size, and returns the results with details of the machine and commit.
+    Args:
+        sizes (list[int]): the number of recipes of each corpus
+        new_ingredients (int): how many made-up ingredients synthetic recipes may use
+        embedding_words (int): the size of the embedding table to use, made up of the real
+        words followed by made-up ones, or 0 for the real table
+        calls (int): how many recipes each per-recipe stage generates or scores
+        memory (bool): also measure the peak memory of each stage
+        seed (int): seeds the synthetic corpora and generated recipes
+        corpus_dir (str): where to keep the synthetic corpora; a temporary directory
+        by default
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {"commit": commit, "time": time.time(), "python": platform.python_version(),
+              "numpy": np.__version__, "platform": platform.platform(),
+              "cpus": os.cpu_count(), "calls": calls, "results": []}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = corpus_dir or temp_dir
+        names = [f'ingredient{number}' for number in range(new_ingredients)]
+        if embedding_words:
+            matrix_path, vocab_path, made_up = make_embeddings(temp_dir, embedding_words, seed)
+            names = (made_up + names)[:new_ingredients]
+            embeddings.use_embeddings(matrix_path, vocab_path)
+        try:
+            for size in sizes:
+                dirname = 'recipes'
+                if size != len(os.listdir('recipes')) or new_ingredients:
+                    dirname = os.path.join(corpus_dir, f'corpus{size}')
+                    if not os.path.isdir(dirname):
+                        make_corpus(dirname, size, new_ingredients=names, seed=seed)
+                for result in stage_benchmark(dirname, calls, memory, seed):
+                    result.update({"recipes": size, "new_ingredients": new_ingredients,
+                                   "embedding_words": len(embeddings.get_embeddings().words)})
+                    report["results"].append(result)
+                    print(f'{size:>7} recipes  {result["stage"]:<20} '
+                          f'{result["seconds"]:9.4f}s  '
+                          + (f'{result["peak_bytes"] / 2 ** 20:9.1f} MiB'
+                             if result["peak_bytes"] is not None else ''),
+                          flush=True)
+        finally:
+            embeddings.use_embeddings()
+    return report
+
+
+def compare(old_report, new_report):
+    """
+    Returns a line for each stage and corpus the two reports share, with how many times
+    slower (above 1) or faster (below 1) the new report is per call.
+    """
+    def key(result):
+        return (result["recipes"], result["new_ingredients"], result["embedding_words"],
+                result["stage"])
+
+    old = {key(result): result for result in old_report["results"]}
+    lines = []
+    for result in new_report["results"]:
+        before = old.get(key(result))
+        if before is not None and before["seconds_per_call"] > 0:
+            ratio = result["seconds_per_call"] / before["seconds_per_call"]
+            lines.append(f'{result["recipes"]:>7} recipes  {result["stage"]:<20} '
+                         f'{before["seconds"]:9.4f}s -> {result["seconds"]:9.4f}s  '
+                         f'({ratio:.2f}x)')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and measure the cookie generator.')
+    parser.add_argument('n', type=int, nargs='?', default=10000,
+                        help='number of recipes to score')
+    parser.add_argument('--memory', type=int, default=0, metavar='N',
+                        help='also measure the memory of N generated recipes, such as 1000000')
+    parser.add_argument('--suite', action='store_true',
+                        help='time every stage of the pipeline instead')
+    parser.add_argument('--sizes', default='189,1000,10000',
+                        help='comma separated corpus sizes for --suite, up to 100000')
+    parser.add_argument('--new-ingredients', type=int, default=0,
+                        help='number of made-up ingredients synthetic recipes may use')
+    parser.add_argument('--embedding-words', type=int, default=0,
+                        help='size of a made-up embedding table to use (default: the real one)')
+    parser.add_argument('--calls', type=int, default=1000,
+                        help='recipes each per-recipe stage generates or scores')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='only time the stages, which takes about half as long')
+    parser.add_argument('--corpus-dir', default=None,
+                        help='where to keep synthetic corpora between runs')
+    parser.add_argument('--output', default='benchmark.json',
+                        help='the JSON file --suite writes its results to')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare the results of two --suite runs')
+    parser.add_argument('--samplers', action='store_true',
+                        help='compare uniform and guided extras, generating n recipes each')
+    parser.add_argument('--temperatures', default='0.05,0.2,1.0',
+                        help='comma separated temperatures for --samplers')
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, 'r') as file:
+                reports.append(json.load(file))
+        print('\n'.join(compare(*reports)))
+        return
+    if args.suite:
+        report = run_suite([int(size) for size in args.sizes.split(',')],
+                           args.new_ingredients, args.embedding_words, args.calls,
+                           not args.no_memory, corpus_dir=args.corpus_dir)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+        print(f'wrote {args.output}')
+        return
+
+    n = args.n
+    population = Population(translate(get_recipe_dict()))
+    # build the lazy indexes up front so neither path pays for them
+    population.fitness_batch(population.generate_batch(1, Recipe.NUM_CORE, seed=0))
+
+    if args.samplers:
+        print('sampler  temperature  mean fitness  best fitness  top 1%  above uniform top 1%')
+        for result in sampler_benchmark(population, n, [float(temperature) for temperature
+                                                        in args.temperatures.split(',')]):
+            temperature = '-' if result["temperature"] is None else result["temperature"]
+            print(f'{result["sampler"]:<8} {temperature:>11} {result["mean_fitness"]:>13.4f} '
+                  f'{result["best_fitness"]:>13.4f} {result["top_percent_fitness"]:>7.4f} '
+                  f'{result["share_above_uniform_top_percent"]:>21.1%}')
+        return
+
+    result = fitness_benchmark(population, n)
+    print(f'scored {result["recipes"]} recipes')
+    print(f'fitness():       {result["scalar_seconds"]:.3f}s')
+    print(f'fitness_batch(): {result["batch_seconds"]:.3f}s '
+          f'({result["speedup"]:.0f}x faster)')
+    print(f'largest difference in fitness: {result["max_difference"]:.2e}')
+
+    if args.memory:
+        result = memory_benchmark(population, args.memory)
+        print(f'built {result["recipes"]} recipes in {result["build_seconds"]:.1f}s')
+        print(f'arrays and __slots__: {result["compact_bytes"] / 2 ** 20:.0f} MiB '
+              f'({result["compact_bytes"] / result["recipes"]:.0f} bytes per recipe)')
+        print(f'__dict__ objects:     {result["dict_bytes"] / 2 ** 20:.0f} MiB '
+              f'({result["dict_bytes"] / result["recipes"]:.0f} bytes per recipe, '
+              f'{result["ratio"]:.1f}x more)')
+
+
+if __name__ == '__main__':
+    main()
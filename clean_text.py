@@ -1,62 +1,130 @@
 """
 Authors: Danny Little, Bruce Tang, August Wadlington
 CSCI 3725
-Last Edited: 2021-03-30
+Last Edited: 2026-10-18
 
 This file does further parsing of the recipes stored in text files
 in the ./recipes directory so that they can be made into recipe
 and ingredient objects.
+
+Recipe files are read and parsed by a pool of threads, and iter_recipe_files
+yields them one at a time in file name order, only keeping a few files ahead
+of the consumer in memory. Lines that can't be parsed are reported as
+ParseError tuples in an errors list rather than printed.
 """
 
 import os
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join, isfile
 
+# how many files each reader thread may have parsed ahead of the consumer
+READ_AHEAD = 4
+
+ParseError = namedtuple('ParseError', ['filename', 'line_number', 'line', 'message'])
+
 
-def get_recipe_dict():
+def get_recipe_dict(errors=None):
     """
     This function acts as a sort of "hook" so that the
     parsing work done in this file can be taken advantage of. 
+        Args:
+        errors (list): if given, a ParseError is appended to it for each malformed line
     """
-    return parse_recipe_files('recipes')
+    return parse_recipe_files('recipes', errors=errors)
 
 
-def parse_recipe_files(dirname):
+def parse_recipe_files(dirname, workers=None, errors=None):
     """A helper function to return a dictionary of 
     recipe information from text files representing each recipe.
 
         Args:
         dirname (str): name of the directory where recipe text files are.
+        workers (int): number of reader threads, see iter_recipe_files
+        errors (list): if given, a ParseError is appended to it for each malformed line
+    """
+    return dict(iter_recipe_files(dirname, workers, errors))
+
+
+def recipe_file_paths(dirname):
+    """
+    Returns the path of every recipe file in dirname.
     """
-    recipes = {}
-    for filename in os.listdir(dirname):
-        file_path = join(dirname, filename)
-        if isfile(file_path) and filename != ".DS_Store":
-            with open(file_path, "r") as file:
-                ingredients_strings = [ingredient.strip()
-                                       for ingredient in file.readlines()]
-                recipe_name = ingredients_strings[0]
-                try:
-                    recipe_rating = float(ingredients_strings[1].split(' ')[1])
-                except ValueError:
-                    recipe_rating = -1
-                ingredients = [split_ingredient(
-                    ingredient_str) for ingredient_str in ingredients_strings[2:]]
-
-                recipes[recipe_name] = [recipe_rating] + ingredients
-    return recipes
-
-
-def split_ingredient(ingredient_str):
+    # sorted so recipes (and the ingredient ids built from them) come in the same order everywhere
+    return [join(dirname, filename) for filename in sorted(os.listdir(dirname))
+            if filename != ".DS_Store" and isfile(join(dirname, filename))]
+
+
+def iter_recipe_files(dirname, workers=None, errors=None):
+    """
+    Reads and parses the recipe files in dirname on a pool of threads, and yields
+    (recipe name, [recipe rating] + ingredient dicts) for each one, in file name order.
+        Args:
+        dirname (str): name of the directory where recipe text files are.
+        workers (int): number of reader threads, by default one per CPU plus 4 for I/O
+        errors (list): if given, a ParseError is appended to it for each malformed line
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    window = workers * READ_AHEAD
+    paths = iter(recipe_file_paths(dirname))
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for file_path in paths:
+            pending.append(executor.submit(parse_recipe_file, file_path))
+            if len(pending) >= window:
+                break
+        while pending:
+            recipe_name, parse_store, file_errors = pending.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(executor.submit(parse_recipe_file, next_path))
+            if errors is not None:
+                errors.extend(file_errors)
+            yield recipe_name, parse_store
+
+
+def parse_recipe_file(file_path):
+    """
+    Parses one recipe text file, returning its name, [its rating] + its ingredient dicts,
+    and a list of ParseError for the lines that could not be parsed. Lines that can't be
+    split into an ingredient at all are left out.
+        Args:
+        file_path (str): path of the recipe text file
+    """
+    with open(file_path, "r") as file:
+        ingredients_strings = [ingredient.strip() for ingredient in file]
+    recipe_name = ingredients_strings[0]
+    try:
+        recipe_rating = float(ingredients_strings[1].split(' ')[1])
+    except ValueError:
+        recipe_rating = -1
+
+    errors = []
+    ingredients = []
+    filename = os.path.basename(file_path)
+    for line_number, ingredient_str in enumerate(ingredients_strings[2:], 3):
+        messages = []
+        try:
+            ingredients.append(split_ingredient(ingredient_str, messages))
+        except (IndexError, ValueError) as error:
+            messages.append(f'could not parse ingredient: {error}')
+        errors.extend(ParseError(filename, line_number, ingredient_str, message)
+                      for message in messages)
+    return recipe_name, [recipe_rating] + ingredients, errors
+
+
+def split_ingredient(ingredient_str, errors=None):
     """A helper function to take in a string representing an ingredient,
     and return a list in the form of a dictionary with keys: "amount", "name", "unit"
         Args:
         ingredient_str: string representing an ingredient from the text files of recipes.
+        errors (list): if given, a message is appended to it when the amount can't be parsed
     """
     ingredient_split = [part for part in ingredient_str.split(' ') if part]
     if ingredient_split[1][0] == "(":
         return parse_parenth_unit(ingredient_split)
     elif len(ingredient_split) <= 2 or ingredient_split[1] == 'large':
-        return parse_no_unit(ingredient_split)
+        return parse_no_unit(ingredient_split, errors)
 
     ingredient_dict = {"name": '', "unit": '', "amount": 0}
     try:
@@ -65,8 +133,9 @@ def split_ingredient(ingredient_str):
         ingredient_dict["name"] = ' '.join(ingredient_split[2:])
 
     except ValueError:
-        print("could not parse amount and unit from: " +
-              ' '.join(ingredient_split))
+        if errors is not None:
+            errors.append("could not parse amount and unit from: " +
+                          ' '.join(ingredient_split))
         ingredient_dict["name"] = ' '.join(ingredient_split)
 
     # trim extra words from things like: cream cheese, softened
@@ -74,10 +143,11 @@ def split_ingredient(ingredient_str):
     return ingredient_dict
 
 
-def parse_no_unit(ingredient_split):
+def parse_no_unit(ingredient_split, errors=None):
     """
     A helper function to parse a split ingredient string without a unit, 
-    such as "4 eggs". 
+    such as "4 eggs". Like split_ingredient, appends a message to errors
+    if it can't parse the amount.
     """
     ingredient_dict = {"name": '', "unit": '', "amount": 0}
     ingredient_dict["name"] = ' '.join(ingredient_split[1:])
@@ -85,8 +155,9 @@ def parse_no_unit(ingredient_split):
         ingredient_dict["amount"] = float(ingredient_split[0])
 
     except ValueError:
-        print("could not parse amount and unit from: " +
-              ' '.join(ingredient_split))
+        if errors is not None:
+            errors.append("could not parse amount and unit from: " +
+                          ' '.join(ingredient_split))
 
     if "egg" in ingredient_dict["name"]:
         ingredient_dict["name"] = "egg"
@@ -15,18 +15,30 @@ a new recipe object. This new recipe can be evaluated in three metrics:
 across our scraped recipes?)
 3. ingredient_similarity (do the extra ingredients pair particularly well or poorly?)
 
+and, optionally, a fourth:
+
+4. novelty (how far is this recipe from the closest recipe we scraped?)
+
 """
 
-import random
+import argparse
+import heapq
+import json
+import sys
 from math import log10
-from os import *
-from os.path import isfile
-from clean_text import get_recipe_dict
+from time import perf_counter
+from clean_text import get_recipe_dict, iter_recipe_files
 import unit_conversion as u_convert
 import numpy as np
-from itertools import combinations
 
-WORD_EMBED_VALS = np.load('ingred_word_emb.npy', allow_pickle=True).item()
+import instrument
+from embeddings import NeighborIndex, SimilarityMatrix, get_embeddings
+
+try:
+    from scipy import sparse
+except ImportError:
+    # RecipeIndex multiplies its sparse matrix with numpy alone instead
+    sparse = None
 
 
 def ingredient_similarity(n1, n2):
@@ -37,34 +49,7 @@ def ingredient_similarity(n1, n2):
         n1 (String): a string representing an ingredient name
         n2 (String): a string representing an ingredient name
     """
-    if " " not in n1 and " " not in n2:
-        return ingredient_vector(n1, n2)
-
-    biggest = -1
-    if " " not in n1:
-        for word in n2.split(" "):
-            vec = ingredient_vector(n1, word)
-            if vec:
-                biggest = max(biggest, vec)
-
-    elif " " not in n2:
-        for word in n1.split(" "):
-            vec = ingredient_vector(word, n2)
-            if vec:
-                biggest = max(biggest, vec)
-
-    else:
-        n1_words = n1.split(" ")
-        n2_words = n2.split(" ")
-        for n1 in n1_words:
-            for n2 in n2_words:
-                vec = ingredient_vector(n1, n2)
-                if vec:
-                    biggest = max(biggest, vec)
-
-    if biggest == -1:
-        return None
-    return biggest
+    return get_embeddings().similarity(n1, n2)
 
 
 def ingredient_vector(n1, n2):
@@ -75,47 +60,333 @@ def ingredient_vector(n1, n2):
         n1 (String): a string representing the name of an ingredient
         n2 (String): a string representing the name of an ingredient
     """
-    v1 = WORD_EMBED_VALS.get(n1, [])
-    v2 = WORD_EMBED_VALS.get(n2, [])
-
-    if len(v1) > 0 and len(v2) > 0:
-        return np.dot(v1, v2)
-    return None
+    return get_embeddings().word_similarity(n1, n2)
 
 
 class Population:
-    def __init__(self, recipes_list):
+    COMPARE_TO_CACHE_SIZE = 8
+    # how many of its nearest neighbors the guided sampler chooses each next extra from
+    NUM_NEIGHBORS = 32
+
+    def __init__(self, recipes_list, similarity_cache_path=None, seed=None):
         """Represents a population of recipes, from which the parents of each generation are chosen.
         parameters:
             recipes_list: a list of already instantiated recipe objects that will make up the initial population.
+            similarity_cache_path: an .npz file to save the ingredient similarity matrix in and
+            reuse it from, or None to only keep it in memory.
+            seed: an int or np.random.Generator seeding generate(), and generate_batch() when
+            it isn't given a seed of its own.
         """
         self.recipes_list = recipes_list
+        self.similarity_cache_path = similarity_cache_path
+        self.rng = np.random.default_rng(seed)
+        # indexes for explicit compare_to corpora, keyed by the identity and length of the list
+        self._compare_to_indexes = {}
+        self.index_recipes()
+
+    def index_recipes(self):
+        """
+        Builds the ingredient vocabulary and statistics derived from recipes_list.
+        Call this again after changing recipes_list in place, or use add_recipes and
+        remove_recipes to update them incrementally.
+        """
         self.all_ingredients = []
-        self.all_ingredient_objects = {}
+        # ingredient name -> its position in all_ingredients
+        self.ingredient_ids = {}
+        # ingredient name -> every amount it is used in, in recipe order
+        self.all_ingredient_amounts = {}
         for recipe in self.recipes_list:
-            for ingredient in recipe.ingredients_list:
-                if (ingredient.name not in self.all_ingredients):
-                    self.all_ingredients.append(ingredient.name)
+            for name, amount in zip(recipe.ingredient_names, recipe.amounts.tolist()):
+                if name not in self.ingredient_ids:
+                    self.ingredient_ids[name] = len(self.all_ingredients)
+                    self.all_ingredients.append(name)
+                self.all_ingredient_amounts.setdefault(name, []).append(amount)
+
+        # ingredient name -> occurrences across recipes_list, used as the idf denominator
+        self.document_frequency = self.count_occurrences(self.recipes_list)
+        self._ranking = None
+        self._compare_to_indexes.clear()
+        self._ingredient_objects = None
+        self._amounts = None
+        self._amount_samples = None
+        self._similarities = None
+        self._neighbors = None
+        # (num_core, k) -> (ranking, neighbors, the extra pool's neighbor arrays)
+        self._extra_neighbors = {}
+        self._recipe_index = None
+        # num_core -> (ranking, core sampler, extra sampler)
+        self._samplers = {}
+
+    def add_recipes(self, recipes):
+        """
+        Adds recipes to the population (and to recipes_list), updating the vocabulary,
+        frequencies and amount statistics in place instead of re-indexing every recipe.
+        Args:
+            recipes (list[Recipe]): the recipes to add
+        """
+        new_names = False
+        for recipe in recipes:
+            for name in recipe.ingredient_names:
+                if name not in self.ingredient_ids:
+                    self.ingredient_ids[name] = len(self.all_ingredients)
+                    self.all_ingredients.append(name)
+                    new_names = True
+        if self._amounts is not None:
+            self._amounts.grow(len(self.all_ingredients))
+
+        for recipe in recipes:
+            self.recipes_list.append(recipe)
+            for name, amount in zip(recipe.ingredient_names, recipe.amounts.tolist()):
+                self.all_ingredient_amounts.setdefault(name, []).append(amount)
+                self.document_frequency[name] = self.document_frequency.get(name, 0) + 1
+                if self._amounts is not None:
+                    self._amounts.add(self.ingredient_ids[name], amount)
+
+        self._ranking = None
+        self._ingredient_objects = None
+        self._amount_samples = None
+        self._recipe_index = None
+        # compare_to lists are usually built from recipes_list, so they are counted again
+        self._compare_to_indexes.clear()
+        # similarities only depend on which names exist, and old ids never move
+        if new_names:
+            self._similarities = None
+            self._neighbors = None
+
+    def remove_recipes(self, recipes):
+        """
+        Removes recipes from the population (and from recipes_list), updating the
+        frequencies and amount statistics of just the ingredients they use. An ingredient
+        left in no recipe keeps its id, but is no longer counted or generated.
+        Args:
+            recipes (list[Recipe]): recipes that are currently in the population
+        """
+        removing = {id(recipe) for recipe in recipes}
+        kept = [recipe for recipe in self.recipes_list
+                if id(recipe) not in removing]
+        if len(self.recipes_list) - len(kept) != len(removing):
+            raise ValueError('can only remove recipes that are in the population')
+        self.recipes_list[:] = kept
+
+        # the amounts to drop, grouped by name. Equal amounts are interchangeable, so
+        # dropping the first equal one leaves the same list as dropping the recipe's own
+        removed_amounts = {}
+        for recipe in recipes:
+            for name, amount in zip(recipe.ingredient_names, recipe.amounts.tolist()):
+                removed_amounts.setdefault(name, []).append(amount)
+                self.document_frequency[name] -= 1
+
+        for name, removed in removed_amounts.items():
+            amounts = self.all_ingredient_amounts[name]
+            for amount in removed:
+                amounts.remove(amount)
+            if not amounts:
+                del self.all_ingredient_amounts[name]
+                del self.document_frequency[name]
+            if self._amounts is not None:
+                self._amounts.update(self.ingredient_ids[name], amounts)
+
+        self._ranking = None
+        self._ingredient_objects = None
+        self._amount_samples = None
+        self._recipe_index = None
+        self._compare_to_indexes.clear()
+
+    @property
+    def all_ingredient_objects(self):
+        """
+        Every use of each ingredient as an IngredientView of its recipe, keyed by name and
+        in recipe order, built on first use and kept until the recipes change. Changing
+        one changes its recipe, but not the population's statistics.
+        """
+        if self._ingredient_objects is None:
+            objects = {}
+            names = VOCABULARY.names
+            for recipe in self.recipes_list:
+                for index, ingredient_id in enumerate(recipe.ingredient_ids.tolist()):
+                    objects.setdefault(names[ingredient_id], []).append(
+                        IngredientView(recipe, index))
+            self._ingredient_objects = objects
+        return self._ingredient_objects
+
+    @property
+    def ranking(self):
+        """
+        The ingredients ordered by frequency, built on first use and kept until the recipes change.
+        """
+        if self._ranking is None:
+            self._ranking = IngredientRanking(
+                self.document_frequency, self.all_ingredients)
+        return self._ranking
+
+    @property
+    def amounts(self):
+        """
+        The amounts each ingredient is used in, as arrays indexed by ingredient id. Built on
+        first use and kept until the recipes change.
+        """
+        if self._amounts is None:
+            self._amounts = IngredientAmounts(
+                [self.all_ingredient_amounts.get(name, []) for name in self.all_ingredients])
+        return self._amounts
+
+    @property
+    def amount_samples(self):
+        """
+        Every amount each ingredient is used in, as one flat array grouped by ingredient id,
+        and the offset of each id's group: values[offsets[i]:offsets[i] + amounts.counts[i]].
+        Built on first use and kept until the recipes change.
+        """
+        if self._amount_samples is None:
+            values = np.array([amount for name in self.all_ingredients
+                               for amount in self.all_ingredient_amounts.get(name, [])],
+                              dtype=float)
+            counts = self.amounts.counts
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+            self._amount_samples = (values, offsets)
+        return self._amount_samples
+
+    def amount_quantiles(self, quantiles):
+        """
+        Returns a (len(quantiles), number of ingredients) array of the quantiles of each
+        ingredient's amounts, interpolated linearly like np.quantile. Ingredients no recipe
+        uses any more get NaN.
+        Args:
+            quantiles (list[float]): the quantiles to compute, each between 0 and 1
+        """
+        values, offsets = self.amount_samples
+        counts = self.amounts.counts
+        quantiles = np.asarray(quantiles, dtype=float)[:, None]
+        # sort the amounts within each ingredient's group
+        ordered = values[np.lexsort((values, np.repeat(np.arange(len(counts)), counts)))]
+
+        position = quantiles * np.maximum(counts - 1, 0)
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, np.maximum(counts - 1, 0))
+        fraction = position - below
+        if not len(ordered):
+            return np.full((len(quantiles), len(counts)), np.nan)
+        low = ordered[np.minimum(offsets + below, len(ordered) - 1)]
+        high = ordered[np.minimum(offsets + above, len(ordered) - 1)]
+        return np.where(counts > 0, low + (high - low) * fraction, np.nan)
+
+    @property
+    def similarities(self):
+        """
+        A SimilarityMatrix of ingredient_similarity between every pair of ingredients, with
+        rows and columns in ingredient id order. Built (or loaded from
+        similarity_cache_path) on first use, and kept until new ingredient names appear.
+        """
+        if self._similarities is None:
+            if self.similarity_cache_path:
+                self._similarities = SimilarityMatrix.load_or_build(
+                    self.all_ingredients, self.similarity_cache_path)
+            else:
+                self._similarities = SimilarityMatrix.build(self.all_ingredients)
+        return self._similarities
+
+    def samplers(self, num_core):
+        """
+        Returns (core sampler, extra sampler): WeightedSamplers of the ingredient ids in
+        ranking.pool_arrays(num_core), the core weighted by frequency and the extras
+        uniform. Built once for each split and kept until the recipes change.
+        Args:
+            num_core (int): how many of the most frequent ingredients make up the core pool
+        """
+        cached = self._samplers.get(num_core)
+        if cached is None or cached[0] is not self.ranking:
+            core_ids, core_weights, extra_ids = self.ranking.pool_arrays(num_core)
+            cached = (self.ranking, WeightedSampler(core_ids, core_weights, self.rng),
+                      WeightedSampler(extra_ids, seed=self.rng))
+            self._samplers[num_core] = cached
+        return cached[1:]
+
+    @property
+    def recipe_index(self):
+        """
+        A RecipeIndex of recipes_list, with columns in ingredient id order. Built on first
+        use and kept until the recipes change.
+        """
+        if self._recipe_index is None:
+            self._recipe_index = RecipeIndex(self.recipes_list, self.ingredient_ids)
+        return self._recipe_index
+
+    @property
+    def neighbors(self):
+        """
+        A NeighborIndex of every ingredient, with rows in ingredient id order. Built on
+        first use, and kept until new ingredient names appear.
+        """
+        if self._neighbors is None:
+            self._neighbors = NeighborIndex.build(self.all_ingredients)
+        return self._neighbors
+
+    def extra_neighbors(self, num_core, k=NUM_NEIGHBORS):
+        """
+        Returns the k nearest neighbors of each ingredient in the extra pool of
+        ranking.pool_arrays(num_core), among the rest of that pool, as (positions in the
+        pool, cosine similarities): two (pool size, k) arrays padded with -1 and NaN.
+        Computed once for each split and kept until the recipes change.
+        Args:
+            num_core (int): how many of the most frequent ingredients make up the core pool
+            k (int): how many neighbors to find for each extra
+        """
+        cached = self._extra_neighbors.get((num_core, k))
+        if cached is None or cached[0] is not self.ranking or cached[1] is not self.neighbors:
+            extra_ids = self.ranking.pool_arrays(num_core)[2]
+            neighbor_ids, similarities = self.neighbors.query(extra_ids, k, among=extra_ids)
+            # ingredient id -> position in the extra pool, with a last -1 for the padding
+            positions = np.full(len(self.all_ingredients) + 1, -1, dtype=np.int64)
+            positions[extra_ids] = np.arange(len(extra_ids))
+            cached = (self.ranking, self.neighbors, (positions[neighbor_ids], similarities))
+            self._extra_neighbors[(num_core, k)] = cached
+        return cached[2]
+
+    @staticmethod
+    def count_occurrences(recipes):
+        """
+        Counts how many times each ingredient name shows up across a list of recipes.
+        An ingredient listed twice in one recipe counts twice, as the original idf scan did.
+        Args:
+            recipes (list[Recipe]): the recipes to count ingredients in
+        """
+        occurrences = {}
+        for recipe in recipes:
+            for name in recipe.ingredient_names:
+                occurrences[name] = occurrences.get(name, 0) + 1
+        return occurrences
+
+    def frequency_index(self, compare_to=None):
+        """
+        Returns the ingredient occurrence counts for compare_to, building them at most
+        once for each compare_to list. The counts are looked up by the identity and length
+        of the list object, so a lookup costs the same however many recipes it holds, and
+        a list that grew or shrank is counted again. Replacing the recipes of a cached list
+        without changing its length isn't noticed; pass a new list instead. The
+        population's own recipes_list always uses document_frequency.
+        Args:
+            compare_to (list[Recipe]): the other recipes to compare against
+        """
+        if not compare_to or compare_to is self.recipes_list:
+            return self.document_frequency
 
-                if ingredient.name in self.all_ingredient_objects:
-                    self.all_ingredient_objects[ingredient.name].append(
-                        ingredient)
-                else:
-                    self.all_ingredient_objects.update(
-                        {ingredient.name: [ingredient]})
+        key = (id(compare_to), len(compare_to))
+        cached = self._compare_to_indexes.get(key)
+        if cached is None:
+            if len(self._compare_to_indexes) >= Population.COMPARE_TO_CACHE_SIZE:
+                # drop the oldest corpus
+                del self._compare_to_indexes[next(
+                    iter(self._compare_to_indexes))]
+            # the list is kept alive with the index so its id can't be reused
+            cached = (compare_to, self.count_occurrences(compare_to))
+            self._compare_to_indexes[key] = cached
+        return cached[1]
 
     def freq_ingredients(self):
         """
         Store each ingredient name and its frequency in a dictionary. 
         """
-        freqency_map = {}
-        for recipe in self.recipes_list:
-            for ingredient in recipe.ingredients_list:
-                if ingredient.name in freqency_map:
-                    freqency_map[ingredient.name] += 1
-                else:
-                    freqency_map.update({ingredient.name: 1})
-        return freqency_map
+        return dict(self.document_frequency)
 
     def generate(self, num_core, num_extras):
         """Generate a recipe from picking certain number of core and extra ingredients by number of
@@ -125,89 +396,221 @@ class Population:
                 when num_core is greater ten, the function generate ten out of num_core by probabilities,
                 and when num_core is less than ten the function selects num_core core ingredients
                 num_extras: number of extra ingredients desired. Selected from the ingreidents left
-                after core ingredients have been selected.
+                after the top num_core ingredients.
+        Every random choice is drawn from the population's rng, with the samplers(num_core).
         """
-        freqency_map = self.freq_ingredients()
-        output_ingredient_list = []
-        self.all_ingredients.sort(
-            key=lambda ingredient: freqency_map.get(ingredient), reverse=True)
-        core = self.all_ingredients[:num_core]
+        core_sampler, extra_sampler = self.samplers(num_core)
+        rng = self.rng
 
         # select 10 core ingredients probabilistically from top num_core ingredients
         # unless num_core is less than 10, in which case just pick the top core_num ingredients
-        ingre_freq = [freqency_map.get(ingre)
-                      for ingre in self.all_ingredients][:num_core]
-        while len(output_ingredient_list) < Recipe.NUM_CORE:
-            if (len(output_ingredient_list) == num_core):
-                break
-            ingredient = random.choices(core, weights=ingre_freq)[0]
-            core.remove(ingredient)
-            ingre_freq = [freqency_map.get(ingre)
-                          for ingre in core]
-
-            ingredient_objects = self.all_ingredient_objects.get(ingredient)
-            high = max(
-                i.amount for i in ingredient_objects)
-            low = min(
-                i.amount for i in ingredient_objects)
-            new_amount = random.uniform(low, high)
-            output_ingredient_list.append(
-                Ingredient(ingredient, new_amount))
-
-        # and the rest is the extra pool
-        extra = list(set(self.all_ingredients) - set(core))
-        i = num_extras
-        selected_extra_ingredients = []
-        while i > 0:
-            extra_ingredient_name = random.choice(extra)
-            selected_extra_ingredients.append(extra_ingredient_name)
-            extra.remove(extra_ingredient_name)
-            extra_objects = self.all_ingredient_objects.get(
-                extra_ingredient_name)
-            extra_amount = random.choice(extra_objects)
-            output_ingredient_list.append(
-                Ingredient(extra_ingredient_name, extra_amount.amount))
-            i -= 1
-        recipe_name = random.choice(selected_extra_ingredients)
-        recipe_name += " cookie"
-
-        return GeneratedRecipe(recipe_name, output_ingredient_list)
-
-    def fitness(self, recipe, compare_to=None):
+        core_ids = core_sampler.sample(min(num_core, Recipe.NUM_CORE), rng=rng)[0]
+        core_amounts = rng.uniform(self.amounts.low[core_ids], self.amounts.high[core_ids])
+
+        # and the rest is the extra pool, each extra reusing the amount of a random recipe
+        extra_ids = extra_sampler.sample(num_extras, rng=rng)[0]
+        values, offsets = self.amount_samples
+        extra_amounts = values[offsets[extra_ids] + (
+            rng.random(num_extras) * self.amounts.counts[extra_ids]).astype(np.int64)]
+        recipe_name = self.all_ingredients[extra_ids[rng.integers(num_extras)]] + " cookie"
+
+        ids = np.concatenate((core_ids, extra_ids)).tolist()
+        amounts = np.concatenate((core_amounts, extra_amounts)).tolist()
+        return GeneratedRecipe(recipe_name,
+                               [Ingredient(self.all_ingredients[ingredient_id], amount)
+                                for ingredient_id, amount in zip(ids, amounts)])
+
+    def generate_batch(self, n, num_core, extras_range=(4, 6), seed=None, temperature=None,
+                       num_neighbors=NUM_NEIGHBORS):
+        """
+        Generates n recipes at once the same way generate() does, but stores them as arrays
+        in a RecipeBatch instead of building Ingredient and GeneratedRecipe objects.
+        With a temperature, the extras are picked by _guided_extras instead of uniformly.
+            Args:
+                n (int): number of recipes to generate
+                num_core (int): number of top ingredients the core ingredients are chosen from
+                extras_range (tuple[int, int]): the smallest and largest number of extra
+                ingredients, both inclusive
+                seed (int or np.random.Generator): seeds the random choices; the
+                population's own rng by default
+                temperature (float): how weakly the extras favor ingredients similar to the
+                ones already picked, or None to pick them uniformly
+                num_neighbors (int): how many neighbors of each picked extra the next one
+                may be, when there is a temperature
+        """
+        rng = self.rng if seed is None else np.random.default_rng(seed)
+        core_sampler, extra_sampler = self.samplers(num_core)
+        core_ids, _, extra_ids = self.ranking.pool_arrays(num_core)
+        amounts = self.amounts
+        min_extras, max_extras = extras_range
+        if max_extras > len(extra_ids):
+            raise ValueError(f'can not pick {max_extras} extras from '
+                             f'{len(extra_ids)} ingredients')
+        num_picked = min(num_core, Recipe.NUM_CORE, len(core_ids))
+        width = num_picked + max_extras
+
+        ingredient_ids = np.full((n, width), -1, dtype=np.int64)
+        batch_amounts = np.zeros((n, width))
+
+        ingredient_ids[:, :num_picked] = core_sampler.sample(num_picked, n, rng)
+        low = amounts.low[ingredient_ids[:, :num_picked]]
+        high = amounts.high[ingredient_ids[:, :num_picked]]
+        batch_amounts[:, :num_picked] = rng.uniform(low, high)
+
+        if temperature is not None:
+            if temperature <= 0:
+                raise ValueError(f'temperature must be positive, not {temperature}')
+            extras = extra_ids[self._guided_extras(rng, n, max_extras, num_core, temperature,
+                                                   num_neighbors)]
+        else:
+            extras = extra_sampler.sample(max_extras, n, rng)
+        num_extras = rng.integers(min_extras, max_extras + 1, size=n)
+        extra_mask = np.zeros((n, width), dtype=bool)
+        extra_mask[:, num_picked:] = np.arange(max_extras) < num_extras[:, None]
+
+        # each extra reuses the amount from a random recipe that has it
+        values, offsets = self.amount_samples
+        sample = offsets[extras] + \
+            (rng.random((n, max_extras)) * amounts.counts[extras]).astype(np.int64)
+        ingredient_ids[:, num_picked:] = extras
+        batch_amounts[:, num_picked:] = values[sample]
+        ingredient_ids[~extra_mask & (np.arange(width) >= num_picked)] = -1
+        batch_amounts[ingredient_ids < 0] = 0
+
+        # normalize each recipe to 1000 grams, like Recipe.normalize
+        totals = batch_amounts.sum(axis=1, keepdims=True)
+        batch_amounts = np.round(batch_amounts * (1000 / totals), 3)
+
+        core_mask = np.zeros((n, width), dtype=bool)
+        core_mask[:, :num_picked] = True
+        name_ids = extras[np.arange(n), (rng.random(n) * num_extras).astype(np.int64)]
+        names = [self.all_ingredients[name_id] + " cookie" for name_id in name_ids]
+        return RecipeBatch(ingredient_ids, batch_amounts, core_mask, extra_mask,
+                           names, self.all_ingredients)
+
+    def _guided_extras(self, rng, n, num_extras, num_core, temperature, num_neighbors):
+        """
+        Returns an (n, num_extras) array of distinct positions in the extra pool. The first
+        extra of each recipe is uniform. Each one after it is a neighbor of an extra already
+        picked, chosen with weight exp(cosine similarity / temperature) for every picked
+        extra it neighbors, so a low temperature favors ingredients close to all of them
+        and a high one picks almost uniformly among the neighbors. A recipe whose picked
+        extras have no neighbors left falls back to a uniform pick.
+        """
+        pool_size = len(self.ranking.pool_arrays(num_core)[2])
+        neighbors, similarities = self.extra_neighbors(num_core, num_neighbors)
+        # similarities are at most 1, so subtracting 1 keeps the exponent from overflowing
+        weights = np.where(neighbors >= 0,
+                           np.exp((np.nan_to_num(similarities, nan=-1) - 1) / temperature), 0)
+        extras = np.zeros((n, num_extras), dtype=np.int64)
+        # a block of rows at a time, so the mask of taken extras stays a bounded size
+        block = max(1, WeightedSampler.BLOCK_SIZE // (pool_size + 1))
+        for start in range(0, n, block):
+            extras[start:start + block] = _guided_rows(
+                rng, min(block, n - start), num_extras, pool_size, neighbors, weights)
+        return extras
+
+    def fitness(self, recipe, compare_to=None, novelty=False):
         """
         Returns a score from 0-1 (usually) saying, on average, how fit this cookie is against our chosen metrics (novelty and value)
         Args:
-            compare_to (list[Recipe]): the other recipes to compare against
+            compare_to (list[Recipe]): the other recipes to compare against, see frequency_index
+            novelty (bool): whether to also average in novelty(recipe)
         """
         evaluations = [self.recipe_tf_idf(
             recipe, compare_to), self.core_fitness(recipe)]
-        similarity = recipe.extras_similarity()
+        similarity = recipe.extras_similarity(self.similarities)
         if similarity:
             evaluations.append(similarity)
+        if novelty:
+            evaluations.append(self.novelty(recipe))
 
         return sum(evaluations) / len(evaluations)
 
+    def fitness_batch(self, batch, compare_to=None, novelty=False, similarity=None):
+        """
+        Scores every recipe of a RecipeBatch with the same metrics as fitness(), using
+        array operations over the whole batch. Where fitness() would raise ZeroDivisionError
+        because an extra ingredient is missing from compare_to, the scores are NaN instead.
+        Args:
+            batch (RecipeBatch): the recipes to score, with ids from this population
+            compare_to (list[Recipe]): the other recipes to compare against, see frequency_index
+            novelty (bool): whether to also average in each recipe's novelty
+            similarity (np.ndarray): if given, the already known extras similarity of each
+                recipe, NaN where it has none, which is used instead of computing it
+        """
+        ids = batch.ingredient_ids
+        used = ids >= 0
+        safe_ids = np.where(used, ids, 0)
+        num_ingredients = used.sum(axis=1)
+
+        # recipe_tf_idf
+        occurrences = self.frequency_index(compare_to)
+        num_recipes = len(compare_to) if compare_to else len(self.recipes_list)
+        counts = np.array([occurrences.get(name, 0)
+                           for name in self.all_ingredients], dtype=float)
+        with np.errstate(divide='ignore'):
+            idf = np.where(counts > 0, np.log10(num_recipes / counts), np.nan)
+        tf = batch.amounts / (num_ingredients[:, None] * 20)
+        tf_idf = np.where(batch.extra_mask, tf * idf[safe_ids], 0).sum(axis=1) / \
+            batch.extra_mask.sum(axis=1)
+
+        # core_fitness
+        average = self.amounts.mean[safe_ids]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance = np.abs((average - batch.amounts) / average)
+        core_fitness = np.where(batch.core_mask, distance, 0).sum(axis=1) / Recipe.NUM_CORE
+
+        # extras_similarity, over every pair of extra slots
+        if similarity is None:
+            extra_ids = np.where(batch.extra_mask, ids, -1)
+            first, second = np.triu_indices(ids.shape[1], 1)
+            pairs = (extra_ids[:, first] >= 0) & (extra_ids[:, second] >= 0)
+            pair_similarities = self.similarities.values[safe_ids[:, first],
+                                                         safe_ids[:, second]]
+            pairs &= ~np.isnan(pair_similarities) & (pair_similarities != 0)
+            num_pairs = pairs.sum(axis=1)
+            with np.errstate(invalid='ignore'):
+                similarity = np.where(pairs, pair_similarities, 0).sum(axis=1) / num_pairs
+            similarity = np.where(num_pairs > 0, similarity, np.nan)
+        else:
+            similarity = np.asarray(similarity, dtype=float)
+
+        # a missing (or zero) similarity leaves it out of the average
+        has_similarity = ~np.isnan(similarity) & (similarity != 0)
+        total = tf_idf + core_fitness + np.where(has_similarity, similarity, 0)
+        if not novelty:
+            fitness = total / np.where(has_similarity, 3, 2)
+            return BatchFitness(tf_idf, core_fitness, similarity, fitness)
+
+        nearest, distances = self.recipe_index.nearest(batch)
+        fitness = (total + distances) / np.where(has_similarity, 4, 3)
+        return BatchFitness(tf_idf, core_fitness, similarity, fitness, distances, nearest)
+
+    def novelty(self, recipe):
+        """
+        Returns how far a recipe is from the closest recipe in recipes_list, from 0 for the
+        same proportions of the same ingredients to 1 for no ingredient in common. See
+        RecipeIndex.nearest.
+        Args:
+            recipe (Recipe): the recipe to compare, whose ingredients are all in this population
+        """
+        return float(self.recipe_index.nearest(RecipeBatch.from_recipes([recipe], self))[1][0])
+
     def recipe_tf_idf(self, recipe, compare_to=None):
         """
         Returns a score from 0-1 (usually) describing, on average, how much each ingredient is unique to this recipe relative to other recipes.
         Args:
-            compare_to (list[Recipe]): the other recipes to compare against
+            compare_to (list[Recipe]): the other recipes to compare against, see frequency_index
         """
-        if not compare_to:
-            compare_to = self.recipes_list
+        occurrences = self.frequency_index(compare_to)
+        num_recipes = len(compare_to) if compare_to else len(self.recipes_list)
         tf_idf_list = []
-        # for ingredient in recipe.ingredients_list[-recipe.num_extras:]:
         for ingredient in recipe.extra_ingredients:
-            tf = ingredient.amount / (len(recipe.ingredients_list) * 20)
+            tf = ingredient.amount / (recipe.num_of_ingredients * 20)
 
-            # idf = log(len(compare_to) / total occurrences (OR amount) in compare_to)
-            total_occurrences = 0
-            for other_recipe in compare_to:
-                for other_ingredient in other_recipe.ingredients_list:
-                    if other_ingredient.name == ingredient.name:
-                        total_occurrences += 1
-
-            idf = log10(len(compare_to) / total_occurrences)
+            # idf = log(len(compare_to) / total occurrences in compare_to)
+            idf = log10(num_recipes / occurrences.get(ingredient.name, 0))
             tf_idf = tf * idf
             tf_idf_list.append(tf_idf)
 
@@ -222,14 +625,9 @@ class Population:
             recipe_dict ([string: list(recipe)]): the recipes parsed to compare with
         """
         score = 0
+        mean = self.amounts.mean
         for ingredient in recipe.core_ingredients:
-            ingredient_name = ingredient.name
-            ingredient_object_list = self.all_ingredient_objects.get(
-                ingredient_name)
-            sum = 0
-            for object in ingredient_object_list:
-                sum += object.amount
-            average_amount = sum / len(ingredient_object_list)
+            average_amount = float(mean[self.ingredient_ids[ingredient.name]])
             fitness = (average_amount - ingredient.amount) / average_amount
             if fitness < 0:
                 fitness *= -1
@@ -238,38 +636,372 @@ class Population:
         return score / Recipe.NUM_CORE
 
 
+def _guided_rows(rng, n, num_extras, pool_size, neighbors, weights):
+    """
+    Does the sampling of Population._guided_extras for n rows at once.
+    Args:
+        rng (np.random.Generator): draws the extras
+        n (int): how many rows to draw
+        num_extras (int): how many extras each row draws
+        pool_size (int): how many extras there are
+        neighbors (np.ndarray): (pool_size, k) the neighbors of each extra, -1 padded
+        weights (np.ndarray): (pool_size, k) the weight of each neighbor, 0 for padding
+    """
+    extras = np.zeros((n, num_extras), dtype=np.int64)
+    extras[:, 0] = rng.integers(pool_size, size=n)
+    rows = np.arange(n)
+    # which extras each recipe has, plus a last column for the -1 padding
+    taken = np.zeros((n, pool_size + 1), dtype=bool)
+    taken[:, -1] = True
+    for column in range(1, num_extras):
+        taken[rows, extras[:, column - 1]] = True
+        picked = extras[:, :column]
+        candidates = neighbors[picked].reshape(n, -1)
+        candidate_weights = np.where(taken[rows[:, None], candidates], 0,
+                                     weights[picked].reshape(n, -1))
+
+        # inverse transform sampling over each row's candidates
+        totals = np.cumsum(candidate_weights, axis=1)
+        targets = rng.random(n) * totals[:, -1]
+        chosen = np.minimum((totals <= targets[:, None]).sum(axis=1),
+                            candidates.shape[1] - 1)
+        extras[:, column] = candidates[rows, chosen]
+
+        stuck = np.flatnonzero(totals[:, -1] <= 0)
+        if len(stuck):
+            # the unpicked extra with the largest random key is a uniform pick
+            keys = rng.random((len(stuck), pool_size))
+            keys[taken[stuck, :-1]] = -1
+            extras[stuck, column] = keys.argmax(axis=1)
+    return extras
+
+
+class IngredientRanking:
+    def __init__(self, frequencies, ingredient_names):
+        """
+        Orders ingredient names from most to least frequent and splits that order into the
+        core and extra pools generate() draws from.
+        Args:
+            frequencies (dict[str: int]): ingredient name -> number of occurrences in the recipes
+            ingredient_names (list[str]): every ingredient name, in the order it was first seen
+        """
+        self.frequencies = frequencies
+        self.ingredient_names = ingredient_names
+        # sorted() is stable, so ties keep the order the ingredients were first seen in.
+        # Names no recipe uses any more have no frequency and are left out.
+        self.ranked = sorted(
+            [name for name in ingredient_names if name in frequencies],
+            key=lambda name: frequencies.get(name), reverse=True)
+        self._pools = {}
+        self._pool_arrays = {}
+
+    def pools(self, num_core):
+        """
+        Returns a tuple of (core names, core weights, extra names) for the top num_core
+        ingredients. Each split is computed once and reused.
+        Args:
+            num_core (int): how many of the most frequent ingredients make up the core pool
+        """
+        pools = self._pools.get(num_core)
+        if pools is None:
+            core = tuple(self.ranked[:num_core])
+            core_weights = tuple(self.frequencies[name] for name in core)
+            extra = tuple(self.ranked[num_core:])
+            pools = (core, core_weights, extra)
+            self._pools[num_core] = pools
+        return pools
+
+    def pool_arrays(self, num_core):
+        """
+        Returns the same split as pools(), as arrays of ingredient ids (positions in the
+        ingredient_names this ranking was built from) and float weights.
+        Args:
+            num_core (int): how many of the most frequent ingredients make up the core pool
+        """
+        arrays = self._pool_arrays.get(num_core)
+        if arrays is None:
+            ids = {name: index for index,
+                   name in enumerate(self.ingredient_names)}
+            core, core_weights, extra = self.pools(num_core)
+            arrays = (np.array([ids[name] for name in core], dtype=np.int64),
+                      np.array(core_weights, dtype=float),
+                      np.array([ids[name] for name in extra], dtype=np.int64))
+            self._pool_arrays[num_core] = arrays
+        return arrays
+
+
+class WeightedSampler:
+    # the most random keys one block of rows draws at once, bounding the memory of a draw
+    BLOCK_SIZE = 1 << 22
+
+    def __init__(self, items, weights=None, seed=None):
+        """
+        This class draws items at random without replacement, with chances proportional to
+        their weights, or uniformly without weights. It is built once and draws whole
+        batches of selections per call.
+        Args:
+            items (np.ndarray): what to draw, such as ingredient ids
+            weights (np.ndarray): the positive weight of each item, or None for uniform draws
+            seed (int or np.random.Generator): seeds the draws that aren't given an rng
+        """
+        self.items = np.asarray(items)
+        self.log_weights = None if weights is None else np.log(np.asarray(weights, dtype=float))
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.items)
+
+    def sample(self, k, n=1, rng=None):
+        """
+        Returns an (n, k) array whose rows are each k distinct items. Weighted rows are the
+        k largest Gumbel-perturbed log weights, in the order one-at-a-time weighted draws
+        would make them. Uniform rows draw k items with replacement and draw the repeats
+        again, unless k is more than a sixteenth of the items, when they are the k largest
+        of plain random keys. Keys are drawn a block of rows at a time.
+        Args:
+            k (int): how many items each row draws
+            n (int): how many rows to draw
+            rng (np.random.Generator): draws with this instead of the sampler's own
+        """
+        rng = self.rng if rng is None else rng
+        if k > len(self.items):
+            raise ValueError(f'can not draw {k} of {len(self.items)} items')
+        if k <= 0:
+            return self.items[np.zeros((n, 0), dtype=np.int64)]
+        # redrawing repeats gets slower than keys once k is a sixteenth of the items
+        if self.log_weights is None and k * 16 <= len(self.items):
+            return self.items[self._distinct_rows(k, n, rng)]
+        positions = np.empty((n, k), dtype=np.int64)
+        block = max(1, self.BLOCK_SIZE // len(self.items))
+        for start in range(0, n, block):
+            positions[start:start + block] = self._top_keys(k, min(block, n - start), rng)
+        return self.items[positions]
+
+    def _distinct_rows(self, k, n, rng):
+        """
+        Returns (n, k) uniform positions, distinct within each row. Any repeat of an
+        earlier position in its row is drawn again until none are left. Nothing here
+        favors one item over another, so every ordered row of distinct items is as likely.
+        """
+        size = len(self.items)
+        positions = rng.integers(size, size=(n, k))
+        pending = np.arange(n)
+        while len(pending):
+            rows = positions[pending]
+            order = np.argsort(rows, axis=1, kind='stable')
+            ordered = np.take_along_axis(rows, order, axis=1)
+            repeats = np.zeros(rows.shape, dtype=bool)
+            np.put_along_axis(repeats, order[:, 1:], ordered[:, 1:] == ordered[:, :-1],
+                              axis=1)
+            has_repeats = repeats.any(axis=1)
+            pending = pending[has_repeats]
+            rows = rows[has_repeats]
+            repeats = repeats[has_repeats]
+            rows[repeats] = rng.integers(size, size=int(repeats.sum()))
+            positions[pending] = rows
+        return positions
+
+    def _top_keys(self, k, n, rng):
+        """
+        Returns (n, k) positions of the k largest random keys of each row, largest first.
+        """
+        if self.log_weights is None:
+            keys = rng.random((n, len(self.items)))
+        else:
+            keys = self.log_weights + rng.gumbel(size=(n, len(self.items)))
+        if k * 4 >= len(self.items):
+            # sorting everything is cheaper than partitioning first
+            return np.argsort(-keys, axis=1)[:, :k]
+        top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(keys, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+
+class IngredientAmounts:
+    def __init__(self, ingredient_amounts):
+        """
+        Summarizes the amounts each ingredient is used in as arrays indexed by ingredient id.
+        An ingredient no longer used by any recipe has a count of 0 and NaN statistics.
+        Args:
+            ingredient_amounts (list[list[float]]): every amount each id is used in
+        """
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.totals = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.low = np.zeros(0)
+        self.high = np.zeros(0)
+        self.grow(len(ingredient_amounts))
+        for ingredient_id, amounts in enumerate(ingredient_amounts):
+            self.update(ingredient_id, amounts)
+
+    def grow(self, num_ingredients):
+        """
+        Makes room for ingredient ids up to num_ingredients - 1, for new ingredients that
+        aren't used yet.
+        Args:
+            num_ingredients (int): the new number of ingredient ids
+        """
+        extra = num_ingredients - len(self.counts)
+        if extra > 0:
+            self.counts = np.concatenate((self.counts, np.zeros(extra, dtype=np.int64)))
+            self.totals = np.concatenate((self.totals, np.zeros(extra)))
+            self.mean = np.concatenate((self.mean, np.full(extra, np.nan)))
+            self.low = np.concatenate((self.low, np.full(extra, np.nan)))
+            self.high = np.concatenate((self.high, np.full(extra, np.nan)))
+
+    def add(self, ingredient_id, amount):
+        """
+        Counts one more use of an ingredient.
+        Args:
+            ingredient_id (int): the ingredient's id
+            amount (float): the amount it is used in
+        """
+        self.counts[ingredient_id] += 1
+        self.totals[ingredient_id] += amount
+        self.mean[ingredient_id] = self.totals[ingredient_id] / \
+            self.counts[ingredient_id]
+        self.low[ingredient_id] = np.fmin(self.low[ingredient_id], amount)
+        self.high[ingredient_id] = np.fmax(self.high[ingredient_id], amount)
+
+    def update(self, ingredient_id, amounts):
+        """
+        Recomputes one ingredient's statistics from all of its amounts.
+        Args:
+            ingredient_id (int): the ingredient's id
+            amounts (list[float]): every remaining amount the ingredient is used in
+        """
+        self.counts[ingredient_id] = len(amounts)
+        self.totals[ingredient_id] = sum(amounts)
+        self.mean[ingredient_id] = sum(amounts) / len(amounts) if amounts else np.nan
+        self.low[ingredient_id] = min(amounts) if amounts else np.nan
+        self.high[ingredient_id] = max(amounts) if amounts else np.nan
+
+
+class Vocabulary:
+    __slots__ = ('names', 'ids')
+
+    def __init__(self):
+        """
+        This class interns ingredient names to integer ids, so recipes can store ids
+        instead of a string per ingredient. Ids are never reused or removed.
+        """
+        self.names = []
+        # ingredient name -> its position in names
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """
+        Returns the id of an ingredient name, giving it the next id if it is new.
+        """
+        ingredient_id = self.ids.get(name)
+        if ingredient_id is None:
+            ingredient_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return ingredient_id
+
+    def intern_all(self, names):
+        """
+        Returns an int32 array of the ids of a list of ingredient names.
+        """
+        return np.array([self.intern(name) for name in names], dtype=np.int32)
+
+
+# the vocabulary every Recipe's ingredient_ids refer to
+VOCABULARY = Vocabulary()
+
+
 class Recipe:
     NUM_CORE = 10
+    __slots__ = ('name', 'rating', 'ingredient_ids', 'amounts')
 
     def __init__(self, name, ingredients_list, rating=None):
         """
         This class represents a recipe object, containing a list of ingredients, name,
         and potential rating based on whether it had a rating on the website it
-        was pulled from
+        was pulled from. The ingredients are stored as an array of ids in VOCABULARY and
+        an array of amounts, and ingredients_list gives IngredientView objects over them.
         Args:
             name (String): a string representing the given name of the recipe
             ingredients_list (list<Ingredient>): a list containing recipe's ingredients and their respective amounts
         """
         self.name = name
         self.rating = rating
-        self.num_of_ingredients = len(ingredients_list)
-        new_ingredients_list = []
-        for ingredient in ingredients_list:
-            new_ingredients_list.append(Ingredient(
-                ingredient.name, ingredient.amount))
-        self.ingredients_list = new_ingredients_list
+        self.ingredients_list = ingredients_list
         self.normalize()
 
+    @classmethod
+    def from_arrays(cls, name, ingredient_ids, amounts, rating=None):
+        """
+        Builds a recipe straight from ids in VOCABULARY and amounts, without making
+        Ingredient objects first. The amounts are normalized like in __init__.
+        Args:
+            name (String): the name of the recipe
+            ingredient_ids (np.ndarray): the VOCABULARY id of each ingredient
+            amounts (np.ndarray): the amount of each ingredient
+            rating (float): the recipe's rating, if it has one
+        """
+        recipe = cls.__new__(cls)
+        recipe.name = name
+        recipe.rating = rating
+        recipe.ingredient_ids = np.asarray(ingredient_ids, dtype=np.int32)
+        recipe.amounts = np.asarray(amounts, dtype=float)
+        recipe.normalize()
+        return recipe
+
+    def __getstate__(self):
+        # ids only mean something in this process's VOCABULARY, so pickle the names
+        return self.name, self.rating, self.ingredient_names, self.amounts
+
+    def __setstate__(self, state):
+        self.name, self.rating, names, self.amounts = state
+        self.ingredient_ids = VOCABULARY.intern_all(names)
+
+    @property
+    def ingredient_names(self):
+        """
+        The name of each ingredient, in order.
+        """
+        names = VOCABULARY.names
+        return [names[ingredient_id] for ingredient_id in self.ingredient_ids.tolist()]
+
+    @property
+    def ingredients_list(self):
+        """
+        The recipe's ingredients as IngredientView objects, so setting the name or amount
+        of one changes the recipe. Assign a new list to change the ingredients themselves.
+        """
+        return self._ingredients(0, len(self.ingredient_ids))
+
+    @ingredients_list.setter
+    def ingredients_list(self, ingredients_list):
+        self.ingredient_ids = VOCABULARY.intern_all(
+            [ingredient.name for ingredient in ingredients_list])
+        self.amounts = np.array([ingredient.amount for ingredient in ingredients_list],
+                                dtype=float)
+
+    @property
+    def num_of_ingredients(self):
+        return len(self.ingredient_ids)
+
+    def _ingredients(self, start, stop):
+        """
+        Returns IngredientView objects for the ingredients from position start up to stop.
+        """
+        return [IngredientView(self, index)
+                for index in range(*slice(start, stop).indices(len(self.ingredient_ids)))]
+
     def normalize(self):
         """
         This method finds the percentage off from 100 oz the recipe's sum of ingredients is,
         then corrects to that amount by multiplying every ingredient amount by that ratio
         """
-        total = sum(ingredients.amount for ingredients in self.ingredients_list)
-        scaling_factor = 1000 / total
-        for ingredient in self.ingredients_list:
-            ingredient.amount *= scaling_factor
-            ingredient.amount = round(ingredient.amount, 3)
+        # rounded one at a time with round(), which np.round doesn't always agree with
+        amounts = self.amounts.tolist()
+        scaling_factor = 1000 / sum(amounts)
+        self.amounts = np.array([round(amount * scaling_factor, 3) for amount in amounts])
 
     def __repr__(self):
         s = f'Recipe for {self.name}:\n'
@@ -279,29 +1011,36 @@ class Recipe:
 
 
 class GeneratedRecipe(Recipe):
+    __slots__ = ()
+
     def __init__(self, name, ingredients_list, rating=None):
         super().__init__(name, ingredients_list, rating)
 
     @property
     def core_ingredients(self):
-        return self.ingredients_list[:Recipe.NUM_CORE]
+        return self._ingredients(0, Recipe.NUM_CORE)
 
     @property
     def extra_ingredients(self):
-        return self.ingredients_list[Recipe.NUM_CORE:]
+        return self._ingredients(Recipe.NUM_CORE, len(self.ingredient_ids))
 
-    def extras_similarity(self):
+    def extras_similarity(self, similarities=None):
         """
         Checks the extra ingredients in the parent recipe to test for how similar they are in the
         flavor parings database ingred_word_emb.npy
+        Args:
+            similarities (SimilarityMatrix): precomputed similarities to look the pairs up in,
+            such as Population.similarities; without one they are computed from the embeddings
         """
-        similarities = []
-        for ing1, ing2 in list(combinations(self.extra_ingredients, 2)):
-            sim = ingredient_similarity(ing1.name, ing2.name)
-            if sim:
-                similarities.append(sim)
-        if similarities:
-            return sum(similarities) / len(similarities)
+        names = self.ingredient_names[Recipe.NUM_CORE:]
+        similarities = similarities.pair_similarities(
+            names) if similarities is not None else None
+        if similarities is None:
+            similarities = get_embeddings().pair_similarities(names)
+        # pairs without a similarity, or with a similarity of exactly zero, are skipped
+        similarities = similarities[~np.isnan(similarities) & (similarities != 0)]
+        if similarities.size:
+            return float(similarities.mean())
         return None
 
     def __repr__(self):
@@ -311,6 +1050,195 @@ class GeneratedRecipe(Recipe):
         return s + '\n'
 
 
+class RecipeBatch:
+    def __init__(self, ingredient_ids, amounts, core_mask, extra_mask, names, vocabulary):
+        """
+        This class represents many generated recipes stored column-wise. Row i of each array
+        is one recipe, and unused slots hold an ingredient id of -1 and an amount of 0.
+        Args:
+            ingredient_ids (np.ndarray): (n, width) ids of each recipe's ingredients
+            amounts (np.ndarray): (n, width) normalized amounts in grams
+            core_mask (np.ndarray): (n, width) bools marking core ingredients
+            extra_mask (np.ndarray): (n, width) bools marking extra ingredients
+            names (list[str]): the name of each recipe
+            vocabulary (list[str]): the ingredient name for each id
+        """
+        self.ingredient_ids = ingredient_ids
+        self.amounts = amounts
+        self.core_mask = core_mask
+        self.extra_mask = extra_mask
+        self.names = names
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_recipes(cls, recipes, population):
+        """
+        Packs GeneratedRecipe objects into a batch. As in GeneratedRecipe, the first
+        Recipe.NUM_CORE ingredients of each recipe are its core ingredients.
+        Args:
+            recipes (list[GeneratedRecipe]): the recipes to pack
+            population (Population): the population whose ingredient ids to use
+        """
+        width = max(recipe.num_of_ingredients for recipe in recipes)
+        ingredient_ids = np.full((len(recipes), width), -1, dtype=np.int64)
+        amounts = np.zeros((len(recipes), width))
+        for row, recipe in enumerate(recipes):
+            size = recipe.num_of_ingredients
+            ingredient_ids[row, :size] = [population.ingredient_ids[name]
+                                          for name in recipe.ingredient_names]
+            amounts[row, :size] = recipe.amounts
+        columns = np.arange(width)
+        core_mask = (ingredient_ids >= 0) & (columns < Recipe.NUM_CORE)
+        extra_mask = (ingredient_ids >= 0) & (columns >= Recipe.NUM_CORE)
+        return cls(ingredient_ids, amounts, core_mask, extra_mask,
+                   [recipe.name for recipe in recipes], population.all_ingredients)
+
+    def __len__(self):
+        return len(self.names)
+
+    def take(self, rows):
+        """
+        Returns a new batch holding only some of this batch's recipes.
+        Args:
+            rows (list[int]): which recipes to keep, in order
+        """
+        return RecipeBatch(self.ingredient_ids[rows], self.amounts[rows], self.core_mask[rows],
+                           self.extra_mask[rows], [self.names[row] for row in rows],
+                           self.vocabulary)
+
+    def recipe(self, row):
+        """
+        Builds a GeneratedRecipe for one row of the batch, such as a winner of a search.
+        Args:
+            row (int): which recipe of the batch to build
+        """
+        used = self.ingredient_ids[row] >= 0
+        names = [self.vocabulary[ingredient_id]
+                 for ingredient_id in self.ingredient_ids[row][used].tolist()]
+        return GeneratedRecipe.from_arrays(self.names[row], VOCABULARY.intern_all(names),
+                                           self.amounts[row][used])
+
+
+class RecipeIndex:
+    # the most (recipe, corpus entry) products nearest() computes at once
+    BLOCK_SIZE = 1 << 22
+
+    def __init__(self, recipes, ingredient_ids, use_scipy=True):
+        """
+        This class represents every recipe of a corpus as a row of a sparse CSR matrix over
+        the ingredient vocabulary, holding the recipe's amounts scaled to unit length, and
+        finds the corpus recipe closest to each recipe of a RecipeBatch.
+        Args:
+            recipes (list[Recipe]): the corpus, one row per recipe
+            ingredient_ids (dict[str: int]): ingredient name -> column, covering every
+            ingredient of recipes
+            use_scipy (bool): whether to multiply with scipy.sparse when it is installed
+        """
+        self.num_columns = max(ingredient_ids.values(), default=-1) + 1
+        # VOCABULARY id -> column
+        vocabulary_ids = VOCABULARY.intern_all(list(ingredient_ids))
+        columns_of = np.full(len(VOCABULARY), -1, dtype=np.int64)
+        columns_of[vocabulary_ids] = list(ingredient_ids.values())
+        sizes = np.array([recipe.num_of_ingredients for recipe in recipes], dtype=np.int64)
+        rows = np.repeat(np.arange(len(recipes)), sizes)
+        columns = columns_of[np.concatenate(
+            [recipe.ingredient_ids for recipe in recipes] + [np.zeros(0, dtype=np.int32)])]
+        values = np.concatenate([recipe.amounts for recipe in recipes] + [np.zeros(0)])
+
+        # an ingredient listed twice in a recipe adds up into one entry
+        entries, inverse = np.unique(rows * self.num_columns + columns, return_inverse=True)
+        values = np.bincount(inverse.ravel(), weights=values, minlength=len(entries))
+        rows = entries // max(self.num_columns, 1)
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(recipes)))
+        self.indices = entries % max(self.num_columns, 1)
+        self.data = values / np.where(norms > 0, norms, 1)[rows]
+        self.indptr = np.concatenate(
+            ([0], np.cumsum(np.bincount(rows, minlength=len(recipes))))).astype(np.int64)
+        self.matrix = None
+        if sparse is not None and use_scipy:
+            self.matrix = sparse.csr_matrix((self.data, self.indices, self.indptr),
+                                            shape=(len(recipes), self.num_columns))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def nearest(self, batch):
+        """
+        Returns (nearest, distances): for each recipe of a RecipeBatch, the row of the
+        corpus recipe whose amounts point the most the same way, and its cosine distance,
+        from 0 for the same proportions of the same ingredients to 1 for no ingredient in
+        common. The batch has to use the same ingredient ids as this index.
+        Args:
+            batch (RecipeBatch): the recipes to look up
+        """
+        num_recipes = len(batch)
+        nearest = np.full(num_recipes, -1, dtype=np.int64)
+        distances = np.ones(num_recipes)
+        if not len(self) or not num_recipes:
+            return nearest, distances
+
+        used = batch.ingredient_ids >= 0
+        amounts = np.where(used, batch.amounts, 0)
+        norms = np.sqrt((amounts ** 2).sum(axis=1, keepdims=True))
+        amounts = amounts / np.where(norms > 0, norms, 1)
+        work = self.data.size if self.matrix is None else len(self)
+        block = max(1, self.BLOCK_SIZE // max(work, 1))
+        for start in range(0, num_recipes, block):
+            stop = min(start + block, num_recipes)
+            products = self._products(batch.ingredient_ids[start:stop], used[start:stop],
+                                      amounts[start:stop])
+            nearest[start:stop] = products.argmax(axis=1)
+            distances[start:stop] = 1 - products.max(axis=1)
+        return nearest, np.clip(distances, 0, 1)
+
+    def _products(self, ingredient_ids, used, amounts):
+        """
+        Returns the dense (len(ingredient_ids), len(self)) cosine similarities of some rows
+        of a batch with every corpus recipe.
+        """
+        num_rows = len(ingredient_ids)
+        if self.matrix is not None:
+            queries = sparse.csr_matrix(
+                (amounts[used], ingredient_ids[used],
+                 np.concatenate(([0], np.cumsum(used.sum(axis=1))))),
+                shape=(num_rows, self.num_columns))
+            return (queries @ self.matrix.T).toarray()
+
+        dense = np.zeros((num_rows, self.num_columns))
+        np.add.at(dense, (np.nonzero(used)[0], ingredient_ids[used]), amounts[used])
+        terms = dense[:, self.indices] * self.data
+        products = np.zeros((num_rows, len(self)))
+        # reduceat needs the start of every non-empty corpus row
+        filled = np.diff(self.indptr) > 0
+        if filled.any():
+            products[:, filled] = np.add.reduceat(terms, self.indptr[:-1][filled], axis=1)
+        return products
+
+
+class BatchFitness:
+    def __init__(self, tf_idf, core_fitness, similarity, fitness, novelty=None, nearest=None):
+        """
+        This class holds the scores Population.fitness_batch gives a RecipeBatch, one entry
+        per recipe.
+        Args:
+            tf_idf (np.ndarray): recipe_tf_idf of each recipe
+            core_fitness (np.ndarray): core_fitness of each recipe
+            similarity (np.ndarray): extras_similarity of each recipe, NaN where it is None
+            fitness (np.ndarray): the combined score fitness() would give
+            novelty (np.ndarray): the distance to the nearest corpus recipe, if scored
+            nearest (np.ndarray): the position of that recipe in recipes_list, if scored
+        """
+        self.tf_idf = tf_idf
+        self.core_fitness = core_fitness
+        self.similarity = similarity
+        self.fitness = fitness
+        self.novelty = novelty
+        self.nearest = nearest
+
+    def __len__(self):
+        return len(self.fitness)
+
+
 def translate(recipe_dict):
     """
     This method will correct for some naming conventions in various recipes,
@@ -318,47 +1246,65 @@ def translate(recipe_dict):
     This assumes that all butter is softened and doesn't make note of salted
     vs not (if relevant, may need to experiment)
     """
-    recipe_list = []
-    for key in list(recipe_dict.keys()):
-        parse_store = recipe_dict.get(key)
-        ingredients_list = []
-        rating = parse_store[0]
-        for ingredient in parse_store[1:]:
-            """Not all butter is equal, but the generator treats it as if it were"""
-            if ingredient.get("name") == "butter, softened" or ingredient.get("name") == "unsalted butter, chilled":
-                ingredient.update({"name": "butter"})
-            if ingredient.get("name") == "egg" or ingredient.get("name") == "eggs":
-                ingredient.update({"name": "egg(s)"})
-            if ingredient.get("unit") == "teaspoons" or ingredient.get("unit") == "teaspoon":
-                cup_from_tspoon = u_convert.tspoon_to_cup(
-                    ingredient.get("amount"))
-                ingredient.update({"amount": cup_from_tspoon})
-                ingredient.update({"unit": "cups"})
-            if ingredient.get("unit") == "tablespoon" or ingredient.get("unit") == "tablespoons":
-                cup_from_tbspoon = u_convert.tbspoon_to_cup(
-                    ingredient.get("amount"))
-                ingredient.update({"amount": cup_from_tbspoon})
-                ingredient.update({"unit": "cups"})
-            if ingredient.get("unit") == "cup" or ingredient.get("unit") == "cups":
-                grams_from_cups = u_convert.cup_to_g(ingredient.get(
-                    "name"), ingredient.get("amount"))
-                ingredient.update({"amount": grams_from_cups})
-                ingredient.update({"unit": "grams"})
-            if ingredient.get("unit") == "ounce" or ingredient.get("unit") == "oz" or ingredient.get("unit") == "ounces":
-                g_from_oz = u_convert.oz_to_g(ingredient.get("amount"))
-                ingredient.update({"amount": g_from_oz})
-                ingredient.update({"unit": "grams"})
-
-            ingredients_list.append(Ingredient(
-                ingredient.get("name"), ingredient.get("amount")))
-        if rating > -1:
-            recipe_list.append(Recipe(key, ingredients_list, rating))
-        else:
-            recipe_list.append(Recipe(key, ingredients_list))
-    return recipe_list
+    return [translate_recipe(key, recipe_dict.get(key)) for key in list(recipe_dict.keys())]
+
+
+def iter_recipes(dirname='recipes', workers=None, errors=None):
+    """
+    Yields the same Recipe objects as translate(get_recipe_dict()) one at a time, reading
+    and parsing the recipe files on a pool of threads, so the whole corpus never has to be
+    in memory at once. Recipe files with the same recipe name are all yielded.
+    Args:
+        dirname (str): the directory of recipe text files
+        workers (int): number of reader threads, see clean_text.iter_recipe_files
+        errors (list): if given, a clean_text.ParseError is appended to it for each
+        malformed line
+    """
+    for recipe_name, parse_store in iter_recipe_files(dirname, workers, errors):
+        yield translate_recipe(recipe_name, parse_store)
+
+
+def translate_recipe(recipe_name, parse_store):
+    """
+    Returns one Recipe from its name and [its rating] + its parsed ingredient dicts.
+    """
+    ingredients_list = translate_ingredients(parse_store[1:])
+    rating = parse_store[0]
+    if rating > -1:
+        return Recipe(recipe_name, ingredients_list, rating)
+    return Recipe(recipe_name, ingredients_list)
+
+
+# ingredient names the generator treats as the same ingredient
+NAME_ALIASES = {
+    # not all butter is equal, but the generator treats it as if it were
+    "butter, softened": "butter",
+    "unsalted butter, chilled": "butter",
+    "egg": "egg(s)",
+    "eggs": "egg(s)",
+}
+
+
+def translate_ingredients(ingredient_dicts):
+    """
+    Does the work of translate() for one recipe's parsed ingredients, returning them as
+    Ingredient objects with amounts in grams (before the recipe is normalized). Names are
+    looked up in NAME_ALIASES, and amounts converted with unit_conversion.REGISTRY.
+    Args:
+        ingredient_dicts (list[dict]): ingredients as parsed by clean_text.split_ingredient
+    """
+    ingredients_list = []
+    for ingredient in ingredient_dicts:
+        name = NAME_ALIASES.get(ingredient.get("name"), ingredient.get("name"))
+        amount, _ = u_convert.REGISTRY.convert(ingredient.get("unit"), name,
+                                               ingredient.get("amount"))
+        ingredients_list.append(Ingredient(name, amount))
+    return ingredients_list
 
 
 class Ingredient:
+    __slots__ = ('name', 'amount')
+
     def __init__(self, name, amount):
         """
         This class represents one ingredient by its name and its amount in grams.
@@ -373,10 +1319,79 @@ class Ingredient:
         return f'{self.name}, {self.amount} grams'
 
 
-def main():
+class IngredientView(Ingredient):
+    __slots__ = ('recipe', 'index')
+
+    def __init__(self, recipe, index):
+        """
+        This class represents one ingredient of a recipe, reading its name and amount from
+        the recipe's arrays and writing changes back to them.
+        Args:
+            recipe (Recipe): the recipe the ingredient belongs to
+            index (int): the ingredient's position in the recipe
+        """
+        self.recipe = recipe
+        self.index = index
+
+    @property
+    def name(self):
+        return VOCABULARY.names[self.recipe.ingredient_ids[self.index]]
+
+    @name.setter
+    def name(self, name):
+        self.recipe.ingredient_ids[self.index] = VOCABULARY.intern(name)
+
+    @property
+    def amount(self):
+        return float(self.recipe.amounts[self.index])
+
+    @amount.setter
+    def amount(self, amount):
+        self.recipe.amounts[self.index] = amount
+
+
+def main(argv=None):
     """
-    instantiates a population, generates 100 recipes, and prints the 5 most "fit" ones.
+    With no command, instantiates a population, generates 100 recipes, and prints the 5
+    most "fit" ones. "generate" runs a larger search, see generate_command.
     """
+    parser = argparse.ArgumentParser(
+        prog='python -m cookie_gen', description='Generate cookie recipes.')
+    commands = parser.add_subparsers(dest='command')
+    generate_parser = commands.add_parser(
+        'generate', help='generate and score many recipes in parallel, streaming JSONL')
+    generate_parser.add_argument('--candidates', type=int, default=100000,
+                                 help='number of recipes to generate and score')
+    generate_parser.add_argument('--top', type=int, default=5,
+                                 help='number of best recipes to keep, or 0 to stream '
+                                 'every recipe')
+    generate_parser.add_argument('--seed', type=int, default=0)
+    generate_parser.add_argument('--workers', type=int, default=None,
+                                 help='number of worker processes (default: one per CPU)')
+    generate_parser.add_argument('--recipes', default='recipes',
+                                 help='directory of recipe text files (default: recipes)')
+    generate_parser.add_argument('--embeddings', nargs=2, metavar=('MATRIX', 'VOCAB'),
+                                 help='embedding matrix (.npy) and vocabulary files to use')
+    generate_parser.add_argument('--chunk-size', type=int, default=10000,
+                                 help='number of recipes a worker scores at once')
+    generate_parser.add_argument('--temperature', type=float, default=None,
+                                 help='pick extras that go with the ones already picked, '
+                                 'more strongly the lower this is (default: uniform extras)')
+    generate_parser.add_argument('--novelty', action='store_true',
+                                 help='also score how far each recipe is from the closest '
+                                 'scraped recipe')
+    generate_parser.add_argument('--output', default='-',
+                                 help='file to write JSONL to (default: standard output)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        if args.output == '-':
+            generate_command(args, sys.stdout)
+        else:
+            with open(args.output, 'w') as output:
+                generate_command(args, output)
+        return
+
     recipe_dict = get_recipe_dict()
     recipe_list = translate(recipe_dict)
     p = Population(recipe_list)
@@ -386,7 +1401,7 @@ def main():
     # # Get top 5 out of 100 generated
     generated = []
     for i in range(100):
-        num_extras = random.randint(4, 6)
+        num_extras = int(p.rng.integers(4, 7))
         new = p.generate(Recipe.NUM_CORE, num_extras)
         fitness = p.fitness(new)
         generated.append((new, fitness))
@@ -398,4 +1413,56 @@ def main():
         print(recipe)
 
 
-main()
+def generate_command(args, output):
+    """
+    Runs driver.iter_search and writes one JSON object per line to output as chunks
+    finish: a "candidate" line for each recipe that makes it into the best args.top so
+    far (every recipe if args.top is 0), then a "top" line for each of the best recipes,
+    best first, and a "summary" line.
+    Args:
+        args (argparse.Namespace): the options of the generate command
+        output (file): where to write the lines
+    """
+    # driver imports this module, so it can only be imported once this one is loaded
+    from driver import iter_search
+
+    def write(record):
+        output.write(json.dumps(record) + '\n')
+
+    def recipe_record(kind, fitness, candidate, name, ingredients):
+        return {"type": kind, "candidate": candidate, "fitness": fitness, "name": name,
+                "ingredients": [{"name": ingredient, "grams": amount}
+                                for ingredient, amount in ingredients]}
+
+    start = perf_counter()
+    # a min-heap of (fitness, -candidate number, result), so the worst kept recipe is first
+    best = []
+    for _, results in iter_search(args.candidates, args.top, args.workers, args.seed,
+                                  recipe_dir=args.recipes, chunk_size=args.chunk_size,
+                                  embedding_paths=args.embeddings,
+                                  temperature=args.temperature, novelty=args.novelty):
+        for result in results:
+            key = (result[0], -result[1])
+            if args.top and len(best) == args.top:
+                if key <= best[0][:2]:
+                    continue
+                heapq.heapreplace(best, key + (result,))
+            elif args.top:
+                heapq.heappush(best, key + (result,))
+            write(recipe_record("candidate", *result))
+        # let consumers see each chunk as soon as it is done
+        output.flush()
+
+    for _, _, result in sorted(best, reverse=True):
+        write(recipe_record("top", *result))
+    seconds = perf_counter() - start
+    write({"type": "summary", "candidates": args.candidates, "seconds": seconds,
+           "candidates_per_second": args.candidates / seconds})
+    output.flush()
+
+
+# COOKIE_PROFILE=profile.json profiles the whole run, see instrument.py
+instrument.enable_from_environment()
+
+if __name__ == "__main__":
+    main()
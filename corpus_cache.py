@@ -0,0 +1,164 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file keeps a binary cache of the translated recipe corpus, so that we
+don't have to parse every text file in ./recipes and convert every unit on
+each startup. The cache is a .npz file of plain arrays (no pickles) laid out
+column by column: the ingredient vocabulary, one ingredient id and amount per
+ingredient line, the offset of each recipe's first line, and each recipe's
+name and rating. It is keyed on the recipe files' names, sizes and
+modification times, plus the source of the parsing code, and is rebuilt
+whenever any of those change.
+"""
+
+import hashlib
+import inspect
+import os
+from os.path import isfile, join
+
+import numpy as np
+
+import clean_text
+import unit_conversion
+from atomic_file import atomic_file
+from cookie_gen import NAME_ALIASES, VOCABULARY, Population, Recipe, translate_ingredients
+
+
+def default_cache_path(dirname):
+    """
+    Returns where the cache for a recipe directory lives: next to it, since anything
+    inside it would be read as a recipe.
+    Args:
+        dirname (str): the directory of recipe text files
+    """
+    return os.path.normpath(dirname) + '.cache.npz'
+
+
+def corpus_key(dirname):
+    """
+    Returns a hash of the recipe files parse_recipe_files would read (name, size and
+    modification time) and of the code and name aliases that parse and translate them.
+    Args:
+        dirname (str): the directory of recipe text files
+    """
+    digest = hashlib.sha256()
+    for source in (inspect.getsource(clean_text), inspect.getsource(unit_conversion),
+                   inspect.getsource(translate_ingredients), repr(NAME_ALIASES)):
+        digest.update(source.encode('utf-8'))
+    for filename in sorted(os.listdir(dirname)):
+        file_path = join(dirname, filename)
+        if isfile(file_path) and filename != ".DS_Store":
+            stat = os.stat(file_path)
+            digest.update(f'{filename}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_cache(dirname, cache_path=None, errors=None):
+    """
+    Parses and translates every recipe in dirname and writes the result to the cache.
+    Returns the columns that were written.
+    Args:
+        dirname (str): the directory of recipe text files
+        cache_path (str): where to write the cache; next to dirname by default
+        errors (list): if given, a clean_text.ParseError is appended to it for each
+        malformed line
+    """
+    cache_path = cache_path or default_cache_path(dirname)
+    key = corpus_key(dirname)
+
+    # recipes stream in one file at a time and only their names, units and amounts are
+    # kept. Like get_recipe_dict(), a later file with the same recipe name replaces the
+    # earlier one
+    recipes = {}
+    for recipe_name, parse_store in clean_text.iter_recipe_files(dirname, errors=errors):
+        names = [NAME_ALIASES.get(ingredient["name"], ingredient["name"])
+                 for ingredient in parse_store[1:]]
+        recipes[recipe_name] = (parse_store[0], names,
+                                [ingredient["unit"] for ingredient in parse_store[1:]],
+                                [ingredient["amount"] for ingredient in parse_store[1:]])
+
+    vocabulary = {}
+    ratings = []
+    offsets = [0]
+    names = []
+    units = []
+    raw_amounts = []
+    for rating, recipe_names, recipe_units, recipe_amounts in recipes.values():
+        ratings.append(rating)
+        names.extend(recipe_names)
+        units.extend(recipe_units)
+        raw_amounts.extend(recipe_amounts)
+        offsets.append(len(names))
+    ingredient_ids = [vocabulary.setdefault(name, len(vocabulary)) for name in names]
+    # convert every amount to grams in one pass, as translate_ingredients would one by one
+    amounts, _ = unit_conversion.REGISTRY.convert_columns(raw_amounts, units, names)
+
+    columns = {
+        "key": np.array(key),
+        "vocabulary": np.array(list(vocabulary), dtype=str),
+        "recipe_names": np.array(list(recipes), dtype=str),
+        "ratings": np.array(ratings, dtype=float),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "ingredient_ids": np.array(ingredient_ids, dtype=np.int32),
+        "amounts": np.array(amounts, dtype=float),
+    }
+    with atomic_file(cache_path) as file:
+        np.savez(file, **columns)
+    return columns
+
+
+def load_columns(dirname='recipes', cache_path=None):
+    """
+    Returns the cached columns for dirname as a dictionary of arrays, rebuilding the
+    cache first if it is missing or any recipe file has changed.
+    Args:
+        dirname (str): the directory of recipe text files
+        cache_path (str): where the cache lives; next to dirname by default
+    """
+    cache_path = cache_path or default_cache_path(dirname)
+    if isfile(cache_path):
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if str(cached["key"]) == corpus_key(dirname):
+                return {name: cached[name] for name in cached.files}
+    return build_cache(dirname, cache_path)
+
+
+def load_recipes(dirname='recipes', cache_path=None):
+    """
+    Returns the same list of Recipe objects as translate(get_recipe_dict()), read from
+    the cache when it is up to date.
+    Args:
+        dirname (str): the directory of recipe text files
+        cache_path (str): where the cache lives; next to dirname by default
+    """
+    columns = load_columns(dirname, cache_path)
+    # the cache's ingredient ids, as ids in the shared VOCABULARY
+    ingredient_ids = VOCABULARY.intern_all(columns["vocabulary"].tolist())[
+        columns["ingredient_ids"]]
+    offsets = columns["offsets"].tolist()
+    amounts = columns["amounts"]
+
+    recipe_list = []
+    for index, (name, rating) in enumerate(zip(columns["recipe_names"].tolist(),
+                                               columns["ratings"].tolist())):
+        start, end = offsets[index], offsets[index + 1]
+        recipe_list.append(Recipe.from_arrays(name, ingredient_ids[start:end],
+                                              amounts[start:end],
+                                              rating if rating > -1 else None))
+    return recipe_list
+
+
+def load_population(dirname='recipes', cache_path=None):
+    """
+    Builds a Population straight from the cached corpus. Its ingredient similarity matrix
+    is saved next to the corpus cache too.
+    Args:
+        dirname (str): the directory of recipe text files
+        cache_path (str): where the cache lives; next to dirname by default
+    """
+    cache_path = cache_path or default_cache_path(dirname)
+    similarity_path = cache_path[:-len('.npz')] + '.similarity.npz' \
+        if cache_path.endswith('.npz') else cache_path + '.similarity.npz'
+    return Population(load_recipes(dirname, cache_path), similarity_path)
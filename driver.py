@@ -0,0 +1,224 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file runs the generate-and-evaluate loop from cookie_gen.main() across
+every core of a machine. Each worker process builds its own Population once,
+generates and scores its share of the candidates in batches, and only keeps
+its best k recipes in a bounded heap. The parent then merges those heaps.
+Worker seeds are derived from one seed, so a run is reproducible for a given
+seed and number of workers.
+
+Run it with, for example: python driver.py --candidates 1000000 --top 5
+iter_search streams results chunk by chunk instead, for python -m cookie_gen generate.
+"""
+
+import argparse
+import heapq
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+import instrument
+from corpus_cache import load_columns, load_population
+from cookie_gen import GeneratedRecipe, Ingredient, Recipe
+from embeddings import use_embeddings
+
+CHUNK_SIZE = 10000
+
+# the population each worker process builds once in _init_worker
+_population = None
+
+
+def _init_worker(recipe_dir):
+    """
+    Builds the worker's Population from the recipes in recipe_dir.
+    """
+    global _population
+    _population = load_population(recipe_dir)
+
+
+def _search(task):
+    """
+    Generates and scores one worker's share of the candidates, returning its top k as a
+    list of (fitness, worker, candidate number, recipe name, [(ingredient name, amount)]).
+    Args:
+        task (tuple): (worker number, np.random.SeedSequence, number of candidates, k,
+        num_core, extras_range, chunk_size)
+    """
+    worker, seed, num_candidates, k, num_core, extras_range, chunk_size = task
+    rng = np.random.default_rng(seed)
+    # a min-heap of (fitness, -candidate number, row data), so the worst kept recipe is first
+    # and, among equal fitnesses, the earliest candidate wins
+    heap = []
+    done = 0
+    while done < num_candidates:
+        size = min(chunk_size, num_candidates - done)
+        batch = _population.generate_batch(size, num_core, extras_range, rng)
+        fitness = _population.fitness_batch(batch).fitness
+
+        # only the chunk's own top k can make it into the heap
+        rows = np.argsort(-fitness, kind='stable')[:k]
+        for row in rows:
+            if np.isnan(fitness[row]):
+                continue
+            # candidate numbers are unique, so the row data itself is never compared
+            key = (float(fitness[row]), -(done + int(row)))
+            if len(heap) < k:
+                heapq.heappush(heap, key + (_row_data(batch, row),))
+            elif key > heap[0][:2]:
+                heapq.heapreplace(heap, key + (_row_data(batch, row),))
+        done += size
+
+    instrument.flush()
+    return [(fitness, worker, -negative_candidate, name, ingredients)
+            for fitness, negative_candidate, (name, ingredients) in heap]
+
+
+def _init_chunk_worker(recipe_dir, embedding_paths):
+    """
+    Builds the worker's Population like _init_worker, after switching to other embedding
+    files if embedding_paths is (matrix path, vocab path).
+    """
+    if embedding_paths:
+        use_embeddings(*embedding_paths)
+    _init_worker(recipe_dir)
+
+
+def _search_chunk(task):
+    """
+    Generates and scores one chunk of candidates, returning (chunk number, results), where
+    results are (fitness, candidate number, recipe name, [(ingredient name, amount)]) for
+    the chunk's k best recipes, or every recipe if k is 0, best first.
+    Args:
+        task (tuple): (chunk number, first candidate number, np.random.SeedSequence,
+        number of candidates, k, num_core, extras_range, temperature, novelty)
+    """
+    chunk, first_candidate, seed, size, k, num_core, extras_range, temperature, novelty = task
+    batch = _population.generate_batch(size, num_core, extras_range,
+                                       np.random.default_rng(seed), temperature)
+    fitness = _population.fitness_batch(batch, novelty=novelty).fitness
+    rows = np.argsort(-fitness, kind='stable')
+    if k:
+        rows = rows[:k]
+    results = [(float(fitness[row]), first_candidate + int(row)) + _row_data(batch, row)
+               for row in rows if not np.isnan(fitness[row])]
+    instrument.flush()
+    return chunk, results
+
+
+def iter_search(num_candidates, k=5, workers=None, seed=0, num_core=Recipe.NUM_CORE,
+                extras_range=(4, 6), recipe_dir='recipes', chunk_size=CHUNK_SIZE,
+                embedding_paths=None, temperature=None, novelty=False):
+    """
+    Like run_search, but yields each chunk's results as soon as a worker finishes it, as
+    (chunk number, results) in the order they finish; see _search_chunk. Every chunk has
+    its own seed, so the candidates don't depend on the number of workers.
+        Args:
+            num_candidates (int): total number of recipes to generate and score
+            k (int): how many of each chunk's best recipes to return, or 0 for all of them
+            workers (int): number of worker processes, by default one per CPU
+            seed (int): seeds every chunk
+            num_core (int): passed to Population.generate_batch
+            extras_range (tuple[int, int]): passed to Population.generate_batch
+            recipe_dir (str): the directory of recipe text files to build populations from
+            chunk_size (int): how many recipes to generate and score at once
+            embedding_paths (tuple[str, str]): embedding matrix and vocab files to use
+            instead of the default ones
+            temperature (float): passed to Population.generate_batch
+            novelty (bool): passed to Population.fitness_batch
+    """
+    workers = workers or os.cpu_count()
+    num_chunks = -(-num_candidates // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(num_chunks)
+    tasks = [(chunk, chunk * chunk_size, seeds[chunk],
+              min(chunk_size, num_candidates - chunk * chunk_size), k, num_core, extras_range,
+              temperature, novelty)
+             for chunk in range(num_chunks)]
+
+    # bring the corpus cache up to date once, rather than in every worker at the same time
+    load_columns(recipe_dir)
+    if workers == 1:
+        _init_chunk_worker(recipe_dir, embedding_paths)
+        for task in tasks:
+            yield _search_chunk(task)
+    else:
+        with Pool(workers, initializer=_init_chunk_worker,
+                  initargs=(recipe_dir, embedding_paths)) as pool:
+            yield from pool.imap_unordered(_search_chunk, tasks)
+
+
+def _row_data(batch, row):
+    """
+    Returns the name of one recipe in a batch and its (ingredient name, amount) pairs,
+    which is all the parent process needs to rebuild it.
+    """
+    used = batch.ingredient_ids[row] >= 0
+    ingredients = [(batch.vocabulary[ingredient_id], float(amount))
+                   for ingredient_id, amount in zip(batch.ingredient_ids[row][used],
+                                                    batch.amounts[row][used])]
+    return batch.names[row], ingredients
+
+
+def run_search(num_candidates, k=5, workers=None, seed=0, num_core=Recipe.NUM_CORE,
+               extras_range=(4, 6), recipe_dir='recipes', chunk_size=CHUNK_SIZE):
+    """
+    Generates and scores num_candidates recipes across a pool of worker processes, and
+    returns the k most fit as a list of (fitness, GeneratedRecipe), best first.
+        Args:
+            num_candidates (int): total number of recipes to generate and score
+            k (int): how many of the best recipes to return
+            workers (int): number of worker processes, by default one per CPU
+            seed (int): seeds every worker; the same seed and workers give the same result
+            num_core (int): passed to Population.generate_batch
+            extras_range (tuple[int, int]): passed to Population.generate_batch
+            recipe_dir (str): the directory of recipe text files to build populations from
+            chunk_size (int): how many recipes each worker generates and scores at once
+    """
+    workers = workers or os.cpu_count()
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    tasks = [(worker, seeds[worker],
+              num_candidates // workers + (1 if worker < num_candidates % workers else 0),
+              k, num_core, extras_range, chunk_size)
+             for worker in range(workers)]
+
+    # bring the corpus cache up to date once, rather than in every worker at the same time
+    load_columns(recipe_dir)
+    if workers == 1:
+        _init_worker(recipe_dir)
+        results = [_search(tasks[0])]
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(recipe_dir,)) as pool:
+            results = pool.map(_search, tasks)
+
+    # best fitness first, then the lowest worker and candidate number
+    best = heapq.nsmallest(k, (item for result in results for item in result),
+                           key=lambda item: (-item[0], item[1], item[2]))
+    return [(fitness, GeneratedRecipe(name, [Ingredient(ingredient, amount)
+                                             for ingredient, amount in ingredients]))
+            for fitness, _, _, name, ingredients in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate cookie recipes in parallel and print the most fit ones.')
+    parser.add_argument('--candidates', type=int, default=100000,
+                        help='number of recipes to generate and score')
+    parser.add_argument('--top', type=int, default=5,
+                        help='number of recipes to print')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    best = run_search(args.candidates, args.top, args.workers, args.seed)
+    # print the best recipe last, like cookie_gen.main()
+    for fitness, recipe in best[::-1]:
+        print(fitness)
+        print(recipe)
+
+
+if __name__ == '__main__':
+    main()
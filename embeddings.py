@@ -0,0 +1,520 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file holds the flavor pairing word embeddings from ingred_word_emb.npy
+as one dense float32 matrix, along with a lookup from each word to its row.
+Keeping the vectors together lets us compare every pair of ingredient names
+in a recipe with a single matrix product, instead of calling np.dot once for
+each pair of words.
+
+The embeddings are kept on disk as a raw float32 matrix (ingred_word_emb.f32.npy)
+and a vocabulary file with one word per line (ingred_word_emb.vocab.txt). They
+are only opened the first time a similarity is needed, and the matrix is memory
+mapped so that worker processes share its pages. Running this file converts the
+original pickled ingred_word_emb.npy into that format.
+
+SimilarityMatrix stores the similarity of every pair of names in a corpus
+vocabulary, so scoring a recipe only has to look pairs up. It can be saved
+next to the corpus and is rebuilt when the vocabulary or embeddings change.
+
+NeighborIndex finds each name's most similar names by the cosine of their
+vectors, which generate_batch uses to pick extras that go well together.
+"""
+
+import argparse
+import hashlib
+import inspect
+import os
+from os.path import abspath, dirname, isfile, join
+
+import numpy as np
+
+from atomic_file import atomic_file
+
+DATA_DIR = dirname(abspath(__file__))
+PICKLE_PATH = join(DATA_DIR, 'ingred_word_emb.npy')
+MATRIX_PATH = join(DATA_DIR, 'ingred_word_emb.f32.npy')
+VOCAB_PATH = join(DATA_DIR, 'ingred_word_emb.vocab.txt')
+
+_paths = {"matrix": MATRIX_PATH, "vocab": VOCAB_PATH}
+_table = None
+
+
+class EmbeddingTable:
+    # the most word products similarity_matrix computes at once, bounding its temporaries
+    BLOCK_SIZE = 1 << 22
+
+    def __init__(self, words, matrix):
+        """
+        This class represents a set of word embeddings stored as rows of a matrix.
+        Args:
+            words (list[str]): the word for each row of matrix
+            matrix (np.ndarray): a (number of words, dimensions) array of vectors
+        """
+        self.words = list(words)
+        self.index = {word: row for row, word in enumerate(self.words)}
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    @classmethod
+    def from_dict(cls, word_vectors):
+        """
+        Builds a table from a dictionary of word -> vector.
+        Args:
+            word_vectors (dict[str: np.ndarray]): the embedding of each word
+        """
+        words = list(word_vectors.keys())
+        if not words:
+            return cls(words, np.zeros((0, 0), dtype=np.float32))
+        return cls(words, np.stack([word_vectors[word] for word in words]))
+
+    @classmethod
+    def from_pickle(cls, path):
+        """
+        Loads a table from a .npy file holding a pickled dictionary of word -> vector,
+        such as ingred_word_emb.npy.
+        Args:
+            path (str): path to the .npy file
+        """
+        return cls.from_dict(np.load(path, allow_pickle=True).item())
+
+    @classmethod
+    def load(cls, matrix_path, vocab_path, mmap_mode='r'):
+        """
+        Opens a table saved by save(). The matrix is memory mapped by default, so only
+        the rows that are used get read from disk.
+        Args:
+            matrix_path (str): path to the .npy file holding the float32 matrix
+            vocab_path (str): path to the text file with the word for each row
+            mmap_mode (str): passed to np.load; None reads the whole matrix into memory
+        """
+        with open(vocab_path, 'r', encoding='utf-8') as file:
+            words = [word.rstrip('\n') for word in file]
+        matrix = np.load(matrix_path, mmap_mode=mmap_mode)
+        if matrix.shape[0] != len(words):
+            raise ValueError(f'{matrix_path} has {matrix.shape[0]} rows but '
+                             f'{vocab_path} has {len(words)} words')
+        return cls(words, matrix)
+
+    def save(self, matrix_path, vocab_path):
+        """
+        Writes the table as a raw (non-pickled) .npy matrix and a vocabulary file.
+        Args:
+            matrix_path (str): where to write the float32 matrix
+            vocab_path (str): where to write the words, one per line
+        """
+        for word in self.words:
+            if '\n' in word:
+                raise ValueError(f'word {word!r} can not be stored one per line')
+        np.save(matrix_path, self.matrix, allow_pickle=False)
+        with open(vocab_path, 'w', encoding='utf-8', newline='\n') as file:
+            for word in self.words:
+                file.write(word + '\n')
+
+    def word_similarity(self, w1, w2):
+        """
+        Returns the dot product of two words' vectors, or None if either word has no vector.
+        Args:
+            w1 (str): a single word
+            w2 (str): a single word
+        """
+        r1 = self.index.get(w1)
+        r2 = self.index.get(w2)
+        if r1 is None or r2 is None:
+            return None
+        return np.dot(self.matrix[r1], self.matrix[r2])
+
+    def similarity(self, n1, n2):
+        """
+        Returns the similarity of two ingredient names, or None if it can't be measured.
+        See similarity_matrix for how multi-word names are compared.
+        Args:
+            n1 (str): a string representing an ingredient name
+            n2 (str): a string representing an ingredient name
+        """
+        similarity = self.similarity_matrix([n1, n2])[0, 1]
+        if np.isnan(similarity):
+            return None
+        return similarity
+
+    def similarity_matrix(self, names):
+        """
+        Returns a symmetric (len(names), len(names)) float32 array comparing every pair of
+        ingredient names, with NaN wherever a pair can't be compared. Two one-word names
+        are compared by the dot product of their vectors. Otherwise each name is split into
+        words, and the pair scores the largest nonzero dot product between their words,
+        provided it is above -1. Rows are computed a block of names at a time, so only
+        the result grows with the square of the number of names.
+        Args:
+            names (list[str]): the ingredient names to compare
+        """
+        num_names = len(names)
+        if num_names == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        words = [name.split(" ") for name in names]
+        word_counts = np.array([len(split) for split in words])
+        # the first row of each name's block of words, and the row after its last
+        starts = np.concatenate(([0], np.cumsum(word_counts)[:-1]))
+        ends = starts + word_counts
+        rows = np.array([self.index.get(word, -1)
+                         for split in words for word in split])
+        present = rows >= 0
+
+        vectors = np.zeros((len(rows), self.matrix.shape[1]), dtype=np.float32)
+        vectors[present] = self.matrix[rows[present]]
+        similarities = np.empty((num_names, num_names), dtype=np.float32)
+        block_words = max(int(word_counts.max()), self.BLOCK_SIZE // len(rows))
+        first = 0
+        while first < num_names:
+            last = max(first + 1, int(np.searchsorted(ends, starts[first] + block_words,
+                                                      side='right')))
+            similarities[first:last] = self._similarity_rows(
+                vectors, present, starts, word_counts == 1, first, last)
+            # copy the pairs earlier blocks already compared, so the result is symmetric
+            similarities[first:last, :first] = similarities[:first, first:last].T
+            square = similarities[first:last, first:last]
+            lower = np.tril_indices(last - first, -1)
+            square[lower] = square.T[lower]
+            first = last
+        return similarities
+
+    @staticmethod
+    def _similarity_rows(vectors, present, starts, single, first, last):
+        """
+        Does the comparing of similarity_matrix for the names from first up to last
+        against every name.
+        Args:
+            vectors (np.ndarray): the vector of every word of every name, zero if missing
+            present (np.ndarray): whether each word has a vector
+            starts (np.ndarray): the first word of each name
+            single (np.ndarray): whether each name is one word
+            first (int): the first name to compare
+            last (int): the name after the last one to compare
+        """
+        low = starts[first]
+        high = starts[last] if last < len(starts) else len(vectors)
+        products = vectors[low:high] @ vectors.T
+        both_present = present[low:high, None] & present[None, :]
+
+        # grouped max over each pair of names' blocks of words
+        candidates = np.where(both_present & (products != 0),
+                              products, -np.inf).astype(np.float32)
+        biggest = np.maximum.reduceat(
+            np.maximum.reduceat(candidates, starts[first:last] - low, axis=0), starts, axis=1)
+        similarities = np.where(biggest > -1, biggest, np.nan).astype(np.float32)
+
+        # one-word names use the dot product as is, even when it is zero or below -1
+        block_single = single[first:last]
+        single_rows = starts[first:last][block_single] - low
+        single_columns = starts[single]
+        similarities[np.ix_(block_single, single)] = np.where(
+            both_present[np.ix_(single_rows, single_columns)],
+            products[np.ix_(single_rows, single_columns)], np.nan)
+        return similarities
+
+    def pair_similarities(self, names):
+        """
+        Returns the similarity of every pair of names, in the order itertools.combinations
+        would produce them, with NaN for pairs that can't be compared.
+        Args:
+            names (list[str]): the ingredient names to compare
+        """
+        upper = np.triu_indices(len(names), 1)
+        return self.similarity_matrix(names)[upper]
+
+
+class SimilarityMatrix:
+    def __init__(self, names, values):
+        """
+        This class represents the similarity of every pair of names in a vocabulary.
+        Args:
+            names (list[str]): the ingredient names, one per row and column
+            values (np.ndarray): a symmetric (len(names), len(names)) float32 array from
+            EmbeddingTable.similarity_matrix, with NaN for pairs without embedding coverage
+        """
+        self.names = list(names)
+        self.index = {name: row for row, name in enumerate(self.names)}
+        self.values = values
+        # False for pairs the embeddings say nothing about
+        self.covered = ~np.isnan(values)
+
+    @classmethod
+    def build(cls, names, table=None):
+        """
+        Computes the matrix for a list of names.
+        Args:
+            names (list[str]): the ingredient names to compare
+            table (EmbeddingTable): the embeddings to use; get_embeddings() by default
+        """
+        table = table or get_embeddings()
+        return cls(names, table.similarity_matrix(names))
+
+    @classmethod
+    def load_or_build(cls, names, path):
+        """
+        Returns the matrix saved at path if it was built for the same names and the
+        current embedding files, and otherwise builds it and saves it there.
+        Args:
+            names (list[str]): the ingredient names to compare
+            path (str): the .npz file the matrix is saved in
+        """
+        key = similarity_key(names)
+        if isfile(path):
+            with np.load(path, allow_pickle=False) as saved:
+                if str(saved["key"]) == key:
+                    return cls(names, saved["values"])
+        matrix = cls.build(names)
+        matrix.save(path, key)
+        return matrix
+
+    def save(self, path, key=None):
+        """
+        Writes the matrix, the coverage mask and the key it was built for to an .npz file.
+        Args:
+            path (str): where to write the matrix
+            key (str): similarity_key(self.names) by default
+        """
+        with atomic_file(path) as file:
+            np.savez(file, key=np.array(key or similarity_key(self.names)),
+                     values=self.values, covered=self.covered)
+
+    def pair_similarities(self, names):
+        """
+        Returns the similarity of every pair of names, in the order itertools.combinations
+        would produce them, with NaN for pairs that aren't covered. Returns None if a name
+        isn't in the vocabulary.
+        Args:
+            names (list[str]): the ingredient names to compare
+        """
+        rows = [self.index.get(name) for name in names]
+        if None in rows:
+            return None
+        first, second = np.triu_indices(len(rows), 1)
+        rows = np.array(rows, dtype=np.int64)
+        return self.values[rows[first], rows[second]]
+
+
+class NeighborIndex:
+    # vocabularies larger than this get an approximate index unless told otherwise
+    APPROXIMATE_THRESHOLD = 20000
+    # how many query rows are compared against the vocabulary at once
+    BLOCK_ROWS = 1024
+
+    def __init__(self, names, vectors, approximate=False, num_tables=8, seed=0):
+        """
+        This class finds the names in a vocabulary whose vectors have the highest cosine
+        similarity to a given name's. The exact search compares each name against every
+        other with one matrix product per block of names. The approximate search hashes the
+        vectors with random hyperplanes and only compares names that share a bucket in at
+        least one of num_tables tables.
+        Args:
+            names (list[str]): the ingredient names, one per row of vectors
+            vectors (np.ndarray): a (len(names), dimensions) array, with a row of zeros for
+            names the embeddings don't cover
+            approximate (bool): whether to search only within hash buckets
+            num_tables (int): how many hash tables the approximate index uses
+            seed (int): seeds the random hyperplanes
+        """
+        self.names = list(names)
+        self.index = {name: row for row, name in enumerate(self.names)}
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        self.covered = norms > 0
+        self.vectors = np.where(self.covered[:, None],
+                                vectors / np.where(self.covered, norms, 1)[:, None], 0)
+        self.approximate = approximate
+        if approximate:
+            # about 32 names per bucket
+            num_bits = max(1, min(62, int(np.log2(max(len(self.names), 1) / 32))))
+            rng = np.random.default_rng(seed)
+            self.planes = rng.standard_normal(
+                (num_tables, self.vectors.shape[1], num_bits)).astype(np.float32)
+            self.codes = self._hash(self.vectors)
+            # each table's rows ordered by code, so a bucket is one contiguous run
+            self.order = np.argsort(self.codes, axis=1, kind='stable')
+            self.sorted_codes = np.take_along_axis(self.codes, self.order, axis=1)
+
+    @classmethod
+    def build(cls, names, table=None, approximate=None):
+        """
+        Builds the index for a list of names. A name's vector is the normalized mean of
+        the vectors of its words that have one.
+        Args:
+            names (list[str]): the ingredient names to index
+            table (EmbeddingTable): the embeddings to use; get_embeddings() by default
+            approximate (bool): whether to build an approximate index; by default only
+            for vocabularies larger than APPROXIMATE_THRESHOLD
+        """
+        table = table or get_embeddings()
+        if approximate is None:
+            approximate = len(names) > cls.APPROXIMATE_THRESHOLD
+        vectors = np.zeros((len(names), table.matrix.shape[1]), dtype=np.float32)
+        for row, name in enumerate(names):
+            rows = [table.index[word] for word in name.split(" ") if word in table.index]
+            if rows:
+                word_vectors = table.matrix[rows]
+                norms = np.linalg.norm(word_vectors, axis=1, keepdims=True)
+                vectors[row] = (word_vectors / np.where(norms > 0, norms, 1)).mean(axis=0)
+        return cls(names, vectors, approximate)
+
+    def _hash(self, vectors):
+        """
+        Returns a (num_tables, len(vectors)) array of each vector's bucket in each table.
+        """
+        bits = np.einsum('nd,tdb->tnb', vectors, self.planes) > 0
+        return (bits * (1 << np.arange(bits.shape[2], dtype=np.int64))).sum(axis=2)
+
+    def query(self, rows, k, among=None):
+        """
+        Returns the k rows most similar to each of rows, best first, leaving out the row
+        itself and names without embeddings. Returns (neighbors, similarities), two
+        (len(rows), k) arrays padded with -1 and NaN when fewer than k names qualify.
+        Args:
+            rows (list[int]): the rows to find neighbors of
+            k (int): how many neighbors to find for each row
+            among (list[int]): the only rows that may be neighbors; every row by default
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        among = np.arange(len(self.names)) if among is None else \
+            np.asarray(among, dtype=np.int64)
+        among = among[self.covered[among]]
+        neighbors = np.full((len(rows), k), -1, dtype=np.int64)
+        similarities = np.full((len(rows), k), np.nan, dtype=np.float32)
+        if not len(rows) or not len(among) or k <= 0:
+            return neighbors, similarities
+        if self.approximate:
+            self._query_buckets(rows, k, among, neighbors, similarities)
+            return neighbors, similarities
+
+        for start in range(0, len(rows), self.BLOCK_ROWS):
+            block = rows[start:start + self.BLOCK_ROWS]
+            products = self.vectors[block] @ self.vectors[among].T
+            products[among[None, :] == block[:, None]] = -np.inf
+            products[~self.covered[block]] = -np.inf
+            self._top_k(products, among, k, neighbors[start:start + len(block)],
+                        similarities[start:start + len(block)])
+        return neighbors, similarities
+
+    def _query_buckets(self, rows, k, among, neighbors, similarities):
+        """
+        Fills in query()'s results by comparing each row only with the names that share
+        one of its buckets.
+        """
+        allowed = np.zeros(len(self.names), dtype=bool)
+        allowed[among] = True
+        codes = self.codes[:, rows]
+        starts = np.stack([np.searchsorted(self.sorted_codes[table], codes[table], 'left')
+                           for table in range(len(codes))])
+        stops = np.stack([np.searchsorted(self.sorted_codes[table], codes[table], 'right')
+                          for table in range(len(codes))])
+        for position, row in enumerate(rows.tolist()):
+            if not self.covered[row]:
+                continue
+            candidates = np.unique(np.concatenate(
+                [self.order[table, starts[table, position]:stops[table, position]]
+                 for table in range(len(codes))]))
+            candidates = candidates[allowed[candidates] & (candidates != row)]
+            if not len(candidates):
+                continue
+            products = (self.vectors[candidates] @ self.vectors[row])[None, :]
+            self._top_k(products, candidates, k, neighbors[position:position + 1],
+                        similarities[position:position + 1])
+
+    @staticmethod
+    def _top_k(products, columns, k, neighbors, similarities):
+        """
+        Writes the k largest finite products of each row, best first, and the columns they
+        belong to into neighbors and similarities.
+        """
+        size = min(k, products.shape[1])
+        top = np.argpartition(-products, size - 1, axis=1)[:, :size]
+        top_products = np.take_along_axis(products, top, axis=1)
+        order = np.argsort(-top_products, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_products = np.take_along_axis(top_products, order, axis=1)
+        found = np.isfinite(top_products)
+        neighbors[:, :size] = np.where(found, columns[top], -1)
+        similarities[:, :size] = np.where(found, top_products, np.nan)
+
+
+def embedding_key():
+    """
+    Returns a string that changes whenever the embedding files get_embeddings() reads are
+    replaced or modified.
+    """
+    parts = []
+    for path in (_paths["matrix"], _paths["vocab"]):
+        stat = os.stat(path)
+        parts.append(f'{abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}')
+    return '\0'.join(parts)
+
+
+def similarity_key(names):
+    """
+    Returns a hash of a vocabulary, the current embedding files and the code that compares
+    names, which a saved SimilarityMatrix has to match to be reused.
+    Args:
+        names (list[str]): the ingredient names of the matrix
+    """
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(EmbeddingTable.similarity_matrix).encode('utf-8'))
+    digest.update(embedding_key().encode('utf-8'))
+    for name in names:
+        digest.update(name.encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+def get_embeddings():
+    """
+    Returns the shared EmbeddingTable, opening it on first use.
+    """
+    global _table
+    if _table is None:
+        _table = EmbeddingTable.load(_paths["matrix"], _paths["vocab"])
+    return _table
+
+
+def use_embeddings(matrix_path=MATRIX_PATH, vocab_path=VOCAB_PATH):
+    """
+    Points get_embeddings() at a different matrix and vocabulary file. The files are
+    opened the next time an embedding is needed.
+    Args:
+        matrix_path (str): path to the .npy file holding the float32 matrix
+        vocab_path (str): path to the text file with the word for each row
+    """
+    global _table
+    _paths["matrix"] = matrix_path
+    _paths["vocab"] = vocab_path
+    _table = None
+
+
+def convert(pickle_path=PICKLE_PATH, matrix_path=MATRIX_PATH, vocab_path=VOCAB_PATH):
+    """
+    Converts a pickled dictionary of word -> vector, like ingred_word_emb.npy, into the
+    matrix and vocabulary files that get_embeddings() reads.
+    Args:
+        pickle_path (str): the pickled .npy file to convert
+        matrix_path (str): where to write the float32 matrix
+        vocab_path (str): where to write the words, one per line
+    """
+    table = EmbeddingTable.from_pickle(pickle_path)
+    table.save(matrix_path, vocab_path)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert a pickled word embedding .npy file into a matrix and vocabulary file.')
+    parser.add_argument('pickle_path', nargs='?', default=PICKLE_PATH)
+    parser.add_argument('matrix_path', nargs='?', default=MATRIX_PATH)
+    parser.add_argument('vocab_path', nargs='?', default=VOCAB_PATH)
+    args = parser.parse_args()
+
+    table = convert(args.pickle_path, args.matrix_path, args.vocab_path)
+    print(f'wrote {len(table.words)} words to {args.matrix_path} and {args.vocab_path}')
+
+
+if __name__ == '__main__':
+    main()
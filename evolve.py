@@ -0,0 +1,401 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file evolves generated cookie recipes with a genetic algorithm, instead
+of blindly sampling new ones with Population.generate. Each generation keeps
+the best few recipes (elitism), picks parents by tournament, and makes
+children by crossing over their core and extra ingredients separately and
+then mutating them: an ingredient's amount may be nudged, and an extra
+ingredient may be swapped for another. Candidates are scored a generation at
+a time with Population.fitness_batch.
+
+run_islands evolves several populations ("islands") in separate processes,
+and every few generations sends each island's best recipes to the next one.
+Running this file reports how many evaluations the genetic algorithm needs
+to reach a target fitness, compared to random sampling.
+"""
+
+import argparse
+import os
+from math import exp
+from multiprocessing import Pool
+
+import numpy as np
+
+import instrument
+from corpus_cache import load_columns, load_population
+from cookie_gen import GeneratedRecipe, Ingredient, Recipe, RecipeBatch
+from fitness_cache import FitnessCache
+
+
+class Evolution:
+    def __init__(self, population, size=100, elite=2, tournament_size=3, crossover_rate=0.9,
+                 mutation_rate=0.5, swap_rate=0.3, amount_sigma=0.3,
+                 num_core=Recipe.NUM_CORE, extras_range=(4, 6), seed=None, cache=None):
+        """
+        This class represents one evolving set of candidate recipes.
+        Args:
+            population (Population): the inspiring set to generate and score recipes with
+            size (int): number of candidates in each generation
+            elite (int): how many of the best candidates are carried over unchanged
+            tournament_size (int): how many candidates compete to become each parent
+            crossover_rate (float): chance that a child mixes two parents, rather than
+            copying one
+            mutation_rate (float): chance that a child has one ingredient amount changed
+            swap_rate (float): chance that a child has one extra ingredient replaced
+            amount_sigma (float): spread of the log-normal factor amounts are scaled by
+            num_core (int): passed to Population.generate_batch for the first generation
+            extras_range (tuple[int, int]): passed to Population.generate_batch
+            seed (int or np.random.Generator): seeds every random choice
+            cache (FitnessCache): if given, repeated recipes are looked up instead of scored
+        """
+        self.population = population
+        self.size = size
+        self.elite = elite
+        self.tournament_size = tournament_size
+        self.crossover_rate = crossover_rate
+        self.mutation_rate = mutation_rate
+        self.swap_rate = swap_rate
+        self.amount_sigma = amount_sigma
+        self.num_core = num_core
+        self.extras_range = extras_range
+        self.rng = np.random.default_rng(seed)
+        self.cache = cache
+
+        self.candidates = []
+        self.fitness = np.zeros(0)
+        self.generation = 0
+        self.evaluations = 0
+        self.target = None
+        # how many evaluations it took to first reach target
+        self.evaluations_to_target = None
+        self.best_fitness = -np.inf
+        self.best_recipe = None
+
+    def __getstate__(self):
+        # islands are sent between processes without the population; each worker has its own
+        state = self.__dict__.copy()
+        state["population"] = None
+        return state
+
+    def score(self, recipes):
+        """
+        Scores a list of recipes, counting the evaluations and keeping track of the best
+        recipe and of when the target was first reached.
+        Args:
+            recipes (list[GeneratedRecipe]): the recipes to score
+        """
+        batch = RecipeBatch.from_recipes(recipes, self.population)
+        if self.cache is not None:
+            fitness = self.cache.fitness_batch(batch)
+        else:
+            fitness = self.population.fitness_batch(batch).fitness
+        fitness = np.nan_to_num(fitness, nan=-np.inf)
+
+        if self.target is not None and self.evaluations_to_target is None:
+            hits = np.flatnonzero(fitness >= self.target)
+            if hits.size:
+                self.evaluations_to_target = self.evaluations + int(hits[0]) + 1
+        self.evaluations += len(recipes)
+
+        best = int(np.argmax(fitness))
+        if fitness[best] > self.best_fitness:
+            self.best_fitness = float(fitness[best])
+            self.best_recipe = recipes[best]
+        return fitness
+
+    def start(self):
+        """
+        Fills the first generation with recipes from Population.generate_batch.
+        """
+        batch = self.population.generate_batch(
+            self.size, self.num_core, self.extras_range, self.rng)
+        self.candidates = [batch.recipe(row) for row in range(len(batch))]
+        self.fitness = self.score(self.candidates)
+
+    def step(self):
+        """
+        Replaces the current generation with the next one.
+        """
+        order = np.argsort(-self.fitness, kind='stable')
+        elites = [self.candidates[index] for index in order[:self.elite]]
+        elite_fitness = self.fitness[order[:self.elite]]
+
+        children = []
+        while len(elites) + len(children) < self.size:
+            parent = self.select()
+            if self.rng.random() < self.crossover_rate:
+                core, extras = self.crossover(parent, self.select())
+            else:
+                core, extras = _genes(parent)
+            children.append(self.mutate(core, extras, parent.name))
+
+        self.candidates = elites + children
+        self.fitness = np.concatenate((elite_fitness, self.score(children)))
+        self.generation += 1
+
+    def run(self, generations=None, target=None, max_evaluations=None):
+        """
+        Evolves until the given number of generations, the target fitness or the maximum
+        number of evaluations is reached, whichever comes first. Returns the best fitness
+        and recipe seen so far.
+        Args:
+            generations (int): how many more generations to evolve
+            target (float): stop once a recipe scores at least this
+            max_evaluations (int): stop once this many recipes have been scored in total
+        """
+        if target is not None:
+            self.target = target
+        if not self.candidates:
+            self.start()
+
+        done = 0
+        while generations is None or done < generations:
+            if self.evaluations_to_target is not None:
+                break
+            if max_evaluations is not None and self.evaluations >= max_evaluations:
+                break
+            if generations is None and target is None and max_evaluations is None:
+                break
+            self.step()
+            done += 1
+        return self.best_fitness, self.best_recipe
+
+    def select(self):
+        """
+        Returns the fittest of tournament_size randomly chosen candidates.
+        """
+        entrants = self.rng.integers(len(self.candidates), size=self.tournament_size)
+        return self.candidates[entrants[np.argmax(self.fitness[entrants])]]
+
+    def crossover(self, first, second):
+        """
+        Mixes two parents, keeping core and extra ingredients apart. Core ingredients both
+        parents share take either parent's amount, and the rest of the core is filled from
+        the ones only one parent has. The extras are a random selection from both parents'
+        extras, as many as one of the parents has. Returns (core, extras) as lists of
+        (name, amount).
+        Args:
+            first (GeneratedRecipe): a parent
+            second (GeneratedRecipe): the other parent
+        """
+        first_core, first_extras = _genes(first)
+        second_core, second_extras = _genes(second)
+
+        core_amounts = {}
+        for name, amount in first_core + second_core:
+            core_amounts.setdefault(name, []).append(amount)
+        shared = [name for name, _ in first_core if len(core_amounts[name]) == 2]
+        only_one = [name for name in core_amounts if len(core_amounts[name]) == 1]
+        only_one = [only_one[index] for index in self.rng.permutation(len(only_one))]
+        core_names = shared + only_one[:len(first_core) - len(shared)]
+        core = [(name, core_amounts[name][self.rng.integers(len(core_amounts[name]))])
+                for name in core_names]
+
+        extra_amounts = {}
+        for name, amount in first_extras + second_extras:
+            if name not in core_amounts:
+                extra_amounts.setdefault(name, []).append(amount)
+        names = list(extra_amounts)
+        sizes = sorted((len(first_extras), len(second_extras)))
+        num_extras = min(int(self.rng.integers(sizes[0], sizes[1] + 1)), len(names))
+        chosen = self.rng.choice(len(names), size=num_extras, replace=False)
+        extras = [(names[index], extra_amounts[names[index]][
+            self.rng.integers(len(extra_amounts[names[index]]))]) for index in chosen]
+        return core, extras
+
+    def mutate(self, core, extras, name):
+        """
+        Builds a child recipe, maybe scaling one ingredient's amount (kept within the range
+        the inspiring set uses it in) and maybe swapping one extra ingredient for another
+        from the extra pool.
+        Args:
+            core (list[tuple[str, float]]): the child's core ingredients
+            extras (list[tuple[str, float]]): the child's extra ingredients
+            name (str): the parent's name, kept if its namesake ingredient survives
+        """
+        ingredients = core + extras
+        amounts = self.population.amounts
+        if self.rng.random() < self.mutation_rate:
+            index = int(self.rng.integers(len(ingredients)))
+            ingredient, amount = ingredients[index]
+            ingredient_id = self.population.ingredient_ids[ingredient]
+            amount *= exp(self.rng.normal(0, self.amount_sigma))
+            amount = min(max(amount, amounts.low[ingredient_id]), amounts.high[ingredient_id])
+            ingredients[index] = (ingredient, float(amount))
+
+        if extras and self.rng.random() < self.swap_rate:
+            pool = self.population.ranking.pools(self.num_core)[2]
+            present = {ingredient for ingredient, _ in ingredients}
+            if len(pool) > len(present):
+                replacement = pool[self.rng.integers(len(pool))]
+                while replacement in present:
+                    replacement = pool[self.rng.integers(len(pool))]
+                # reuse the amount from a random recipe that has the new ingredient
+                values, offsets = self.population.amount_samples
+                replacement_id = self.population.ingredient_ids[replacement]
+                sample = offsets[replacement_id] + \
+                    self.rng.integers(amounts.counts[replacement_id])
+                index = len(core) + int(self.rng.integers(len(extras)))
+                ingredients[index] = (replacement, float(values[sample]))
+
+        extra_names = [ingredient for ingredient, _ in ingredients[len(core):]]
+        if not name.endswith(" cookie") or name[:-len(" cookie")] not in extra_names:
+            name = extra_names[self.rng.integers(len(extra_names))] + " cookie"
+        return GeneratedRecipe(name, [Ingredient(ingredient, amount)
+                                      for ingredient, amount in ingredients])
+
+
+def _genes(recipe):
+    """
+    Splits a generated recipe into lists of (name, amount) for its core and extra ingredients.
+    """
+    return ([(ingredient.name, ingredient.amount) for ingredient in recipe.core_ingredients],
+            [(ingredient.name, ingredient.amount) for ingredient in recipe.extra_ingredients])
+
+
+def random_evaluations_to_target(population, target, max_evaluations, num_core=Recipe.NUM_CORE,
+                                 extras_range=(4, 6), seed=None, chunk_size=1000):
+    """
+    Returns how many recipes random sampling with Population.generate_batch scores before
+    one reaches target, or None if none does within max_evaluations.
+    Args:
+        population (Population): the inspiring set to generate and score recipes with
+        target (float): the fitness to reach
+        max_evaluations (int): give up after scoring this many recipes
+        num_core (int): passed to Population.generate_batch
+        extras_range (tuple[int, int]): passed to Population.generate_batch
+        seed (int or np.random.Generator): seeds the random recipes
+        chunk_size (int): how many recipes to generate and score at once
+    """
+    rng = np.random.default_rng(seed)
+    evaluations = 0
+    while evaluations < max_evaluations:
+        size = min(chunk_size, max_evaluations - evaluations)
+        batch = population.generate_batch(size, num_core, extras_range, rng)
+        hits = np.flatnonzero(population.fitness_batch(batch).fitness >= target)
+        if hits.size:
+            return evaluations + int(hits[0]) + 1
+        evaluations += size
+    return None
+
+
+# the population each island process builds once in _init_island
+_population = None
+
+
+def _init_island(recipe_dir):
+    """
+    Builds the island process's Population from the recipes in recipe_dir.
+    """
+    global _population
+    _population = load_population(recipe_dir)
+
+
+def _run_island(task):
+    """
+    Evolves one island for a number of generations and sends it back.
+    Args:
+        task (tuple): (Evolution, number of generations, target fitness)
+    """
+    evolution, generations, target = task
+    evolution.population = _population
+    if evolution.cache is not None:
+        evolution.cache.population = _population
+    evolution.run(generations, target)
+    instrument.flush()
+    return evolution
+
+
+def run_islands(num_islands=4, generations=100, migration_interval=10, migrants=2,
+                target=None, seed=0, recipe_dir='recipes', **options):
+    """
+    Evolves num_islands separate sets of candidates, each in its own process. Every
+    migration_interval generations, the best migrants candidates of each island replace the
+    worst of the next island. Returns a dictionary with the best fitness and recipe, the
+    total number of evaluations, and the total evaluations spent by the end of the round
+    in which an island first reached target (None if none did).
+        Args:
+            num_islands (int): number of islands, and of worker processes
+            generations (int): how many generations to evolve each island for at most
+            migration_interval (int): generations between migrations
+            migrants (int): how many candidates each island sends to the next
+            target (float): stop once a recipe scores at least this
+            seed (int): seeds every island; the same seed and islands give the same result
+            recipe_dir (str): the directory of recipe text files to build populations from
+            options: passed on to each island's Evolution; a cache given here is copied to
+            each island process, so islands don't share entries
+    """
+    load_columns(recipe_dir)
+    seeds = np.random.SeedSequence(seed).spawn(num_islands)
+    islands = [Evolution(None, seed=island_seed, **options) for island_seed in seeds]
+
+    evaluations_to_target = None
+
+    with Pool(num_islands, initializer=_init_island, initargs=(recipe_dir,)) as pool:
+        done = 0
+        while done < generations and evaluations_to_target is None:
+            rounds = min(migration_interval, generations - done)
+            islands = pool.map(_run_island, [(island, rounds, target) for island in islands])
+            done += rounds
+            if any(island.evaluations_to_target is not None for island in islands):
+                evaluations_to_target = sum(island.evaluations for island in islands)
+
+            # ring migration: each island's best replace the next island's worst
+            outgoing = [np.argsort(-island.fitness, kind='stable')[:migrants]
+                        for island in islands]
+            arriving = [([island.candidates[index] for index in best], island.fitness[best])
+                        for island, best in zip(islands, outgoing)]
+            for number, island in enumerate(islands):
+                candidates, fitness = arriving[number - 1]
+                worst = np.argsort(island.fitness, kind='stable')[:len(candidates)]
+                for slot, candidate, score in zip(worst, candidates, fitness):
+                    island.candidates[slot] = candidate
+                    island.fitness[slot] = score
+
+    best = max(islands, key=lambda island: island.best_fitness)
+    return {
+        "best_fitness": best.best_fitness,
+        "best_recipe": best.best_recipe,
+        "evaluations": sum(island.evaluations for island in islands),
+        "evaluations_to_target": evaluations_to_target,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare evaluations needed to reach a target fitness by random sampling '
+                    'and by the genetic algorithm.')
+    parser.add_argument('--target', type=float, default=1.1)
+    parser.add_argument('--max-evaluations', type=int, default=200000)
+    parser.add_argument('--islands', type=int, default=min(4, os.cpu_count()))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', action='store_true',
+                        help='look repeated recipes up in a FitnessCache; scoring a '
+                             'generation directly is faster unless most recipes repeat')
+    args = parser.parse_args()
+
+    population = load_population()
+    random_evaluations = random_evaluations_to_target(
+        population, args.target, args.max_evaluations, seed=args.seed)
+    print(f'random sampling: {random_evaluations} evaluations to reach {args.target}')
+
+    cache = FitnessCache(population) if args.cache else None
+    evolution = Evolution(population, seed=args.seed, cache=cache)
+    evolution.run(target=args.target, max_evaluations=args.max_evaluations)
+    print(f'genetic algorithm: {evolution.evaluations_to_target} evaluations to reach '
+          f'{args.target} (best {evolution.best_fitness:.3f})')
+    if cache is not None:
+        print(f'fitness cache: {cache.stats()}')
+
+    result = run_islands(args.islands, generations=args.max_evaluations // (100 * args.islands),
+                         target=args.target, seed=args.seed)
+    print(f'{args.islands} islands: {result["evaluations_to_target"]} evaluations to reach '
+          f'{args.target} (best {result["best_fitness"]:.3f})')
+    print(result["best_recipe"])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file memoizes Population.fitness. Search loops keep producing the
+same recipe, or recipes that only differ in the third decimal of an
+amount, and each of those used to be scored from scratch. Recipes are
+looked up by a canonical signature: the sorted ids of their core and extra
+ingredients with amounts rounded to a quantum (0.01 grams by default), so
+near-identical recipes share one entry. Signatures of a whole batch are
+built with array operations, since building them one recipe at a time cost
+more than scoring. extras_similarity only depends on which extras a recipe
+has, so it is cached separately and shared between every amount variant of
+the same extras. Both stores are bounded LRU caches that count their hits,
+misses and evictions.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUStore:
+    def __init__(self, max_entries):
+        """
+        This class represents a dictionary that holds at most max_entries items, dropping
+        the least recently used one when it is full.
+        Args:
+            max_entries (int): the most items to hold
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Returns the value stored for key, or None, counting a hit or a miss.
+        Args:
+            key: the key to look up
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting the least recently used item if needed.
+        Args:
+            key: the key to store value under
+            value: the value, which can't be None
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+class FitnessCache:
+    def __init__(self, population, max_entries=100000, max_similarities=100000, quantum=0.01):
+        """
+        This class memoizes Population.fitness and Population.fitness_batch for recipes
+        scored against the population itself.
+        Args:
+            population (Population): the population to score recipes with
+            max_entries (int): the most recipe fitnesses to remember
+            max_similarities (int): the most extras similarities to remember
+            quantum (float): amounts are rounded to a multiple of this in signatures
+        """
+        self.population = population
+        self.quantum = quantum
+        self.fitnesses = LRUStore(max_entries)
+        self.similarities = LRUStore(max_similarities)
+
+    def __getstate__(self):
+        # like Evolution, the cache travels between processes without its population
+        state = self.__dict__.copy()
+        state["population"] = None
+        return state
+
+    def signature(self, core, extras):
+        """
+        Returns the canonical signature of a recipe given its core and extra ingredients.
+        Args:
+            core (list[tuple[int, float]]): (ingredient id, amount) of each core ingredient
+            extras (list[tuple[int, float]]): (ingredient id, amount) of each extra ingredient
+        """
+        triples = [value for section, entries in enumerate((core, extras))
+                   for ingredient_id, quanta in sorted(
+                       (ingredient_id, round(amount / self.quantum))
+                       for ingredient_id, amount in entries)
+                   for value in (section, ingredient_id, quanta)]
+        # the same bytes as a row of canonical_rows
+        return np.array(triples, dtype=np.int64).tobytes()
+
+    def canonical_rows(self, ids, amounts, core_mask, extra_mask):
+        """
+        Returns an (n, 3 * width) int64 array of a (section, ingredient id, amount in
+        quanta) triple per ingredient of each recipe, the core section (0) first, then the
+        extras (1), then unused slots (2), each sorted by id and amount. Also returns the
+        number of used slots of each recipe. A signature is the bytes of a row's used
+        triples.
+        Args:
+            ids (np.ndarray): (n, width) ingredient ids
+            amounts (np.ndarray): (n, width) amounts
+            core_mask (np.ndarray): (n, width) bools marking core ingredients
+            extra_mask (np.ndarray): (n, width) bools marking extra ingredients
+        """
+        section = np.where(core_mask, 0, np.where(extra_mask, 1, 2))
+        used = section < 2
+        # np.round rounds halves to even, like round()
+        quanta = np.where(used, np.round(amounts / self.quantum), 0).astype(np.int64)
+        ids = np.where(used, ids, -1)
+        order = np.lexsort((quanta, ids, section), axis=-1)
+        rows = np.stack([np.take_along_axis(column, order, axis=1)
+                         for column in (section, ids, quanta)], axis=2)
+        return rows.reshape(len(rows), -1), used.sum(axis=1)
+
+    def fitness(self, recipe):
+        """
+        Returns Population.fitness(recipe), reusing the score of any recipe with the same
+        signature, and the similarity of any recipe with the same extras.
+        Args:
+            recipe (GeneratedRecipe): the recipe to score
+        """
+        ids = self.population.ingredient_ids
+        core = [(ids[ingredient.name], ingredient.amount)
+                for ingredient in recipe.core_ingredients]
+        extras = [(ids[ingredient.name], ingredient.amount)
+                  for ingredient in recipe.extra_ingredients]
+        key = self.signature(core, extras)
+        fitness = self.fitnesses.get(key)
+        if fitness is not None:
+            return fitness
+
+        extras_key = self.extras_key(key)
+        similarity = self.similarities.get(extras_key)
+        if similarity is None:
+            similarity = recipe.extras_similarity(self.population.similarities)
+            # None can't be stored, so a missing similarity is kept as NaN
+            self.similarities.put(extras_key, np.nan if similarity is None else similarity)
+        elif np.isnan(similarity):
+            similarity = None
+
+        evaluations = [self.population.recipe_tf_idf(recipe),
+                       self.population.core_fitness(recipe)]
+        if similarity:
+            evaluations.append(similarity)
+        fitness = sum(evaluations) / len(evaluations)
+        self.fitnesses.put(key, fitness)
+        return fitness
+
+    def fitness_batch(self, batch):
+        """
+        Returns the fitness of every recipe of a RecipeBatch, like
+        Population.fitness_batch(batch).fitness, only scoring each distinct signature that
+        misses the cache once, and reusing the similarity of any recipe with the same extras.
+        Args:
+            batch (RecipeBatch): the recipes to score
+        """
+        rows, used = self.canonical_rows(batch.ingredient_ids, batch.amounts,
+                                         batch.core_mask, batch.extra_mask)
+        starts = 3 * batch.core_mask.sum(axis=1)
+        stops = 3 * used
+        fitness = np.empty(len(batch))
+        # signature -> (the rows with it, the first of them, where its extras start)
+        missing = {}
+        for row, (start, stop) in enumerate(zip(starts.tolist(), stops.tolist())):
+            key = rows[row, :stop].tobytes()
+            rows_with_key = missing.get(key)
+            if rows_with_key is not None:
+                rows_with_key[0].append(row)
+                continue
+            cached = self.fitnesses.get(key)
+            if cached is None:
+                missing[key] = ([row], row, start)
+            else:
+                fitness[row] = cached
+
+        # rows whose extras were seen before skip the similarity, the rest compute it
+        known = []
+        unknown = []
+        for key, (_, row, start) in missing.items():
+            similarity = self.similarities.get(rows[row, start + 1:3 * used[row]:3].tobytes())
+            if similarity is None:
+                unknown.append(key)
+            else:
+                known.append((key, similarity))
+        if known:
+            keys = [key for key, _ in known]
+            scores = self.population.fitness_batch(
+                batch.take([missing[key][1] for key in keys]),
+                similarity=np.array([similarity for _, similarity in known]))
+            self._store(keys, missing, scores, fitness)
+        if unknown:
+            scores = self.population.fitness_batch(
+                batch.take([missing[key][1] for key in unknown]))
+            self._store(unknown, missing, scores, fitness)
+            for key, similarity in zip(unknown, scores.similarity.tolist()):
+                _, row, start = missing[key]
+                self.similarities.put(rows[row, start + 1:3 * used[row]:3].tobytes(),
+                                      similarity)
+        return fitness
+
+    @staticmethod
+    def extras_key(key):
+        """
+        Returns the similarity store key of a recipe signature: the ids of its extras.
+        Args:
+            key (bytes): the recipe signature
+        """
+        triples = np.frombuffer(key, dtype=np.int64).reshape(-1, 3)
+        return triples[triples[:, 0] == 1, 1].tobytes()
+
+    def _store(self, keys, missing, scores, fitness):
+        """
+        Remembers the scored fitness of each signature and copies it to its place.
+        Args:
+            keys (list[bytes]): the scored signatures, in the order of scores
+            missing (dict): signature -> (the rows with it, the first of them, where its
+                extras start), like in fitness_batch
+            scores (BatchFitness): the scores of one row per signature
+            fitness (np.ndarray): the fitnesses of the batch, filled in place
+        """
+        for key, score in zip(keys, scores.fitness.tolist()):
+            self.fitnesses.put(key, score)
+            fitness[missing[key][0]] = score
+
+    def stats(self):
+        """
+        Returns the entries, hits, misses and evictions of both stores.
+        """
+        return {"fitness": self.fitnesses.stats(), "similarity": self.similarities.stats()}
@@ -0,0 +1,352 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file measures where a run spends its time. While a Profile is enabled,
+the hot functions of clean_text, cookie_gen and unit_conversion are replaced
+by wrappers that time and count every call, count embedding and unit lookups
+that hit or miss, and count generated and scored candidates. Disabling it
+puts the original functions back, so a run that never enables a Profile
+runs exactly the code it would without this file.
+
+Use it as a context manager:
+
+    with instrument.profiled('profile.json') as profile:
+        ...
+    print(profile.report())
+
+or set COOKIE_PROFILE=profile.json to profile a whole run of any of the
+scripts and write the profile when it exits. Timers are inclusive, so
+fitness() also counts the time of the recipe_tf_idf() calls it makes.
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+ENVIRONMENT_VARIABLE = 'COOKIE_PROFILE'
+
+
+def _count_embedding_words(profile, args, kwargs, result):
+    # EmbeddingTable.word_similarity looks up both of its words
+    table = args[0]
+    words = list(args[1:]) + [kwargs[name] for name in ('w1', 'w2') if name in kwargs]
+    hits = sum(word in table.index for word in words)
+    profile.count('embedding_hits', hits)
+    profile.count('embedding_misses', len(words) - hits)
+
+
+def _count_ingredient_vector(profile, args, kwargs, result):
+    # ingredient_vector gives None when either ingredient has no embedding
+    profile.count('ingredient_vector_misses' if result is None else 'ingredient_vector_hits')
+
+
+def _count_pair_similarities(profile, args, kwargs, result):
+    # SimilarityMatrix.pair_similarities gives None when it has to fall back to embeddings
+    profile.count('similarity_matrix_misses' if result is None else 'similarity_matrix_hits')
+
+
+def _count_candidates(counter):
+    """
+    Returns a function counting one candidate per recipe, or len(batch) for a batch.
+    """
+    def count(profile, args, kwargs, result):
+        profile.count(counter, len(result) if hasattr(result, '__len__') else 1)
+    return count
+
+
+# (module, attribute, stage name, a function counting more than calls or None)
+TARGETS = [
+    ('clean_text', 'parse_recipe_files', 'clean_text.parse_recipe_files', None),
+    ('clean_text', 'parse_recipe_file', 'clean_text.parse_recipe_file', None),
+    ('clean_text', 'split_ingredient', 'clean_text.split_ingredient', None),
+    ('unit_conversion', 'UnitRegistry.convert', 'unit_conversion.convert', None),
+    ('unit_conversion', 'UnitRegistry.convert_columns', 'unit_conversion.convert_columns',
+     None),
+    ('cookie_gen', 'translate', 'cookie_gen.translate', None),
+    ('cookie_gen', 'translate_ingredients', 'cookie_gen.translate_ingredients', None),
+    ('cookie_gen', 'ingredient_vector', 'cookie_gen.ingredient_vector',
+     _count_ingredient_vector),
+    ('cookie_gen', 'ingredient_similarity', 'cookie_gen.ingredient_similarity', None),
+    ('cookie_gen', 'Population.__init__', 'cookie_gen.Population.__init__', None),
+    ('cookie_gen', 'Population.generate', 'cookie_gen.Population.generate',
+     _count_candidates('candidates')),
+    ('cookie_gen', 'Population.generate_batch', 'cookie_gen.Population.generate_batch',
+     _count_candidates('candidates')),
+    ('cookie_gen', 'Population.fitness', 'cookie_gen.Population.fitness',
+     _count_candidates('scored')),
+    ('cookie_gen', 'Population.fitness_batch', 'cookie_gen.Population.fitness_batch',
+     _count_candidates('scored')),
+    ('cookie_gen', 'Population.recipe_tf_idf', 'cookie_gen.Population.recipe_tf_idf', None),
+    ('cookie_gen', 'Population.core_fitness', 'cookie_gen.Population.core_fitness', None),
+    ('cookie_gen', 'RecipeIndex.nearest', 'cookie_gen.RecipeIndex.nearest', None),
+    ('cookie_gen', 'GeneratedRecipe.extras_similarity',
+     'cookie_gen.GeneratedRecipe.extras_similarity', None),
+    ('embeddings', 'EmbeddingTable.word_similarity',
+     'embeddings.EmbeddingTable.word_similarity', _count_embedding_words),
+    ('embeddings', 'EmbeddingTable.similarity_matrix',
+     'embeddings.EmbeddingTable.similarity_matrix', None),
+    ('embeddings', 'SimilarityMatrix.pair_similarities',
+     'embeddings.SimilarityMatrix.pair_similarities', _count_pair_similarities),
+]
+
+# the Profile the wrappers currently record into, and what they replaced
+_active = None
+_patches = []
+_lock = threading.Lock()
+# where enable_from_environment writes its profile
+_environment_path = None
+
+
+class Profile:
+    def __init__(self, hooks=()):
+        """
+        This class collects the timers and counters of one profiled stretch of a run.
+        Args:
+            hooks (list): functions called as hook(stage, seconds) after every timed call
+        """
+        self.hooks = list(hooks)
+        # stage -> [calls, seconds]
+        self.timers = {}
+        self.counters = {}
+        self.started = None
+        self.stopped = None
+
+    def add_time(self, stage, seconds):
+        """
+        Records one call of a stage that took seconds.
+        """
+        with _lock:
+            timer = self.timers.setdefault(stage, [0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    def count(self, counter, amount=1):
+        """
+        Adds amount to a counter.
+        """
+        with _lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the body of a with statement as one call of a stage, for stages that
+        aren't a single function.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.stopped if self.stopped is not None else perf_counter()) - self.started
+
+    def report(self):
+        """
+        Returns the profile as a dictionary that can be written as JSON, including
+        candidates generated and scored per second of the profiled time.
+        """
+        elapsed = self.elapsed()
+        with _lock:
+            timers = {stage: {"calls": calls, "seconds": seconds,
+                              "seconds_per_call": seconds / calls}
+                      for stage, (calls, seconds) in sorted(self.timers.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {
+            "pid": os.getpid(),
+            "elapsed_seconds": elapsed,
+            "timers": timers,
+            "counters": counters,
+            "candidates_per_second": counters.get('candidates', 0) / elapsed if elapsed else None,
+            "scored_per_second": counters.get('scored', 0) / elapsed if elapsed else None,
+        }
+
+    def dump(self, path):
+        """
+        Writes report() to a JSON file.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=1)
+
+
+def _modules(name):
+    """
+    Returns every loaded copy of one of our modules, including __main__ when it is that
+    module run as a script.
+    """
+    modules = [sys.modules[name]] if name in sys.modules else []
+    main = sys.modules.get('__main__')
+    main_file = getattr(main, '__file__', None)
+    if main_file and os.path.splitext(os.path.basename(main_file))[0] == name:
+        modules.append(main)
+    return modules
+
+
+def _wrap(function, stage, counter):
+    """
+    Returns a wrapper that times and counts calls of function into the active Profile.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = _active
+        if profile is None:
+            return function(*args, **kwargs)
+        start = perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            profile.add_time(stage, perf_counter() - start)
+        if counter is not None:
+            counter(profile, args, kwargs, result)
+        return result
+    wrapper.__instrumented__ = function
+    return wrapper
+
+
+def _wrap_resolve(function):
+    """
+    Returns a wrapper for UnitRegistry.resolve that counts lookups its memo already had.
+    """
+    @wraps(function)
+    def wrapper(self, unit, name):
+        profile = _active
+        if profile is not None:
+            profile.count('unit_memo_hits' if (unit, name) in self.conversions
+                          else 'unit_memo_misses')
+        return function(self, unit, name)
+    wrapper.__instrumented__ = function
+    return wrapper
+
+
+def _install():
+    """
+    Wraps every target in every loaded copy of its module that isn't wrapped yet.
+    """
+    targets = TARGETS + [('unit_conversion', 'UnitRegistry.resolve', None, None)]
+    for module_name, attribute, stage, counter in targets:
+        for module in _modules(module_name):
+            owner = module
+            *path, name = attribute.split('.')
+            for part in path:
+                owner = getattr(owner, part, None)
+            function = getattr(owner, name, None) if owner is not None else None
+            if function is None or hasattr(function, '__instrumented__'):
+                continue
+            wrapper = _wrap_resolve(function) if stage is None else \
+                _wrap(function, stage, counter)
+            # functions other modules imported by name are replaced there too
+            holders = [owner] + [other for other in list(sys.modules.values())
+                                 if not path and other is not owner and
+                                 vars(other).get(name) is function]
+            for holder in holders:
+                setattr(holder, name, wrapper)
+                _patches.append((holder, name, function))
+
+
+def enable(profile=None):
+    """
+    Starts recording into profile (a new Profile by default) and returns it.
+    """
+    global _active
+    profile = profile or Profile()
+    _install()
+    profile.started = perf_counter()
+    profile.stopped = None
+    _active = profile
+    return profile
+
+
+def disable():
+    """
+    Stops recording, puts the original functions back, and returns the Profile that was
+    recording.
+    """
+    global _active
+    profile = _active
+    _active = None
+    while _patches:
+        holder, name, function = _patches.pop()
+        setattr(holder, name, function)
+    if profile is not None:
+        profile.stopped = perf_counter()
+    return profile
+
+
+@contextmanager
+def profiled(path=None, hooks=()):
+    """
+    Records a Profile for the body of a with statement, writing it to path as JSON at the
+    end if given.
+    Args:
+        path (str): where to write the profile, if anywhere
+        hooks (list): functions called as hook(stage, seconds) after every timed call
+    """
+    profile = enable(Profile(hooks))
+    try:
+        yield profile
+    finally:
+        disable()
+        if path:
+            profile.dump(path)
+
+
+def enable_from_environment():
+    """
+    If COOKIE_PROFILE names a file, profiles the rest of the run and writes the profile
+    there when the process exits. Worker processes write to the same name with their
+    process id added. Calling it again wraps any modules loaded since.
+    """
+    global _environment_path
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    if not path:
+        return
+    if _active is not None:
+        _install()
+        return
+    if multiprocessing.parent_process() is not None:
+        path = f'{path}.{os.getpid()}'
+    _environment_path = path
+    profile = enable()
+
+    def dump():
+        disable()
+        profile.dump(path)
+    atexit.register(dump)
+
+
+def _after_fork():
+    """
+    Gives a forked worker a Profile and profile file of its own, so it doesn't report the
+    parent's calls as its own.
+    """
+    global _environment_path
+    if _active is not None:
+        if _environment_path is not None:
+            _environment_path = f'{os.environ[ENVIRONMENT_VARIABLE]}.{os.getpid()}'
+        enable(Profile(_active.hooks))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def flush():
+    """
+    Writes the COOKIE_PROFILE profile so far, if there is one. Pool workers are stopped
+    without running atexit, so they call this at the end of each task instead.
+    """
+    if _active is not None and _environment_path is not None:
+        _active.dump(_environment_path)
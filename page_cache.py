@@ -0,0 +1,140 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file keeps the raw HTML of every page web_scrape fetches, so that
+fixing the parsing doesn't mean scraping everything again. Pages are stored
+by the sha256 of their content, so a page that hasn't changed (or the same
+page under two URLs) is only stored once. An index.json file maps each URL
+to its page's hash, the ETag and Last-Modified headers it was served with,
+what kind of page it is, and, for recipe pages, the recipe file made from it.
+Those URLs make up the skip list of pages that don't need fetching again.
+"""
+
+import hashlib
+import json
+import os
+import time
+from os.path import isfile, join
+
+from atomic_file import atomic_file
+
+INDEX_NAME = 'index.json'
+
+
+class PageCache:
+    def __init__(self, directory='pages.cache'):
+        """
+        This class represents a directory of cached pages and their index, which is read
+        when the cache is opened and written by save().
+        Args:
+            directory (str): where the pages and index.json are kept
+        """
+        self.directory = directory
+        self.index_path = join(directory, INDEX_NAME)
+        self.entries = {}
+        if isfile(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def page_path(self, digest):
+        """
+        Returns where the page with a given sha256 hex digest is stored.
+        """
+        return join(self.directory, 'pages', digest[:2], digest + '.html')
+
+    def store(self, url, html, etag=None, last_modified=None, kind='recipe'):
+        """
+        Stores the HTML fetched from url along with the headers needed to revalidate it.
+        Keeps the recipe file made from the URL's previous page only if the page is the same.
+        Args:
+            url (str): the URL the page was fetched from
+            html (str): the page's HTML
+            etag (str): the ETag header it was served with, if any
+            last_modified (str): the Last-Modified header it was served with, if any
+            kind (str): 'categories', 'type' or 'recipe', for re-extracting the cache
+        """
+        content = html.encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.page_path(digest)
+        if not isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_file(path) as file:
+                file.write(content)
+
+        previous = self.entries.get(url, {})
+        self.entries[url] = {
+            "sha256": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "kind": kind,
+            "fetched": time.time(),
+            "recipe_file": previous.get("recipe_file")
+            if previous.get("sha256") == digest else None,
+        }
+
+    def read(self, url):
+        """
+        Returns the cached HTML for url, or None if it was never stored.
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        with open(self.page_path(entry["sha256"]), 'r', encoding='utf-8') as file:
+            return file.read()
+
+    def revalidated(self, url):
+        """
+        Records that the server said url's cached page is still current (a 304 response).
+        """
+        self.entries[url]["fetched"] = time.time()
+
+    def conditional_headers(self, url):
+        """
+        Returns the If-None-Match and If-Modified-Since headers that let a server answer
+        304 Not Modified instead of sending url's page again.
+        """
+        entry = self.entries.get(url)
+        headers = {}
+        if entry is not None and isfile(self.page_path(entry["sha256"])):
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def mark_extracted(self, url, recipe_file):
+        """
+        Records that url's cached page was turned into recipe_file, adding it to the skip list.
+        """
+        self.entries[url]["recipe_file"] = recipe_file
+
+    def is_extracted(self, url):
+        """
+        Returns whether url is on the skip list: its page is cached and the recipe file
+        made from it still exists.
+        """
+        recipe_file = self.entries.get(url, {}).get("recipe_file")
+        return recipe_file is not None and isfile(recipe_file)
+
+    def urls(self, kind=None):
+        """
+        Returns every cached URL, or only those of one kind of page.
+        """
+        return [url for url, entry in self.entries.items()
+                if kind is None or entry["kind"] == kind]
+
+    def save(self):
+        """
+        Writes the index, replacing the old one only once the new one is complete.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_file(self.index_path) as file:
+            file.write(json.dumps(self.entries, indent=1, sort_keys=True).encode('utf-8'))
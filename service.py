@@ -0,0 +1,396 @@
+"""
+Authors: Danny Little, Bruce Tang, August Wadlington
+CSCI 3725
+Last Edited: 2026-10-18
+
+This file keeps a Population, its indexes and the embeddings warm in a
+long-running local HTTP server, so callers don't pay for building them on
+every run. It answers JSON requests on these paths:
+
+    POST /generate  {"n": 5, "seed": 0}                 -> n scored recipes
+    POST /score     {"recipes": [recipe, ...]}          -> the fitness of each recipe
+    POST /top_k     {"candidates": 10000, "k": 5, "seed": 0} -> the k best of many
+    GET  /health                                        -> status and metrics
+
+/generate and /top_k also take "extras": [fewest, most] and a "temperature"
+to pick extras guided by embedding neighbors, as Population.generate_batch does.
+A recipe is {"name": ..., "ingredients": [{"name": ..., "grams": ...}]}
+with its Recipe.NUM_CORE core ingredients first, like the output of
+python -m cookie_gen generate. Recipes sent to /score by concurrent requests
+are gathered into one RecipeBatch and scored together with fitness_batch.
+/generate and /top_k make their recipes a chunk at a time, so a large request
+doesn't hold the population (and /score) for its whole length.
+The server only listens on the loopback interface.
+
+Run it with: python service.py --port 8000
+"""
+
+import argparse
+import heapq
+import ipaddress
+import json
+import queue
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+import numpy as np
+
+from corpus_cache import load_population
+from cookie_gen import GeneratedRecipe, Ingredient, Recipe, RecipeBatch
+from driver import CHUNK_SIZE, _row_data
+from embeddings import use_embeddings
+
+# how many recent requests of each path latency percentiles are computed over
+LATENCY_WINDOW = 1000
+
+
+class ScoringBatcher:
+    def __init__(self, population, lock, max_batch=512, max_wait=0.002):
+        """
+        This class scores recipes from many threads by gathering them into batches on one
+        scoring thread. A batch is scored once it holds max_batch recipes, or max_wait
+        seconds after its first recipe arrived.
+        Args:
+            population (Population): the population to score recipes with
+            lock (threading.Lock): held while the population is in use
+            max_batch (int): the most recipes to score at once
+            max_wait (float): the longest to wait for more recipes before scoring
+        """
+        self.population = population
+        self.lock = lock
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.scored = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def queue_depth(self):
+        """
+        Returns how many requests are waiting to be scored.
+        """
+        return self.requests.qsize()
+
+    def score(self, recipes):
+        """
+        Scores a list of GeneratedRecipe with the next batch, and returns their BatchFitness
+        columns as a list of (fitness, tf_idf, core_fitness, similarity) tuples.
+        """
+        done = threading.Event()
+        request = [recipes, done, None]
+        self.requests.put(request)
+        done.wait()
+        if isinstance(request[2], Exception):
+            raise request[2]
+        return request[2]
+
+    def close(self):
+        self.requests.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            pending = [request]
+            size = len(request[0])
+            deadline = perf_counter() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=max(deadline - perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    # score what was gathered, then stop
+                    self.requests.put(None)
+                    break
+                pending.append(request)
+                size += len(request[0])
+            self._score(pending)
+
+    def _score(self, pending):
+        """
+        Scores every recipe of the pending requests as one RecipeBatch and hands each
+        request its own rows.
+        """
+        recipes = [recipe for request in pending for recipe in request[0]]
+        try:
+            with self.lock:
+                scores = self.population.fitness_batch(
+                    RecipeBatch.from_recipes(recipes, self.population))
+            rows = list(zip(scores.fitness.tolist(), scores.tf_idf.tolist(),
+                            scores.core_fitness.tolist(), scores.similarity.tolist()))
+        except Exception as error:
+            rows = None
+            for request in pending:
+                request[2] = error
+        self.batches += 1
+        self.scored += len(recipes)
+        start = 0
+        for request in pending:
+            if rows is not None:
+                request[2] = rows[start:start + len(request[0])]
+            start += len(request[0])
+            request[1].set()
+
+
+class RecipeService:
+    def __init__(self, population, max_batch=512, max_wait=0.002, max_candidates=100000):
+        """
+        This class answers the requests of the server, with a warm population.
+        Args:
+            population (Population): the population to generate and score with
+            max_batch (int): passed to ScoringBatcher
+            max_wait (float): passed to ScoringBatcher
+            max_candidates (int): the most recipes one /generate or /top_k may ask for
+        """
+        self.population = population
+        self.max_candidates = max_candidates
+        self.lock = threading.Lock()
+        # build every lazy index now rather than in the first request
+        population.fitness_batch(population.generate_batch(1, Recipe.NUM_CORE, seed=0))
+        self.batcher = ScoringBatcher(population, self.lock, max_batch, max_wait)
+        self.latencies = {}
+        self.errors = 0
+        # guards latencies and errors, which every handler thread updates
+        self.metrics_lock = threading.Lock()
+        self.started = perf_counter()
+
+    def generate(self, body):
+        """
+        Generates body["n"] recipes (1 by default) and returns them with their scores.
+        """
+        recipes = []
+        for batch, scores in self._chunks(body, self._size(body, "n", 1)):
+            recipes += [_recipe_json(batch, row, scores.fitness[row])
+                        for row in range(len(batch))]
+        return {"recipes": recipes}
+
+    def score(self, body):
+        """
+        Scores the recipes in body["recipes"], along with concurrent requests'.
+        """
+        recipes = []
+        for recipe in body["recipes"]:
+            if not isinstance(recipe, dict):
+                raise ValueError('each recipe must be a JSON object')
+            ingredients = [Ingredient(ingredient["name"], float(ingredient["grams"]))
+                           for ingredient in recipe["ingredients"]]
+            unknown = [ingredient.name for ingredient in ingredients
+                       if ingredient.name not in self.population.ingredient_ids]
+            if unknown:
+                raise ValueError(f'unknown ingredients: {", ".join(unknown)}')
+            # recipes are normalized to 1000 grams, which needs a positive total
+            if not sum(ingredient.amount for ingredient in ingredients) > 0:
+                raise ValueError(f'recipe {recipe.get("name", "")!r} weighs nothing')
+            recipes.append(GeneratedRecipe(recipe.get("name", ""), ingredients))
+        return {"scores": [{"fitness": _number(fitness), "tf_idf": _number(tf_idf),
+                            "core_fitness": _number(core_fitness),
+                            "similarity": _number(similarity)}
+                           for fitness, tf_idf, core_fitness, similarity
+                           in self.batcher.score(recipes)]}
+
+    def top_k(self, body):
+        """
+        Generates body["candidates"] recipes and returns the body["k"] (5 by default) most
+        fit, best first.
+        """
+        n = self._size(body, "candidates", 10000)
+        k = self._size(body, "k", 5)
+        # a min-heap of (fitness, -candidate number, recipe), like driver._search's
+        heap = []
+        done = 0
+        for batch, scores in self._chunks(body, n):
+            fitness = scores.fitness
+            for row in np.argsort(-fitness, kind='stable')[:k].tolist():
+                if np.isnan(fitness[row]):
+                    continue
+                key = (float(fitness[row]), -(done + row))
+                if len(heap) < k:
+                    heapq.heappush(heap, key + (_recipe_json(batch, row, fitness[row]),))
+                elif key > heap[0][:2]:
+                    heapq.heapreplace(heap, key + (_recipe_json(batch, row, fitness[row]),))
+            done += len(batch)
+        return {"recipes": [recipe for _, _, recipe in sorted(heap, reverse=True)]}
+
+    def _chunks(self, body, n):
+        """
+        Generates and scores n recipes with the options in body, yielding a RecipeBatch
+        and its BatchFitness for every driver.CHUNK_SIZE of them. The lock is only held
+        while a chunk is made, so other requests can go in between.
+        """
+        extras = tuple(body.get("extras", (4, 6)))
+        temperature = body.get("temperature")
+        # without a seed, the population's own rng is used
+        rng = None if body.get("seed") is None else np.random.default_rng(body["seed"])
+        done = 0
+        while done < n:
+            size = min(CHUNK_SIZE, n - done)
+            with self.lock:
+                batch = self.population.generate_batch(size, Recipe.NUM_CORE, extras, rng,
+                                                       temperature)
+                scores = self.population.fitness_batch(batch)
+            yield batch, scores
+            done += size
+
+    def health(self):
+        """
+        Returns the server's status, queue depth, batching and latency percentiles.
+        """
+        latencies = {}
+        with self.metrics_lock:
+            recorded = {path: list(seconds) for path, seconds in self.latencies.items()}
+            errors = self.errors
+        for path, seconds in recorded.items():
+            milliseconds = np.array(seconds) * 1000
+            latencies[path] = {"count": len(milliseconds),
+                               "p50": float(np.percentile(milliseconds, 50)),
+                               "p90": float(np.percentile(milliseconds, 90)),
+                               "p99": float(np.percentile(milliseconds, 99))}
+        return {"status": "ok",
+                "uptime_seconds": perf_counter() - self.started,
+                "recipes": len(self.population.recipes_list),
+                "ingredients": len(self.population.all_ingredients),
+                "queue_depth": self.batcher.queue_depth(),
+                "batches": self.batcher.batches,
+                "scored": self.batcher.scored,
+                "mean_batch_size": self.batcher.scored / self.batcher.batches
+                if self.batcher.batches else None,
+                "errors": errors,
+                "latency_ms": latencies}
+
+    def record(self, path, seconds):
+        with self.metrics_lock:
+            self.latencies.setdefault(path, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def record_error(self):
+        with self.metrics_lock:
+            self.errors += 1
+
+    def _size(self, body, key, default):
+        value = int(body.get(key, default))
+        if not 0 < value <= self.max_candidates:
+            raise ValueError(f'{key} must be between 1 and {self.max_candidates}')
+        return value
+
+    def close(self):
+        self.batcher.close()
+
+
+def _number(value):
+    # JSON has no NaN, so scores that don't exist are null
+    return None if np.isnan(value) else float(value)
+
+
+def _recipe_json(batch, row, fitness):
+    name, ingredients = _row_data(batch, row)
+    return {"name": name, "fitness": _number(fitness),
+            "ingredients": [{"name": ingredient, "grams": amount}
+                            for ingredient, amount in ingredients]}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # set on the subclass make_server creates
+    service = None
+    routes = {"/generate": "generate", "/score": "score", "/top_k": "top_k"}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._respond(200, self.service.health())
+        else:
+            self._respond(404, {"error": f'no such path: {self.path}'})
+
+    def do_POST(self):
+        start = perf_counter()
+        method = self.routes.get(self.path)
+        if method is None:
+            self._respond(404, {"error": f'no such path: {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(body, dict):
+                raise ValueError('the request body must be a JSON object')
+            response = getattr(self.service, method)(body)
+        except (KeyError, TypeError, ValueError) as error:
+            self.service.record_error()
+            self._respond(400, {"error": f'{type(error).__name__}: {error}'})
+            return
+        except Exception as error:
+            # anything else is our fault, but the client still gets an answer
+            self.service.record_error()
+            self._respond(500, {"error": f'{type(error).__name__}: {error}'})
+            return
+        self._respond(200, response)
+        self.service.record(self.path, perf_counter() - start)
+
+    def _respond(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class RecipeServer(ThreadingHTTPServer):
+    # the default backlog of 5 drops connections when many clients arrive at once
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=8000):
+    """
+    Returns a RecipeServer answering requests with service. Call its serve_forever()
+    to start it. Only loopback addresses are allowed, and port 0 picks a free port.
+    Args:
+        service (RecipeService): answers the requests
+        host (str): the loopback address to listen on
+        port (int): the port to listen on
+    """
+    if host != 'localhost' and not ipaddress.ip_address(host).is_loopback:
+        raise ValueError(f'{host} is not a loopback address')
+    handler = type('Handler', (RequestHandler,), {"service": service})
+    return RecipeServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve cookie recipes on localhost.')
+    parser.add_argument('--host', default='127.0.0.1', help='a loopback address')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--recipes', default='recipes',
+                        help='directory of recipe text files (default: recipes)')
+    parser.add_argument('--embeddings', nargs=2, metavar=('MATRIX', 'VOCAB'),
+                        help='embedding matrix (.npy) and vocabulary files to use')
+    parser.add_argument('--max-batch', type=int, default=512,
+                        help='the most recipes to score in one batch')
+    parser.add_argument('--max-wait', type=float, default=0.002,
+                        help='seconds to wait for more recipes to score together')
+    parser.add_argument('--max-candidates', type=int, default=100000,
+                        help='the most recipes one /generate or /top_k may ask for')
+    args = parser.parse_args()
+
+    if args.embeddings:
+        use_embeddings(*args.embeddings)
+    service = RecipeService(load_population(args.recipes), args.max_batch, args.max_wait,
+                            args.max_candidates)
+    server = make_server(service, args.host, args.port)
+    print(f'serving on http://{server.server_address[0]}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from corpus_cache import load_population
+from tests.fixture_server import FixtureServer
+
+RECIPES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'recipes')
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as server:
+        yield server
+
+
+@pytest.fixture(scope='session')
+def population(tmp_path_factory):
+    # the corpus cache is built in a temporary directory, not next to the recipes
+    return load_population(RECIPES_DIR,
+                           str(tmp_path_factory.mktemp('corpus') / 'recipes.cache.npz'))
@@ -0,0 +1,128 @@
+"""
+Serves the saved pages in tests/fixtures/pages over HTTP on a free local port,
+so web_scrape can be run against a small copy of allrecipes.com. A page is
+served at any path whose last part is its file name without .html, with an
+ETag that changes with its content, and conditional requests carrying the
+current ETag get a 304 Not Modified. Every request is logged.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import web_scrape
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+
+
+def load_pages(directory=PAGES_DIR):
+    """
+    Returns a dictionary of page name -> the HTML of every saved page.
+    """
+    pages = {}
+    for file_name in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(file_name)
+        if extension == '.html':
+            with open(os.path.join(directory, file_name), encoding='utf-8') as file:
+                pages[name] = file.read()
+    return pages
+
+
+def scrape_fixtures(server, dirname, **options):
+    """
+    Runs web_scrape.scrape() against a FixtureServer, taking 2 recipes per category,
+    and returns what it returns.
+    Args:
+        server (FixtureServer): the running server to scrape
+        dirname (str): the directory to write recipe text files to
+        options: passed on to scrape(), such as cache and refresh
+    """
+    fetcher = web_scrape.AsyncFetcher(concurrency=4, host_interval=0, backoff=0.01)
+    try:
+        return asyncio.run(web_scrape.scrape(server.url('/recipes/362/desserts/cookies/'),
+                                             2, str(dirname), fetcher, 1, **options))
+    finally:
+        fetcher.close()
+
+
+class FixtureServer:
+    def __init__(self, pages=None):
+        """
+        This class represents a local HTTP server of saved pages, which can be changed
+        while it runs to see how the scraper deals with pages changing or going away.
+        Args:
+            pages (dict): page name -> HTML; the saved pages by default
+        """
+        self.pages = load_pages() if pages is None else pages
+        # (path, status) of every request, in order
+        self.log = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        """
+        Returns the full URL of a path on this server.
+        """
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def statuses(self):
+        """
+        Returns the status of every request logged so far.
+        """
+        with self.lock:
+            return [status for _, status in self.log]
+
+    def requested(self, name):
+        """
+        Returns how many requests were made for the page called name.
+        """
+        with self.lock:
+            return sum(path.rstrip('/').rsplit('/', 1)[-1] == name for path, _ in self.log)
+
+    def clear_log(self):
+        with self.lock:
+            self.log.clear()
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                html = fixture.pages.get(self.path.rstrip('/').rsplit('/', 1)[-1])
+                if html is None:
+                    self._respond(404)
+                    return
+                body = html.encode('utf-8')
+                etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self._respond(304, {'ETag': etag})
+                    return
+                self._respond(200, {'ETag': etag,
+                                    'Content-Type': 'text/html; charset=utf-8'}, body)
+
+            def _respond(self, status, headers=None, body=b''):
+                with fixture.lock:
+                    fixture.log.append((self.path, status))
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from cookie_gen import GeneratedRecipe, Ingredient, Population, Recipe
+
+
+def make_population(population, start, stop):
+    # a copy of some corpus recipes, so the shared population isn't changed
+    return Population(list(population.recipes_list[start:stop]), seed=0)
+
+
+def test_frequency_index_follows_a_growing_compare_to(population):
+    small = make_population(population, 0, 60)
+    recipe = small.generate_batch(1, 10, seed=0).recipe(0)
+    compare_to = list(small.recipes_list)
+    small.recipe_tf_idf(recipe, compare_to)
+
+    compare_to.extend(population.recipes_list[60:])
+
+    assert small.recipe_tf_idf(recipe, compare_to) == \
+        pytest.approx(small.recipe_tf_idf(recipe, list(compare_to)))
+
+
+def test_frequency_index_of_recipes_list_follows_add_recipes(population):
+    small = make_population(population, 0, 60)
+    recipe = small.generate_batch(1, 10, seed=0).recipe(0)
+    small.recipe_tf_idf(recipe, small.recipes_list)
+    new = Recipe('saffron cookies', [Ingredient('saffron threads', 1.0)] +
+                 recipe.ingredients_list[:Recipe.NUM_CORE])
+    small.add_recipes([new])
+    with_saffron = GeneratedRecipe('x', recipe.ingredients_list + [Ingredient('saffron threads', 1.0)])
+
+    assert small.frequency_index(small.recipes_list)['saffron threads'] == 1
+    assert np.isfinite(small.recipe_tf_idf(with_saffron, small.recipes_list))
+
+
+@pytest.mark.parametrize('temperature', [None, 0.5])
+def test_fitness_batch_matches_fitness(population, temperature):
+    batch = population.generate_batch(200, 10, seed=6, temperature=temperature)
+    recipes = [batch.recipe(row) for row in range(len(batch))]
+
+    scores = population.fitness_batch(batch)
+
+    assert np.allclose(scores.fitness, [population.fitness(recipe) for recipe in recipes])
+    assert np.allclose(scores.tf_idf,
+                       [population.recipe_tf_idf(recipe) for recipe in recipes])
+    assert np.allclose(scores.core_fitness,
+                       [population.core_fitness(recipe) for recipe in recipes])
+    similarities = [recipe.extras_similarity(population.similarities) for recipe in recipes]
+    assert np.allclose(scores.similarity,
+                       [np.nan if similarity is None else similarity
+                        for similarity in similarities], equal_nan=True)
+
+
+def test_fitness_batch_with_novelty_matches_fitness(population):
+    batch = population.generate_batch(100, 10, seed=7)
+    recipes = [batch.recipe(row) for row in range(len(batch))]
+
+    scores = population.fitness_batch(batch, novelty=True)
+
+    assert np.allclose(scores.fitness,
+                       [population.fitness(recipe, novelty=True) for recipe in recipes])
+    assert np.allclose(scores.novelty, [population.novelty(recipe) for recipe in recipes])
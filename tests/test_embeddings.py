@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from embeddings import get_embeddings
+
+
+def reference_similarity(table, n1, n2):
+    """
+    The per-pair rules ingredient_similarity used before similarity_matrix: one-word names
+    compare their vectors, and otherwise the largest nonzero product between their words
+    counts if it is above -1.
+    """
+    def vector(w1, w2):
+        if w1 in table.index and w2 in table.index:
+            return np.dot(table.matrix[table.index[w1]], table.matrix[table.index[w2]])
+        return None
+
+    if " " not in n1 and " " not in n2:
+        return vector(n1, n2)
+    biggest = -1
+    for w1 in n1.split(" "):
+        for w2 in n2.split(" "):
+            product = vector(w1, w2)
+            if product:
+                biggest = max(biggest, product)
+    return None if biggest == -1 else biggest
+
+
+@pytest.fixture(scope='module')
+def names(population):
+    # every corpus name, plus names with no embedding at all
+    return population.all_ingredients + ['unobtainium', 'purple unobtainium dust']
+
+
+def test_similarity_matrix_matches_pair_rules(names):
+    table = get_embeddings()
+
+    matrix = table.similarity_matrix(names)
+
+    expected = np.array([[np.nan if similarity is None else similarity
+                          for similarity in (reference_similarity(table, n1, n2)
+                                             for n2 in names)]
+                         for n1 in names], dtype=float)
+    assert matrix.shape == (len(names), len(names))
+    assert np.array_equal(np.isnan(matrix), np.isnan(expected))
+    assert np.allclose(matrix, expected, atol=1e-5, equal_nan=True)
+    assert not np.isnan(matrix).all()
+
+
+def test_pair_similarities_follow_combinations_order(names):
+    table = get_embeddings()
+    some = names[:12]
+
+    pairs = table.pair_similarities(some)
+
+    expected = [reference_similarity(table, some[i], some[j])
+                for i in range(len(some)) for j in range(i + 1, len(some))]
+    assert np.allclose(pairs, [np.nan if similarity is None else similarity
+                               for similarity in expected], atol=1e-5, equal_nan=True)
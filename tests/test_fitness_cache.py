@@ -0,0 +1,38 @@
+import numpy as np
+
+from fitness_cache import FitnessCache
+
+
+def test_cached_batch_matches_direct_scores(population):
+    cache = FitnessCache(population)
+    batch = population.generate_batch(300, 10, seed=0)
+    # repeated rows, and amount variants of recipes that share their extras
+    repeated = batch.take(list(range(300)) + list(range(0, 300, 3)))
+    variants = batch.take(list(range(150)))
+    variants.amounts = np.round(variants.amounts * 1.05, 3)
+
+    for scored in (batch, repeated, variants, batch):
+        assert np.allclose(cache.fitness_batch(scored),
+                           population.fitness_batch(scored).fitness, equal_nan=True)
+    stats = cache.stats()
+    assert stats["fitness"]["entries"] == 450
+    assert stats["fitness"]["hits"] == 300 + 100 + 300
+    assert stats["similarity"]["hits"] >= 150
+
+
+def test_scalar_and_batch_share_entries(population):
+    cache = FitnessCache(population)
+    batch = population.generate_batch(50, 10, seed=1)
+    recipes = [batch.recipe(row) for row in range(len(batch))]
+
+    scalar = [cache.fitness(recipe) for recipe in recipes]
+
+    assert np.allclose(scalar, [population.fitness(recipe) for recipe in recipes])
+    ids, amounts = batch.ingredient_ids[0], batch.amounts[0]
+    core, extra = batch.core_mask[0], batch.extra_mask[0]
+    key = cache.signature(zip(ids[core].tolist(), amounts[core].tolist()),
+                          zip(ids[extra].tolist(), amounts[extra].tolist()))
+    rows, used = cache.canonical_rows(batch.ingredient_ids, batch.amounts,
+                                      batch.core_mask, batch.extra_mask)
+    assert rows[0, :3 * used[0]].tobytes() == key
+    assert cache.extras_key(key) == np.sort(ids[extra]).astype(np.int64).tobytes()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import web_scrape
+from page_cache import PageCache
+from tests.fixture_server import scrape_fixtures
+
+RECIPE_FILES = ['Best Chocolate Chip Cookies.txt', 'Lemon Bars.txt',
+                'Oatmeal Raisin Cookies.txt', 'Peanut Butter No-Bake Cookies.txt']
+
+
+def read_files(dirname):
+    files = {}
+    for file_name in sorted(os.listdir(dirname)):
+        with open(os.path.join(dirname, file_name)) as file:
+            files[file_name] = file.read()
+    return files
+
+
+def test_second_scrape_only_revalidates(server, tmp_path):
+    recipes = tmp_path / 'recipes'
+    recipes.mkdir()
+    scrape_fixtures(server, recipes, cache=PageCache(str(tmp_path / 'pages.cache')))
+    server.clear_log()
+
+    written, failed = scrape_fixtures(server, recipes,
+                                      cache=PageCache(str(tmp_path / 'pages.cache')))
+
+    # recipes on the skip list aren't requested at all, and the categories, the types and
+    # the page without ingredients are only asked whether they changed
+    assert failed == {}
+    assert written == {server.url('/recipe/9600/no-bake-cookie-videos/'): None}
+    assert server.statuses() == [304] * 5
+    assert sorted(os.listdir(recipes)) == RECIPE_FILES
+
+
+def test_deleted_recipe_file_is_fetched_again(server, tmp_path):
+    recipes = tmp_path / 'recipes'
+    recipes.mkdir()
+    scrape_fixtures(server, recipes, cache=PageCache(str(tmp_path / 'pages.cache')))
+    expected = read_files(recipes)
+    os.remove(recipes / 'Lemon Bars.txt')
+    server.clear_log()
+
+    written, failed = scrape_fixtures(server, recipes,
+                                      cache=PageCache(str(tmp_path / 'pages.cache')))
+
+    assert failed == {}
+    assert written[server.url('/recipe/10294/lemon-bars/')] == 'Lemon Bars'
+    assert server.requested('lemon-bars') == 1
+    assert server.requested('best-chocolate-chip-cookies') == 0
+    assert read_files(recipes) == expected
+
+
+def test_refresh_picks_up_changed_page(server, tmp_path):
+    recipes = tmp_path / 'recipes'
+    recipes.mkdir()
+    scrape_fixtures(server, recipes, cache=PageCache(str(tmp_path / 'pages.cache')))
+    server.pages['oatmeal-raisin-cookies'] = server.pages['oatmeal-raisin-cookies'].replace(
+        '1 cup raisins', '2 cups raisins')
+
+    scrape_fixtures(server, recipes, cache=PageCache(str(tmp_path / 'pages.cache')))
+    with open(recipes / 'Oatmeal Raisin Cookies.txt') as file:
+        assert '1 cup raisins\n' in file.read()
+
+    server.clear_log()
+    written, failed = scrape_fixtures(server, recipes, refresh=True,
+                                      cache=PageCache(str(tmp_path / 'pages.cache')))
+
+    assert failed == {}
+    assert len(written) == 5
+    with open(recipes / 'Oatmeal Raisin Cookies.txt') as file:
+        assert file.read().endswith('2 cups raisins\n')
+    # only the changed page is downloaded again
+    assert sorted(server.statuses()) == [200] + [304] * 8
+
+
+def test_offline_reproduces_every_file(server, tmp_path):
+    online = tmp_path / 'online'
+    offline = tmp_path / 'offline'
+    online.mkdir()
+    offline.mkdir()
+    scrape_fixtures(server, online, cache=PageCache(str(tmp_path / 'pages.cache')))
+    server.clear_log()
+
+    cache = PageCache(str(tmp_path / 'pages.cache'))
+    written, failed = asyncio.run(web_scrape.reextract(cache, str(offline), 1))
+
+    assert failed == {}
+    assert len(written) == 5
+    assert server.statuses() == []
+    assert read_files(offline) == read_files(online)
+    assert all(cache.is_extracted(url) for url, name in written.items() if name)
@@ -0,0 +1,122 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from service import RecipeService, make_server
+
+
+@pytest.fixture(scope='module')
+def url(population):
+    # a long max_wait so recipes posted together are sure to share a batch
+    service = RecipeService(population, max_wait=0.2)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def request(url, data=None):
+    """
+    Sends a GET, or a POST of data (an object to send as JSON, or raw bytes), and returns
+    the status and the decoded JSON response.
+    """
+    if data is not None and not isinstance(data, bytes):
+        data = json.dumps(data).encode('utf-8')
+    try:
+        with urllib.request.urlopen(url, data, timeout=30) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        with error:
+            return error.code, json.load(error)
+
+
+def test_concurrent_scores_share_a_batch(url):
+    status, generated = request(url + '/generate', {"n": 8, "seed": 0})
+    assert status == 200
+    recipes = generated["recipes"]
+    _, before = request(url + '/health')
+
+    results = [None] * len(recipes)
+    barrier = threading.Barrier(len(recipes))
+
+    def score(index):
+        barrier.wait()
+        results[index] = request(url + '/score', {"recipes": [recipes[index]]})
+
+    threads = [threading.Thread(target=score, args=(index,)) for index in range(len(recipes))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for recipe, (status, response) in zip(recipes, results):
+        assert status == 200
+        # /generate rounds the grams it answers with
+        assert response["scores"][0]["fitness"] == pytest.approx(recipe["fitness"], rel=1e-4)
+    _, after = request(url + '/health')
+    batches = after["batches"] - before["batches"]
+    assert after["scored"] - before["scored"] == len(recipes)
+    assert batches < len(recipes)
+    assert after["mean_batch_size"] > 1
+
+
+def test_health_reports_latency_percentiles(url):
+    for seed in range(3):
+        assert request(url + '/generate', {"n": 2, "seed": seed})[0] == 200
+
+    status, health = request(url + '/health')
+
+    assert status == 200
+    assert health["status"] == "ok"
+    latency = health["latency_ms"]["/generate"]
+    assert latency["count"] >= 3
+    assert 0 < latency["p50"] <= latency["p90"] <= latency["p99"]
+
+
+def test_top_k_over_chunks_matches_generate(url, monkeypatch):
+    monkeypatch.setattr('service.CHUNK_SIZE', 7)
+
+    _, generated = request(url + '/generate', {"n": 30, "seed": 3})
+    _, best = request(url + '/top_k', {"candidates": 30, "k": 5, "seed": 3})
+
+    assert len(generated["recipes"]) == 30
+    ranked = sorted(generated["recipes"], key=lambda recipe: -recipe["fitness"])
+    assert best["recipes"] == ranked[:5]
+
+
+@pytest.mark.parametrize('path, data, status', [
+    ('/score', b'{"recipes": [', 400),
+    ('/score', b'[1, 2, 3]', 400),
+    ('/score', {}, 400),
+    ('/score', {"recipes": ["chocolate chip"]}, 400),
+    ('/score', {"recipes": [{"name": "air", "ingredients": []}]}, 400),
+    ('/score', {"recipes": [{"ingredients": [{"name": "unobtainium", "grams": 1}]}]}, 400),
+    ('/score', {"recipes": [{"ingredients": [{"name": "butter"}]}]}, 400),
+    ('/generate', {"n": 0}, 400),
+    ('/generate', {"n": "many"}, 400),
+    ('/generate', {"n": 100001}, 400),
+    ('/top_k', {"seed": "abc"}, 400),
+    ('/top_k', {"candidates": 10, "k": -1}, 400),
+    ('/bake', {}, 404),
+])
+def test_malformed_requests_get_client_errors(url, path, data, status):
+    _, before = request(url + '/health')
+
+    answer = request(url + path, data)
+
+    assert answer[0] == status
+    assert 'error' in answer[1]
+    _, after = request(url + '/health')
+    assert after["errors"] == before["errors"] + (status == 400)
+
+
+def test_unknown_get_path_is_not_found(url):
+    status, response = request(url + '/recipes')
+    assert status == 404
+    assert 'error' in response
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+import unit_conversion as u_convert
+from unit_conversion import GRAMS_PER_QUARTER_CUP, UnitRegistry
+
+
+def old_cup_to_g(name, amount):
+    # cup_to_g before the density table, one branch per ingredient
+    storage = amount / .25
+    if name == "flour" or name == "all-purpose flour":
+        return storage * 32
+    elif name == "butter":
+        return storage * 57
+    elif name == "white sugar" or name == "confectioners' sugar":
+        return storage * 50
+    elif name == "brown sugar" or name == "sugar" or name == "chocolate chips":
+        return storage * 45
+    elif name == "icing sugar":
+        return storage * 35
+    elif name in ("water", "milk", "baking powder", "vanilla extract", "vanilla"):
+        return storage * 60
+    elif name == "cornstarch":
+        return storage * 30
+    elif name == "baking soda" or name == "salt":
+        return storage * 72
+    elif name == "shortening":
+        return storage * 47
+    return storage * 25
+
+
+def old_convert(unit, name, amount):
+    """
+    The chain of conversions translate made before UnitRegistry, one after the other.
+    """
+    if unit in ("teaspoons", "teaspoon"):
+        amount, unit = amount * .0208, "cups"
+    if unit in ("tablespoon", "tablespoons"):
+        amount, unit = amount * .0625, "cups"
+    if unit in ("cup", "cups"):
+        amount, unit = old_cup_to_g(name, amount), "grams"
+    if unit in ("ounce", "oz", "ounces"):
+        amount, unit = amount * 28, "grams"
+    return amount, unit
+
+
+UNITS = ["teaspoon", "teaspoons", "tablespoon", "tablespoons", "cup", "cups", "ounce",
+         "ounces", "oz", "grams", "pinch", "", None]
+NAMES = list(GRAMS_PER_QUARTER_CUP) + ["raisins", "egg(s)", "Butter"]
+AMOUNTS = [0.25, 1 / 3, 1.5, 2, 12]
+CASES = [(unit, name, amount) for unit in UNITS for name in NAMES for amount in AMOUNTS]
+
+
+@pytest.mark.parametrize('unit', UNITS)
+def test_convert_matches_old_chain(unit):
+    registry = UnitRegistry()
+    for name in NAMES:
+        for amount in AMOUNTS:
+            assert registry.convert(unit, name, amount) == old_convert(unit, name, amount)
+
+
+def test_convert_columns_matches_convert():
+    registry = UnitRegistry()
+    units, names, amounts = zip(*CASES)
+
+    converted, converted_units = registry.convert_columns(list(amounts), list(units),
+                                                          list(names))
+
+    expected = [old_convert(unit, name, amount) for unit, name, amount in CASES]
+    assert converted.tolist() == [amount for amount, _ in expected]
+    assert converted_units == [unit for _, unit in expected]
+    # each distinct (unit, name) pair is resolved once
+    assert len(registry.conversions) == len(UNITS) * len(NAMES)
+
+
+def test_unknown_units_are_left_alone():
+    registry = UnitRegistry()
+    assert registry.convert("pinch", "salt", 2) == (2, "pinch")
+    assert registry.convert(None, "egg(s)", 3) == (3, None)
+    converted, units = registry.convert_columns([2, 3], ["pinch", None], ["salt", "egg(s)"])
+    assert converted.tolist() == [2, 3]
+    assert units == ["pinch", None]
+
+
+def test_unknown_names_fall_back_to_default_density():
+    registry = UnitRegistry(default_density=40)
+    assert registry.convert("cups", "raisins", 1) == (160, "grams")
+    assert registry.convert("cups", "butter", 1) == (228, "grams")
+    assert UnitRegistry().convert("cups", "raisins", 1) == (100, "grams")
+
+
+def test_old_functions_still_convert():
+    for name in NAMES:
+        assert u_convert.cup_to_g(name, 1.5) == old_cup_to_g(name, 1.5)
+    assert u_convert.oz_to_g(2) == 56
+    assert u_convert.tspoon_to_cup(3) == 3 * .0208
+    assert u_convert.tbspoon_to_cup(3) == 3 * .0625
+    assert np.isclose(u_convert.cup_to_g("flour", 1), 128)
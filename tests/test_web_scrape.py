@@ -0,0 +1,75 @@
+import os
+
+import requests
+
+from tests.fixture_server import scrape_fixtures
+
+CHOCOLATE_CHIP = '''Best Chocolate Chip Cookies
+Rating: 4.7 stars
+1 cup butter, softened
+1 cup white sugar
+1 cup packed brown sugar
+2  eggs
+2 teaspoons vanilla extract
+1 teaspoon baking soda
+3 cups all-purpose flour
+2 cups semisweet chocolate chips
+'''
+
+OATMEAL_RAISIN = '''Oatmeal Raisin Cookies
+Rating: 4.5 stars
+0.75 cup butter, softened
+1 cup packed brown sugar
+0.5 cup white sugar
+1  egg
+1.5 cups all-purpose flour
+3 cups rolled oats
+1 cup raisins
+'''
+
+
+def test_scrape_writes_a_file_per_recipe(server, tmp_path):
+    written, failed = scrape_fixtures(server, tmp_path)
+
+    assert failed == {}
+    assert written == {
+        server.url('/recipe/10813/best-chocolate-chip-cookies/'): 'Best Chocolate Chip Cookies',
+        server.url('/recipe/10264/oatmeal-raisin-cookies/'): 'Oatmeal Raisin Cookies',
+        server.url('/recipe/10294/lemon-bars/'): 'Lemon Bars',
+        server.url('/recipe/9600/no-bake-cookie-videos/'): None,
+        server.url('/recipe/9827/peanut-butter-no-bake-cookies/'):
+            'Peanut Butter No-Bake Cookies',
+    }
+    assert sorted(os.listdir(tmp_path)) == [
+        'Best Chocolate Chip Cookies.txt', 'Lemon Bars.txt', 'Oatmeal Raisin Cookies.txt',
+        'Peanut Butter No-Bake Cookies.txt']
+    with open(tmp_path / 'Best Chocolate Chip Cookies.txt') as file:
+        assert file.read() == CHOCOLATE_CHIP
+    with open(tmp_path / 'Oatmeal Raisin Cookies.txt') as file:
+        assert file.read() == OATMEAL_RAISIN
+
+
+def test_scrape_only_follows_wanted_links(server, tmp_path):
+    scrape_fixtures(server, tmp_path)
+
+    # frostings and non-cookie categories are skipped, and only the first 2 recipes of a
+    # category are taken, once each even when listed under two categories
+    assert server.requested('cookie-frosting') == 0
+    assert server.requested('gifts') == 0
+    assert server.requested('snickerdoodles') == 0
+    assert server.requested('brownies') == 0
+    assert server.requested('best-chocolate-chip-cookies') == 1
+    assert server.statuses() == [200] * 9
+
+
+def test_scrape_reports_pages_it_could_not_fetch(server, tmp_path):
+    del server.pages['lemon-bars']
+    del server.pages['no-bake-cookies']
+
+    written, failed = scrape_fixtures(server, tmp_path)
+
+    assert set(failed) == {server.url('/recipe/10294/lemon-bars/'),
+                           server.url('/recipes/15840/desserts/cookies/no-bake-cookies/')}
+    assert all(isinstance(error, requests.HTTPError) for error in failed.values())
+    assert sorted(filter(None, written.values())) == [
+        'Best Chocolate Chip Cookies', 'Oatmeal Raisin Cookies']
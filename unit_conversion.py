@@ -1,46 +1,144 @@
+"""
+Converts ingredient amounts to grams. Every conversion is described by two
+tables: UNIT_ALIASES says what each unit converts to and by what factor, and
+GRAMS_PER_QUARTER_CUP gives the density of the ingredients we know, keyed by
+every name they show up under. A UnitRegistry turns a (unit, name) pair into a
+Conversion once and remembers it, and can convert whole columns of amounts,
+units and names at once.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# unit -> (the unit it converts to, what to multiply the amount by)
+UNIT_ALIASES = {
+    "teaspoon": ("cups", .0208),
+    "teaspoons": ("cups", .0208),
+    "tablespoon": ("cups", .0625),
+    "tablespoons": ("cups", .0625),
+    "cup": ("cups", 1),
+    "cups": ("cups", 1),
+    "ounce": ("grams", 28),
+    "ounces": ("grams", 28),
+    "oz": ("grams", 28),
+}
+
+# ingredient name -> grams in a quarter cup of it
+GRAMS_PER_QUARTER_CUP = {
+    "flour": 32,
+    "all-purpose flour": 32,
+    "butter": 57,
+    "white sugar": 50,
+    "confectioners' sugar": 50,
+    "brown sugar": 45,
+    "sugar": 45,
+    "icing sugar": 35,
+    "water": 60,
+    "cornstarch": 30,
+    "milk": 60,
+    "chocolate chips": 45,
+    "baking soda": 72,
+    "salt": 72,
+    "shortening": 47,
+    "baking powder": 60,
+    "vanilla extract": 60,
+    "vanilla": 60,
+}
+DEFAULT_GRAMS_PER_QUARTER_CUP = 25
+
+# grams = amount * factor / divisor * grams_per_unit, in that order so every result is
+# exactly what the chain of conversion functions gives. unit is what the amount ends up in
+Conversion = namedtuple('Conversion', ['factor', 'divisor', 'grams_per_unit', 'unit'])
+
+
+class UnitRegistry:
+    def __init__(self, unit_aliases=UNIT_ALIASES, densities=GRAMS_PER_QUARTER_CUP,
+                 default_density=DEFAULT_GRAMS_PER_QUARTER_CUP):
+        """
+        This class looks up how to convert an amount of an ingredient to grams, and
+        remembers the Conversion for each (unit, name) pair it has seen.
+        Args:
+            unit_aliases (dict): unit -> (the unit it converts to, factor), like UNIT_ALIASES
+            densities (dict): ingredient name -> grams per quarter cup
+            default_density (float): grams per quarter cup of any other ingredient
+        """
+        self.unit_aliases = unit_aliases
+        self.densities = densities
+        self.default_density = default_density
+        self.conversions = {}
+
+    def resolve(self, unit, name):
+        """
+        Returns the Conversion for an amount of name measured in unit. Units that aren't
+        in unit_aliases are left as they are.
+        Args:
+            unit (str): the unit the amount is in, such as "teaspoons"
+            name (str): the ingredient's name, which decides its density in cups
+        """
+        conversion = self.conversions.get((unit, name))
+        if conversion is None:
+            if unit not in self.unit_aliases:
+                conversion = Conversion(1, 1, 1, unit)
+            else:
+                converted_unit, factor = self.unit_aliases[unit]
+                if converted_unit == "cups":
+                    conversion = Conversion(factor, .25, self.densities.get(
+                        name, self.default_density), "grams")
+                else:
+                    conversion = Conversion(factor, 1, 1, converted_unit)
+            self.conversions[(unit, name)] = conversion
+        return conversion
+
+    def convert(self, unit, name, amount):
+        """
+        Returns (the converted amount, its unit) for one amount of an ingredient.
+        Args:
+            unit (str): the unit the amount is in
+            name (str): the ingredient's name
+            amount (float): the amount in unit
+        """
+        factor, divisor, grams_per_unit, converted_unit = self.resolve(unit, name)
+        if converted_unit == unit:
+            return amount, unit
+        return amount * factor / divisor * grams_per_unit, converted_unit
+
+    def convert_columns(self, amounts, units, names):
+        """
+        Converts many amounts at once, resolving each distinct (unit, name) pair once.
+        Returns (an array of converted amounts, a list of their units).
+        Args:
+            amounts (list[float]): the amount of each ingredient
+            units (list[str]): the unit of each amount
+            names (list[str]): the name of each ingredient
+        """
+        # one row of factors per distinct pair, gathered into columns
+        rows = {}
+        pair_rows = np.array([rows.setdefault(pair, len(rows)) for pair in zip(units, names)],
+                             dtype=np.int64)
+        conversions = [self.resolve(unit, name) for unit, name in rows]
+        factor, divisor, grams_per_unit = (
+            np.array([conversion[column] for conversion in conversions], dtype=float)[pair_rows]
+            for column in range(3))
+        # multiplying and dividing by 1 leaves an amount exactly as it was
+        converted = np.asarray(amounts, dtype=float) * factor / divisor * grams_per_unit
+        converted_units = [conversions[row].unit for row in pair_rows.tolist()]
+        return converted, converted_units
+
+
+# the registry translate_ingredients converts with
+REGISTRY = UnitRegistry()
+
+
 def oz_to_g(amount):
-    return (amount * 28)
+    return amount * UNIT_ALIASES["ounces"][1]
 
 def cup_to_g(name, amount):
     """
     Takes in an ingredient with measurement unit cups and converts
     it to the proper amount in grams
     """
-    storage = amount / .25
-    if name == "flour":
-        amount = storage * 32
-    elif name == "butter":
-        amount = storage * 57
-    elif name == "white sugar" or name == "confectioners' sugar":
-        amount = storage * 50
-    elif name == "brown sugar" or name == "sugar":
-        amount = storage * 45
-    elif name == "icing sugar":
-        amount = storage * 35
-    elif name == "water":
-        amount = storage * 60
-    elif name == "cornstarch":
-        amount = storage * 30
-    elif name == "milk":
-        amount = storage * 60
-    elif name == "chocolate chips":
-        amount = storage * 45
-    elif name == "baking soda":
-        amount = storage * 72
-    elif name == "salt":
-        amount = storage * 72
-    elif name == "shortening":
-        amount = storage * 47
-    elif name == "baking powder":
-        amount = storage * 60
-    elif name == "all-purpose flour":
-        amount = storage * 32
-    elif name == "vanilla extract" or name == "vanilla":
-        amount = storage * 60
-    else:
-        amount = storage * 25
-
-    return amount
+    return REGISTRY.convert("cups", name, amount)[0]
 
 
 
@@ -48,7 +146,7 @@ def tspoon_to_cup(amount):
     """
     Converts a teaspoon amount to cups
     """
-    return amount * .0208
+    return amount * UNIT_ALIASES["teaspoons"][1]
 
 
 
@@ -56,4 +154,4 @@ def tbspoon_to_cup(amount):
     """
     Converts a tablespoon amount to cups
     """
-    return amount * .0625
\ No newline at end of file
+    return amount * UNIT_ALIASES["tablespoons"][1]
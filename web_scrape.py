@@ -1,37 +1,73 @@
 """
 Authors: Danny Little, Bruce Tang, August Wadlington
 CSCI 3725
-Last Edited: 2021-03-30
+Last Edited: 2026-10-18
 
 This file will scrape cookie recipes from allrecipes.com, do some initial
 parsing, and then store each recipe in its own text file. The functions
 ues the BeautifulSoup package to parse the HTML. This file should NOT be run,
-unless you want to re-scrape all of the text file, which may take ~5 minutes or so!
+unless you want to re-scrape all of the text file!
+
+Pages are fetched concurrently by an AsyncFetcher: requests share one pooled
+requests.Session, at most a few are in flight at once, requests to the same
+host are spaced out, and failed requests are retried with exponential
+backoff. Parsing with BeautifulSoup happens in a pool of worker processes so
+it doesn't hold up the fetching. The start URL can be changed, so scrape()
+can also be pointed at a local server serving saved pages.
+
+Given a PageCache, scrape() keeps the raw HTML of every page it fetches,
+asks the server whether cached pages changed before downloading them again,
+and skips recipe pages whose recipe file it already wrote. reextract() makes
+the recipe files again from the cache alone, without touching the network.
 
 Prof. Harmon suggested that recipes could be stored instead in a .npy file,
 but  doing so ended up being tricky because each recipe may have a
 different number of ingredients. 
 """
 
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urljoin, urlsplit
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from page_cache import PageCache
+
+COOKIE_CATEGORIES_URL = "https://www.allrecipes.com/recipes/362/desserts/cookies/"
+# how many recipes to take from each category page
+RECIPES_PER_TYPE = 8
+# responses worth trying again, since the server may recover
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 
-def get_cookie_type_urls():
+def get_cookie_type_urls(cookie_categories_url=COOKIE_CATEGORIES_URL):
     """
     Finds the URL's for categories of cookies listed at the following URL:
     https://www.allrecipes.com/recipes/362/desserts/cookies/
     """
-    cookie_categories_url = "https://www.allrecipes.com/recipes/362/desserts/cookies/"
     html = requests.get(cookie_categories_url).text
+    return parse_cookie_type_urls(html, cookie_categories_url)
+
+
+def parse_cookie_type_urls(html, page_url=COOKIE_CATEGORIES_URL):
+    """
+    Does the parsing for get_cookie_type_urls, given the HTML of the categories page.
+        Args:
+        html (str): the HTML of the page listing categories of cookies.
+        page_url (str): the URL of that page, which relative links are relative to.
+    """
     soup = BeautifulSoup(html, 'lxml')
     types_raw = soup.find_all(
         'a', class_='carouselNav__link recipeCarousel__link')
 
     type_urls = []
     for type_raw in types_raw:
-        type_href = type_raw.get('href')
+        type_href = urljoin(page_url, type_raw.get('href'))
         split_url = [href for href in type_href.split('/') if href]
         if "cookie" in split_url[-1] and split_url[-2] != "frostings-and-icings":
             type_urls.append(type_href)
@@ -46,34 +82,55 @@ def get_recipe_urls(cookie_type_url, number):
         cookie_type_url (str): the URL of this cookie type.
         number (int): the number of recipe URL's to return.
     """
-    recipe_urls = []
     html = requests.get(cookie_type_url).text
+    return parse_recipe_urls(html, number, cookie_type_url)
+
+
+def parse_recipe_urls(html, number, page_url=''):
+    """
+    Does the parsing for get_recipe_urls, given the HTML of a cookie type's page.
+        Args:
+        html (str): the HTML of the page listing recipes of one kind of cookie.
+        number (int): the number of recipe URL's to return.
+        page_url (str): the URL of that page, which relative links are relative to.
+    """
+    recipe_urls = []
     soup = BeautifulSoup(html, 'lxml')
     recipe_cards = soup.find_all('div', class_='card__detailsContainer')
 
     for i in range(number):
         card = recipe_cards[i]
-        recipe_urls.append(card.a.get('href'))
+        recipe_urls.append(urljoin(page_url, card.a.get('href')))
     return recipe_urls
 
 
-def make_recipe_file(url):
+def make_recipe_file(url, dirname='recipes'):
     """
     Makes and writes to a file the name of a recipe, along with its ingredients
     and the amount of each ingredient, with some processing involved.
     """
-    html = requests.get(url).text
+    parsed = parse_recipe_page(requests.get(url).text)
+    if parsed:
+        write_recipe_file(*parsed, dirname)
 
+
+def parse_recipe_page(html):
+    """
+    Does the parsing for make_recipe_file, returning the recipe's name and the text of
+    its recipe file, or None if the page has no ingredients.
+        Args:
+        html (str): the HTML of a recipe's page.
+    """
     soup = BeautifulSoup(html, 'lxml')
     recipe_name = soup.head.title.text
     if recipe_name.endswith("Recipe | Allrecipes"):
         recipe_name = recipe_name[:-20]
     elif recipe_name.endswith(" | Allrecipes"):
-        recipe_name = recipe_name[:-14]
+        recipe_name = recipe_name[:-13]
 
     ingredients_raw = soup.find_all('li', class_='ingredients-item')
     if not ingredients_raw:
-        return
+        return None
 
     recipe_file_text = recipe_name + '\n'
     recipe_rating = soup.find('span', class_='review-star-text')
@@ -81,10 +138,224 @@ def make_recipe_file(url):
 
     for ingredient in ingredients_raw:
         recipe_file_text += clean_ingredient_text(ingredient.text)
+    return recipe_name, recipe_file_text
+
 
-    with open('recipes/' + recipe_name + '.txt', 'w') as file:
+def write_recipe_file(recipe_name, recipe_file_text, dirname='recipes'):
+    """
+    Writes the text of a recipe file made by parse_recipe_page to dirname, and returns
+    the file's path.
+    """
+    file_path = os.path.join(dirname, recipe_name + '.txt')
+    with open(file_path, 'w') as file:
         file.truncate(0)
         file.write(recipe_file_text)
+    return file_path
+
+
+class AsyncFetcher:
+    def __init__(self, concurrency=8, host_interval=0.25, retries=3, backoff=0.5, timeout=30):
+        """
+        This class fetches pages for asyncio code. Every request goes through one
+        requests.Session, whose connection pool is shared by concurrency threads.
+        Args:
+            concurrency (int): the most requests in flight at once
+            host_interval (float): the fewest seconds between starting two requests to the
+            same host
+            retries (int): how many times to try a request again after a connection error,
+            a timeout or a status in RETRY_STATUSES
+            backoff (float): seconds to wait before the first retry, doubling for each retry
+            timeout (float): seconds to wait for a server before giving up on a request
+        """
+        self.concurrency = concurrency
+        self.host_interval = host_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(concurrency)
+        self.requests = 0
+        self.retried = 0
+        # host -> the event loop time its next request may start at
+        self._next_start = {}
+        self._semaphore = None
+
+    async def fetch(self, url):
+        """
+        Returns the text of the page at url, retrying with backoff when the request fails
+        in a way that may not happen again. Raises requests.RequestException (including
+        requests.HTTPError for error statuses) once it runs out of retries.
+            Args:
+            url (str): the page to fetch
+        """
+        return (await self.fetch_response(url)).text
+
+    async def fetch_response(self, url, headers=None):
+        """
+        Like fetch(), but sends extra headers and returns the whole requests.Response, so
+        conditional requests can see a 304 Not Modified and the caching headers.
+            Args:
+            url (str): the page to fetch
+            headers (dict): extra request headers, such as If-None-Match
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            await self._wait_for_host(urlsplit(url).netloc)
+            try:
+                async with self._semaphore:
+                    self.requests += 1
+                    response = await loop.run_in_executor(
+                        self.executor, partial(self.session.get, url, headers=headers,
+                                               timeout=self.timeout))
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                response.raise_for_status()
+                return response
+
+    async def _wait_for_host(self, host):
+        """
+        Waits until a request to host may start, and books the next slot for that host.
+        """
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start.get(host, now))
+        self._next_start[host] = start + self.host_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+
+async def fetch_page(fetcher, url, cache=None, kind='recipe'):
+    """
+    Returns the HTML of the page at url. With a cache, a cached page is only downloaded
+    again if the server says it changed, and every downloaded page is stored.
+        Args:
+        fetcher (AsyncFetcher): fetches the page
+        url (str): the page to fetch
+        cache (PageCache): the cache to revalidate against and store in, if any
+        kind (str): what kind of page it is, see PageCache.store
+    """
+    if cache is None:
+        return await fetcher.fetch(url)
+    response = await fetcher.fetch_response(url, cache.conditional_headers(url))
+    if response.status_code == 304:
+        cache.revalidated(url)
+        return cache.read(url)
+    cache.store(url, response.text, response.headers.get('ETag'),
+                response.headers.get('Last-Modified'), kind)
+    return response.text
+
+
+async def scrape(cookie_categories_url=COOKIE_CATEGORIES_URL, number=RECIPES_PER_TYPE,
+                 dirname='recipes', fetcher=None, parse_workers=None, cache=None,
+                 refresh=False):
+    """
+    Does what main() used to do one page at a time: fetches every category of cookies,
+    the first number recipes of each, and writes each recipe to its own file in dirname.
+    Returns a dictionary of recipe URL -> the name of the recipe written from it (None
+    when the page had no ingredients), and a dictionary of URL -> the exception that
+    kept a page from being fetched or parsed. Recipe pages on the cache's skip list are
+    in neither.
+        Args:
+        cookie_categories_url (str): the page listing categories of cookies
+        number (int): the number of recipes to take from each category
+        dirname (str): the directory to write recipe text files to
+        fetcher (AsyncFetcher): fetches the pages; a new AsyncFetcher by default
+        parse_workers (int): number of processes parsing pages, by default one per CPU
+        cache (PageCache): keeps every fetched page, and is saved when scrape() ends
+        refresh (bool): revalidate and rewrite recipes on the cache's skip list too
+    """
+    loop = asyncio.get_running_loop()
+    own_fetcher = fetcher is None
+    fetcher = fetcher or AsyncFetcher()
+    written = {}
+    failed = {}
+    try:
+        with ProcessPoolExecutor(parse_workers) as parser:
+            html = await fetch_page(fetcher, cookie_categories_url, cache, 'categories')
+            type_urls = await loop.run_in_executor(
+                parser, parse_cookie_type_urls, html, cookie_categories_url)
+
+            async def recipe_urls(type_url):
+                html = await fetch_page(fetcher, type_url, cache, 'type')
+                return await loop.run_in_executor(parser, parse_recipe_urls, html, number,
+                                                  type_url)
+
+            async def recipe_file(url):
+                html = await fetch_page(fetcher, url, cache)
+                parsed = await loop.run_in_executor(parser, parse_recipe_page, html)
+                if parsed:
+                    file_path = write_recipe_file(*parsed, dirname)
+                    if cache is not None:
+                        cache.mark_extracted(url, file_path)
+                return parsed[0] if parsed else None
+
+            urls = []
+            for type_url, result in zip(type_urls, await asyncio.gather(
+                    *map(recipe_urls, type_urls), return_exceptions=True)):
+                if isinstance(result, Exception):
+                    failed[type_url] = result
+                else:
+                    urls += result
+            # a recipe can be listed under more than one category
+            urls = [url for url in dict.fromkeys(urls)
+                    if refresh or cache is None or not cache.is_extracted(url)]
+            for url, result in zip(urls, await asyncio.gather(
+                    *map(recipe_file, urls), return_exceptions=True)):
+                if isinstance(result, Exception):
+                    failed[url] = result
+                else:
+                    written[url] = result
+    finally:
+        if own_fetcher:
+            fetcher.close()
+        if cache is not None:
+            cache.save()
+    return written, failed
+
+
+async def reextract(cache, dirname='recipes', parse_workers=None):
+    """
+    Makes a recipe file from every recipe page in the cache without going online, such
+    as after a change to clean_ingredient_text. Returns the same dictionaries as scrape().
+        Args:
+        cache (PageCache): the cache of pages a scrape() stored
+        dirname (str): the directory to write recipe text files to
+        parse_workers (int): number of processes parsing pages, by default one per CPU
+    """
+    loop = asyncio.get_running_loop()
+    written = {}
+    failed = {}
+    urls = cache.urls('recipe')
+    try:
+        with ProcessPoolExecutor(parse_workers) as parser:
+            futures = [loop.run_in_executor(parser, parse_recipe_page, cache.read(url))
+                       for url in urls]
+            for url, result in zip(urls, await asyncio.gather(*futures,
+                                                              return_exceptions=True)):
+                if isinstance(result, Exception):
+                    failed[url] = result
+                elif result is None:
+                    written[url] = None
+                else:
+                    cache.mark_extracted(url, write_recipe_file(*result, dirname))
+                    written[url] = result[0]
+    finally:
+        cache.save()
+    return written, failed
 
 
 def clean_ingredient_text(ingredient_str):
@@ -114,16 +385,31 @@ def get_annoying_fraction(fraction):
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description='Scrape cookie recipes from allrecipes.com into recipe text files.')
+    parser.add_argument('--cache', default='pages.cache',
+                        help='directory to keep fetched pages in (default: pages.cache)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help="don't read or write the page cache")
+    parser.add_argument('--refresh', action='store_true',
+                        help='revalidate recipes whose recipe file was already written')
+    parser.add_argument('--offline', action='store_true',
+                        help='only re-extract recipe files from the page cache')
+    args = parser.parse_args()
+    cache = None if args.no_cache else PageCache(args.cache)
 
-    # get urls for allrecipe's ~24 categories
-    cookie_type_urls = get_cookie_type_urls()
-    # above urls link to ~12 actual recipes. For now, grab the first 5 and make files from contents.
-    recipe_urls = []
-    for url in cookie_type_urls:
-        recipe_urls += get_recipe_urls(url, 8)
-
-    for recipe_url in list(set(recipe_urls)):
-        make_recipe_file(recipe_url)
+    if args.offline:
+        if cache is None:
+            parser.error('--offline needs the page cache')
+        written, failed = asyncio.run(reextract(cache))
+    else:
+        # get urls for allrecipe's ~24 categories, then the first 8 recipes of each, and
+        # make files from their contents
+        written, failed = asyncio.run(scrape(cache=cache, refresh=args.refresh))
+    print(f'wrote {sum(name is not None for name in written.values())} recipes')
+    for url, error in failed.items():
+        print(f'could not scrape {url}: {error}')
 
 
-main()
+if __name__ == '__main__':
+    main()